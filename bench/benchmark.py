@@ -0,0 +1,313 @@
+"""
+End-to-end benchmark of the country scripts against the offline AIS stand-in.
+
+Drives the real functions from kenya/main.py or south_africa/main.py with headless
+Chrome and reports, per scenario:
+- cycle wall time (mean / min / max)
+- WebDriver commands per cycle (total and by command name)
+- time-to-detection: seconds from a slot being released on the stand-in until the
+  bot's check_and_select_appointment() reports it
+- the DRY_RUN commit timeline: ms from the availability read to "would submit", per step
+- page-load time (Navigation Timing) and browser process-tree RSS, with the lean or
+  full browser profile (--compare-profiles runs both)
+
+Examples:
+    python bench/benchmark.py --country kenya --cycles 5
+    python bench/benchmark.py --country south_africa --legacy-scan --json bench_output.json
+    python bench/benchmark.py --compare-profiles --page-loads 20
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from selenium import webdriver
+
+from standin import StandInConfig, StandInServer, days_from_today
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from common.browser import build_driver, tree_rss_bytes  # noqa: E402
+from common.instrumentation import percentile  # noqa: E402
+
+_NAVIGATION_TIMING_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+return nav ? [nav.domContentLoadedEventEnd - nav.startTime, nav.loadEventEnd - nav.startTime, nav.transferSize] : null;
+"""
+
+COUNTRIES = {
+    "kenya": {"locale": "en-ke", "cities": ["Nairobi"]},
+    "south_africa": {"locale": "en-za", "cities": ["Cape Town", "Durban", "Johannesburg"]},
+}
+
+
+def load_bot(country: str, server: StandInServer):
+    """Import a country script pointed at the stand-in instead of the live site."""
+    workdir = tempfile.mkdtemp(prefix="visa-bench-")
+    os.environ.update({
+        "AIS_BASE_URL": server.base_url(COUNTRIES[country]["locale"]),
+        "ACCOUNT_ID": server.config.account_id,
+        "EMAIL": "bench@example.com",
+        "PASSWORD": "bench-password",
+        "NOTIFY_EMAIL_FROM": "",
+        "NOTIFY_EMAIL_PASSWORD": "",
+        "STATE_FILE": os.path.join(workdir, "state.json"),
+        "HISTORY_DB": os.path.join(workdir, "history.sqlite3"),
+        "RATE_STATE_FILE": os.path.join(workdir, "rate.json"),
+        "LOG_JSONL": os.path.join(workdir, "bot.jsonl"),
+    })
+    spec = importlib.util.spec_from_file_location(f"{country}_bot", ROOT / country / "main.py")
+    bot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bot)
+
+    # No desktop, SMTP or webhook side effects while benchmarking ([ALERT] lines still log)
+    bot.ALERTS.channels = []
+    # The stand-in is local: no request budget, so cycle timings aren't throttled
+    bot.GOVERNOR.limits = {}
+    bot.DRY_RUN = True
+    return bot
+
+
+def build_headless_driver(lean: bool = True) -> webdriver.Chrome:
+    return build_driver(lean=lean, headless=True)
+
+
+def count_commands(driver: webdriver.Chrome) -> Counter:
+    """Count every WebDriver command (elements route their calls through driver.execute)."""
+    counter: Counter = Counter()
+    execute = driver.execute
+
+    def counted(driver_command, params=None):
+        counter[driver_command] += 1
+        return execute(driver_command, params)
+
+    driver.execute = counted
+    return counter
+
+
+def open_form(bot, driver) -> None:
+    """Fresh browser -> appointment form through the script's own navigation state machine."""
+    if bot.recover(driver) is not driver:
+        raise RuntimeError("stand-in: browser was rebuilt during setup")
+
+
+def run_cycle(bot, driver, counter: Counter, reload: bool = True) -> dict:
+    counter.clear()
+    started = time.perf_counter()
+    if reload:
+        driver.get(bot.APPOINTMENT_URL)
+        bot.recover(driver)
+    # Same decision path as main(): sweep + ranked booking, or city by city
+    if bot.SWEEP_MODE:
+        ranked = bot.sweep_cities(driver).ranked(bot.FACILITY_PREFERENCE_DAYS)
+        attempts = [(entry.facility, bot.AVAILABILITY.open_dates(entry.facility)) for entry in ranked]
+    else:
+        attempts = [(city, None) for city in bot.CITIES]
+    found = any(bot.check_and_select_appointment(driver, city, dates) for city, dates in attempts)
+    return {
+        "wall_s": time.perf_counter() - started,
+        "commands": sum(counter.values()),
+        "by_command": dict(counter),
+        "found": found,
+    }
+
+
+def summarize(cycles: list) -> dict:
+    walls = [c["wall_s"] for c in cycles]
+    calls = [c["commands"] for c in cycles]
+    merged: Counter = Counter()
+    for c in cycles:
+        merged.update(c["by_command"])
+    return {
+        "cycles": len(cycles),
+        "wall_s": {"mean": statistics.mean(walls), "min": min(walls), "max": max(walls)},
+        "commands_per_cycle": {"mean": statistics.mean(calls), "min": min(calls), "max": max(calls)},
+        "top_commands": dict(merged.most_common(8)),
+        "found": sum(1 for c in cycles if c["found"]),
+    }
+
+
+def scenario_cycles(bot, driver, counter, server, cycles: int, offsets) -> dict:
+    """Steady-state polling with open dates spread across the window."""
+    server.config.availability = {city: days_from_today(*offsets) for city in bot.CITIES}
+    server.config.release_at = {}
+    return summarize([run_cycle(bot, driver, counter) for _ in range(cycles)])
+
+
+def scenario_empty(bot, driver, counter, server, cycles: int) -> dict:
+    """Nothing open: the common case that dominates long runs."""
+    server.config.availability = {}
+    return summarize([run_cycle(bot, driver, counter) for _ in range(cycles)])
+
+
+def scenario_detection(bot, driver, counter, server, release_after: float, offset: int,
+                       poll_interval: float, timeout: float) -> dict:
+    """Release one slot after `release_after` seconds and poll back-to-back until it is seen."""
+    city = bot.CITIES[-1]
+    server.config.availability = {city: days_from_today(offset)}
+    released = time.time() + release_after
+    server.config.release_at = {city: released}
+
+    cycles = []
+    while time.time() - released < timeout:
+        cycle = run_cycle(bot, driver, counter)
+        cycles.append(cycle)
+        if cycle["found"]:
+            return {
+                "time_to_detection_s": time.time() - released,
+                "cycles_until_found": len(cycles),
+                **summarize(cycles),
+            }
+        time.sleep(poll_interval)
+    return {"time_to_detection_s": None, "cycles_until_found": len(cycles), **summarize(cycles)}
+
+
+def scenario_commit(bot, driver, counter, server, runs: int, offset: int) -> dict:
+    """Book an open slot under DRY_RUN and report the detection -> submit timeline per step."""
+    server.config.availability = {city: days_from_today(offset) for city in bot.CITIES}
+    server.config.release_at = {}
+    timelines = []
+    for i in range(runs):
+        bot.instrumentation.start_cycle(f"commit-{i}")
+        run_cycle(bot, driver, counter)
+        record = bot.instrumentation.end_cycle("bench")
+        timelines += [s["timeline_ms"] for s in record["spans"] if s["name"] == "commit" and s.get("time")]
+    totals = [t["would_submit"] for t in timelines]
+    steps = {}
+    for timeline in timelines:
+        marks = list(timeline.items())
+        for (name, ms), (_, previous) in zip(marks[1:], marks):
+            steps.setdefault(name, []).append(ms - previous)
+    return {
+        "runs": runs,
+        "committed": len(timelines),
+        "total_ms": {"p50": percentile(totals, 50), "p95": percentile(totals, 95)} if totals else None,
+        "step_ms": {name: {"p50": round(percentile(v, 50), 1), "p95": round(percentile(v, 95), 1)}
+                    for name, v in steps.items()},
+    }
+
+
+def scenario_page_load(bot, driver, loads: int) -> dict:
+    """Reload the appointment form `loads` times; report load timings and browser RSS."""
+    dcl, load, transferred = [], [], 0
+    for _ in range(loads):
+        driver.get(bot.APPOINTMENT_URL)
+        timing = driver.execute_script(_NAVIGATION_TIMING_JS)
+        if timing:
+            dcl.append(timing[0])
+            load.append(timing[1])
+            transferred += timing[2] or 0
+    return {
+        "loads": loads,
+        "dom_content_loaded_ms": {"p50": percentile(dcl, 50), "p95": percentile(dcl, 95)} if dcl else None,
+        "load_event_ms": {"p50": percentile(load, 50), "p95": percentile(load, 95)} if load else None,
+        "html_transfer_bytes": transferred,
+        "rss_mb": round(tree_rss_bytes(driver) / 1e6, 1),
+    }
+
+
+def compare_profiles(args) -> dict:
+    """Page-load time and RSS with the lean profile vs. a plain headless Chrome."""
+    report = {}
+    for profile in ("full", "lean"):
+        server = StandInServer(StandInConfig(ajax_latency=args.ajax_latency, page_latency=args.page_latency)).start()
+        bot = load_bot(args.country, server)
+        driver = build_headless_driver(lean=profile == "lean")
+        try:
+            open_form(bot, driver)
+            server.asset_requests = 0
+            report[profile] = scenario_page_load(bot, driver, args.page_loads)
+            report[profile]["asset_requests"] = server.asset_requests
+        finally:
+            driver.quit()
+            server.stop()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark a country script against the AIS stand-in.")
+    parser.add_argument("--country", choices=sorted(COUNTRIES), default="kenya")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--ajax-latency", type=float, default=0.3)
+    parser.add_argument("--page-latency", type=float, default=0.0)
+    parser.add_argument("--warning-gate", action="store_true")
+    parser.add_argument("--legacy-scan", action="store_true", help="use the day-by-day datepicker walk")
+    parser.add_argument("--no-sweep", action="store_true", help="check cities one by one instead of sweeping")
+    parser.add_argument("--window-days", type=int, default=90)
+    parser.add_argument("--release-after", type=float, default=5.0)
+    parser.add_argument("--poll-interval", type=float, default=0.0)
+    parser.add_argument("--detection-timeout", type=float, default=300.0)
+    parser.add_argument("--profile", choices=("lean", "full"), default="lean", help="browser profile to benchmark")
+    parser.add_argument("--page-loads", type=int, default=10)
+    parser.add_argument("--commit-runs", type=int, default=5, help="DRY_RUN bookings to time (0 skips)")
+    parser.add_argument("--compare-profiles", action="store_true",
+                        help="only measure page-load time and RSS for the full vs. lean profile")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--record", help="also record datepicker/form fixtures to this archive")
+    args = parser.parse_args()
+
+    if args.compare_profiles:
+        report = {"country": args.country, "profiles": compare_profiles(args)}
+        print(json.dumps(report, indent=2, default=str))
+        if args.json:
+            Path(args.json).write_text(json.dumps(report, indent=2, default=str))
+        return
+
+    config = StandInConfig(ajax_latency=args.ajax_latency, page_latency=args.page_latency,
+                           warning_gate=args.warning_gate)
+    server = StandInServer(config).start()
+    bot = load_bot(args.country, server)
+    bot.CITIES = COUNTRIES[args.country]["cities"]
+    bot.DATE_RANGE_START_DT = datetime.today() + timedelta(days=1)
+    bot.DATE_RANGE_END_DT = datetime.today() + timedelta(days=args.window_days)
+    bot.SINGLE_PASS_SCAN = not args.legacy_scan
+    bot.SWEEP_MODE = not args.no_sweep and not args.legacy_scan
+    if args.record:
+        bot.recorder.configure(args.record, bot.instrumentation.context)
+
+    driver = build_headless_driver(lean=args.profile == "lean")
+    counter = count_commands(driver)
+    report = {
+        "country": args.country,
+        "profile": args.profile,
+        "scan": "legacy" if args.legacy_scan else "single_pass",
+        "sweep": bot.SWEEP_MODE,
+        "window_days": args.window_days,
+        "ajax_latency": args.ajax_latency,
+        "page_latency": args.page_latency,
+    }
+    try:
+        counter.clear()
+        started = time.perf_counter()
+        open_form(bot, driver)
+        report["setup"] = {"wall_s": time.perf_counter() - started, "commands": sum(counter.values())}
+
+        late = args.window_days - 5
+        report["cycles_late_slot"] = scenario_cycles(bot, driver, counter, server, args.cycles, [late])
+        report["cycles_empty"] = scenario_empty(bot, driver, counter, server, args.cycles)
+        report["detection"] = scenario_detection(
+            bot, driver, counter, server, args.release_after, late, args.poll_interval, args.detection_timeout
+        )
+        if args.commit_runs:
+            report["commit"] = scenario_commit(bot, driver, counter, server, args.commit_runs, late)
+        report["page_load"] = scenario_page_load(bot, driver, args.page_loads)
+    finally:
+        driver.quit()
+        server.stop()
+        bot.recorder.close()
+    report["steps"] = bot.instrumentation.summary()
+
+    print(json.dumps(report, indent=2, default=str))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
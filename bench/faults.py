@@ -0,0 +1,277 @@
+"""
+Fault-injection suite for the recovery paths, with measured recovery times (RTO).
+
+Drives the real kenya/main.py or south_africa/main.py functions against the offline AIS
+stand-in, one main()-loop iteration at a time (reload -> recover() -> sweep, without the
+sleep), and injects one fault per scenario:
+
+    sign_out    every session is signed out by the next days.json call (mid-cycle)
+    slow_ajax   the next days.json calls take --slow-ajax-latency seconds
+    stale       the datepicker/date input nodes are replaced on every month step
+    crash       chromedriver is killed between cycles
+    sweep_crash the Chrome browser is killed on the sweep's next month step
+    gate        the confirmed_limit_message gate comes back for the signed-in session
+
+The only open slot sits --window-days - 5 days out, beyond the two months the picker opens
+on, so every sweep has to step months to find it. A cycle is clean when it read every
+facility, found that slot everywhere and stepped the datepicker at least once; the warm-up
+cycle must be clean or the run stops.
+
+RTO is the time from injecting the fault until the end of the first clean cycle. The poll
+sleep is excluded, so with the real cadence add one wait. An exception that escapes a cycle
+would have ended main(), so it fails the scenario.
+
+The report (--json) is machine-readable; the exit status is 1 when a scenario did not
+recover, exceeded its budget (--budget NAME=SECONDS), or regressed past --tolerance times
+the RTO recorded in a --baseline report.
+
+    python bench/faults.py --country kenya --json faults_kenya.json
+    python bench/faults.py --country south_africa --fault crash --fault gate --repeat 3
+    python bench/faults.py --baseline faults_kenya.json --tolerance 1.5
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from selenium.common.exceptions import WebDriverException
+
+from benchmark import COUNTRIES, load_bot
+from standin import StandInConfig, StandInServer, days_from_today
+
+import common.datepicker as datepicker  # noqa: E402  (on sys.path via benchmark)
+from common.browser import browser_pids  # noqa: E402
+
+# Seconds; sign_out/slow_ajax include one FACILITY_READY_TIMEOUT (20s) for the facility
+# whose days never arrive, plus a login or a normal cycle after it
+DEFAULT_BUDGETS = {
+    "sign_out": 60.0,
+    "slow_ajax": 60.0,
+    "stale": 20.0,
+    "crash": 60.0,
+    "sweep_crash": 60.0,
+    "gate": 20.0,
+}
+# Regressions under this many seconds are noise on a local stand-in
+BASELINE_SLACK = 2.0
+
+
+class MonthSteps:
+    """
+    Wraps common.datepicker.step_calendar (what scan_available_dates calls per month step):
+    counts the steps taken and, once armed, kills the Chrome browser just before the next one.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.crash_next = False
+        self._step = datepicker.step_calendar
+        datepicker.step_calendar = self
+
+    def __call__(self, driver, direction):
+        if self.crash_next:
+            self.crash_next = False
+            for pid in browser_pids(driver)[1:]:  # everything under chromedriver
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        snapshot = self._step(driver, direction)
+        if snapshot is not None:
+            self.count += 1
+        return snapshot
+
+
+def poll_cycle(bot, driver, steps: MonthSteps, late_slot: date):
+    """One main() iteration without the sleep. Returns (driver, clean: every facility read
+    with late_slot found, and at least one month step taken)."""
+    stepped = steps.count
+    try:
+        with bot.span("reload"):
+            driver.get(bot.APPOINTMENT_URL)
+    except WebDriverException:
+        bot.log("[WARNING] Refresh failed; recovering session.")
+    driver = bot.recover(driver)
+    snapshot = bot.sweep_cities(driver)
+    found = all(entry.ok and late_slot in entry.dates for entry in snapshot.facilities)
+    return driver, found and steps.count > stepped
+
+
+def inject(fault: str, server: StandInServer, driver, steps: MonthSteps, args) -> None:
+    cfg = server.config
+    if fault == "sign_out":
+        cfg.sign_out_on_ajax = 1
+    elif fault == "slow_ajax":
+        cfg.slow_ajax_latency = args.slow_ajax_latency
+        cfg.slow_ajax = args.slow_ajax_calls
+    elif fault == "stale":
+        cfg.stale_on_navigation = 1
+    elif fault == "crash":
+        os.kill(driver.service.process.pid, signal.SIGKILL)
+    elif fault == "sweep_crash":
+        steps.crash_next = True
+    elif fault == "gate":
+        server.reset_warning_gate()
+    else:
+        raise ValueError(f"unknown fault {fault!r}")
+
+
+def clear_faults(server: StandInServer) -> None:
+    cfg = server.config
+    cfg.sign_out_on_ajax = cfg.slow_ajax = cfg.stale_on_navigation = 0
+    cfg.warning_gate = False
+
+
+def run_fault(bot, server: StandInServer, driver, fault: str, steps: MonthSteps, late_slot: date, args):
+    """Inject `fault` once and poll until a clean cycle. Returns (driver, run record)."""
+    logins = server.logins
+    stepped = steps.count
+    inject(fault, server, driver, steps, args)
+    injected = time.perf_counter()
+    run = {"recovered": False, "rto_s": None, "cycles": 0, "rebuilt": False, "error": None}
+    while run["cycles"] < args.max_cycles:
+        run["cycles"] += 1
+        previous = driver
+        try:
+            driver, ok = poll_cycle(bot, driver, steps, late_slot)
+        except Exception as e:  # main() would have exited here
+            run["error"] = f"{e.__class__.__name__}: {e}"
+            break
+        run["rebuilt"] = run["rebuilt"] or driver is not previous
+        if ok:
+            run["recovered"] = True
+            run["rto_s"] = round(time.perf_counter() - injected, 3)
+            break
+    run["logins"] = server.logins - logins
+    run["month_steps"] = steps.count - stepped
+    steps.crash_next = False
+    clear_faults(server)
+    return driver, run
+
+
+def judge(name: str, runs: list, budget: float, baseline: dict, tolerance: float) -> dict:
+    rtos = [r["rto_s"] for r in runs if r["recovered"]]
+    result = {
+        "runs": runs,
+        "budget_s": budget,
+        "rto_s": max(rtos) if len(rtos) == len(runs) else None,
+        "rto_p50_s": round(statistics.median(rtos), 3) if rtos else None,
+        "passed": True,
+        "reason": "",
+    }
+    previous = (baseline.get(name) or {}).get("rto_s")
+    if result["rto_s"] is None:
+        result["passed"], result["reason"] = False, "did not recover"
+    elif result["rto_s"] > budget:
+        result["passed"], result["reason"] = False, f"RTO {result['rto_s']:.1f}s over budget {budget:.0f}s"
+    elif previous is not None and result["rto_s"] > max(previous * tolerance, previous + BASELINE_SLACK):
+        result["passed"], result["reason"] = False, f"RTO {result['rto_s']:.1f}s vs baseline {previous:.1f}s"
+    if previous is not None:
+        result["baseline_rto_s"] = previous
+    return result
+
+
+def parse_budgets(specs) -> dict:
+    budgets = dict(DEFAULT_BUDGETS)
+    for spec in specs:
+        name, _, seconds = spec.partition("=")
+        if name not in budgets:
+            raise SystemExit(f"--budget: unknown fault {name!r}")
+        budgets[name] = float(seconds)
+    return budgets
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inject faults into a country script and measure recovery time.")
+    parser.add_argument("--country", choices=sorted(COUNTRIES), default="kenya")
+    parser.add_argument("--fault", action="append", choices=sorted(DEFAULT_BUDGETS),
+                        help="fault to run (repeatable; default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per fault; the worst RTO is judged")
+    parser.add_argument("--max-cycles", type=int, default=4, help="cycles to wait for recovery per run")
+    parser.add_argument("--ajax-latency", type=float, default=0.3)
+    parser.add_argument("--slow-ajax-latency", type=float, default=25.0)
+    parser.add_argument("--slow-ajax-calls", type=int, default=1)
+    parser.add_argument("--window-days", type=int, default=90)
+    parser.add_argument("--budget", action="append", default=[], metavar="FAULT=SECONDS")
+    parser.add_argument("--baseline", help="earlier --json report to compare RTOs against")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.budget)
+    baseline = {}
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text()).get("faults", {})
+
+    server = StandInServer(StandInConfig(ajax_latency=args.ajax_latency)).start()
+    bot = load_bot(args.country, server)
+    bot.CITIES = COUNTRIES[args.country]["cities"]
+    bot.DATE_RANGE_START_DT = datetime.today() + timedelta(days=1)
+    bot.DATE_RANGE_END_DT = datetime.today() + timedelta(days=args.window_days)
+    bot.SINGLE_PASS_SCAN = True
+    bot.SWEEP_MODE = True
+    # One late slot, past the picker's first view, so every sweep has to step months to find it
+    late_slot = date.today() + timedelta(days=args.window_days - 5)
+    server.config.availability = {city: days_from_today(args.window_days - 5) for city in bot.CITIES}
+    steps = MonthSteps()
+
+    report = {
+        "country": args.country,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "ajax_latency": args.ajax_latency,
+        "window_days": args.window_days,
+        "late_slot": late_slot.isoformat(),
+        "faults": {},
+    }
+    driver = bot.build_driver()
+    try:
+        started = time.perf_counter()
+        driver, ok = poll_cycle(bot, driver, steps, late_slot)
+        if not ok:
+            raise SystemExit(f"stand-in: the warm-up cycle did not find {late_slot} at every facility "
+                             f"by stepping the datepicker ({steps.count} month step(s); --window-days too short?)")
+        report["clean_cycle_s"] = round(time.perf_counter() - started, 3)
+        report["clean_cycle_month_steps"] = steps.count
+
+        for fault in args.fault or sorted(DEFAULT_BUDGETS):
+            runs = []
+            for _ in range(args.repeat):
+                driver, run = run_fault(bot, server, driver, fault, steps, late_slot, args)
+                runs.append(run)
+                bot.log(f"[FAULT] {fault}: " + (f"recovered in {run['rto_s']:.2f}s over {run['cycles']} cycle(s)"
+                                                if run["recovered"] else f"not recovered ({run['error'] or 'no clean cycle'})"))
+                if run["error"]:
+                    # Start the next run from a working session, as a restarted bot would
+                    try:
+                        driver.quit()
+                    except Exception:
+                        pass
+                    driver = bot.build_driver()
+                    driver, _ = poll_cycle(bot, driver, steps, late_slot)
+            report["faults"][fault] = judge(fault, runs, budgets[fault], baseline, args.tolerance)
+    finally:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        bot.STANDBY.close()
+        server.stop()
+
+    report["passed"] = all(f["passed"] for f in report["faults"].values())
+    print(json.dumps(report, indent=2, default=str))
+    for name, result in report["faults"].items():
+        rto = f"{result['rto_s']:.2f}s" if result["rto_s"] is not None else "-"
+        print(f"{name:<10} rto={rto:<8} budget={result['budget_s']:.0f}s {'ok' if result['passed'] else 'FAIL: ' + result['reason']}",
+              file=sys.stderr)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, default=str))
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Notification dispatcher against the local SMTP stand-in.
+
+Measures how long enqueue() holds up the caller, how long until the sink has every
+message, and how many connects/logins that took, optionally with forced disconnects
+and transient 421s.
+
+    python bench/notify_bench.py --messages 20 --drop-every 5 --fail-next 2
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from smtp_standin import SMTPStandIn
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from common.instrumentation import percentile  # noqa: E402
+from common.notify import NotificationDispatcher, split_recipients  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the notification dispatcher offline.")
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--gap", type=float, default=0.0, help="seconds between enqueues")
+    parser.add_argument("--batch-window", type=float, default=0.2)
+    parser.add_argument("--drop-every", type=int, default=0)
+    parser.add_argument("--fail-next", type=int, default=0)
+    parser.add_argument("--reply-latency", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    sink = SMTPStandIn(drop_every=args.drop_every, fail_next=args.fail_next,
+                       reply_latency=args.reply_latency).start()
+    quiet = (lambda message: None) if args.json else print
+    dispatcher = NotificationDispatcher(
+        "bot@example.test", "secret",
+        split_recipients("me@example.test, you@example.test", "5551234@sms.example.test"),
+        quiet, host="127.0.0.1", port=sink.port, use_ssl=False,
+        backoff_seconds=0.1, batch_window=args.batch_window,
+    )
+
+    enqueue_us = []
+    started = time.perf_counter()
+    for i in range(args.messages):
+        t0 = time.perf_counter()
+        dispatcher.enqueue("Visa Date Found", f"message {i}")
+        enqueue_us.append((time.perf_counter() - t0) * 1e6)
+        if args.gap:
+            time.sleep(args.gap)
+    dispatcher.stop()
+    drained = time.perf_counter() - started
+    sink.stop()
+
+    report = {
+        "messages": args.messages,
+        "delivered": dispatcher.sent,
+        "failed": dispatcher.failed,
+        "smtp_transactions": len(sink.messages),
+        "connections": sink.connections,
+        "logins": sink.logins,
+        "dispatcher_connects": dispatcher.connects,
+        "enqueue_us_p50": round(percentile(enqueue_us, 50), 1),
+        "enqueue_us_max": round(max(enqueue_us), 1),
+        "drain_seconds": round(drained, 3),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>20}: {value}")
+
+
+if __name__ == "__main__":
+    main()
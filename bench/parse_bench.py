@@ -0,0 +1,124 @@
+"""
+Datepicker/form parser over thousands of fixtures, without a browser.
+
+By default it renders synthetic two-month pickers (the same markup as bench/standin.py's
+renderGroup, random open days, random window) and checks every parse against the days
+that were rendered, so it doubles as a deterministic correctness run. With --archive it
+parses a recorded archive (RECORD_FIXTURES) instead.
+
+    python bench/parse_bench.py --fixtures 5000
+    python bench/parse_bench.py --archive visa_fixtures.jsonl.gz --json
+"""
+import argparse
+import calendar
+import json
+import random
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from common.fixtures import iter_fixtures  # noqa: E402
+from common.formparse import parse_form  # noqa: E402
+from common.instrumentation import percentile  # noqa: E402
+
+MONTHS = list(calendar.month_name)[1:]
+
+
+def render_group(year: int, month: int, cls: str, open_days: set, with_prev: bool, with_next: bool,
+                 prev_disabled: bool = False) -> str:
+    html = f'<div class="ui-datepicker-group {cls}"><div class="ui-datepicker-header">'
+    if with_prev:
+        html += (f'<a class="ui-datepicker-prev ui-corner-all{" ui-state-disabled" if prev_disabled else ""}" '
+                 'data-handler="prev" title="Prev"><span>Prev</span></a>')
+    if with_next:
+        html += '<a class="ui-datepicker-next ui-corner-all" data-handler="next" title="Next"><span>Next</span></a>'
+    html += (f'<div class="ui-datepicker-title"><span class="ui-datepicker-month">{MONTHS[month - 1]}</span>'
+             f'&nbsp;<span class="ui-datepicker-year">{year}</span></div></div>')
+    html += '<table class="ui-datepicker-calendar"><tbody><tr>'
+    first = (date(year, month, 1).weekday() + 1) % 7  # Sunday-first, like the site
+    html += '<td class="ui-datepicker-other-month">&#xa0;</td>' * first
+    for d in range(1, calendar.monthrange(year, month)[1] + 1):
+        if (first + d - 1) % 7 == 0 and d != 1:
+            html += "</tr><tr>"
+        if date(year, month, d) in open_days:
+            html += (f'<td data-handler="selectDay" data-event="click" data-month="{month - 1}" '
+                     f'data-year="{year}"><a class="ui-state-default" href="#">{d}</a></td>')
+        else:
+            html += f'<td class="ui-datepicker-unselectable ui-state-disabled"><span class="ui-state-default">{d}</span></td>'
+    return html + "</tr></tbody></table></div>"
+
+
+def synthetic_fixture(rng: random.Random) -> tuple:
+    """(html, expected months, expected days, expected times) for one random form + picker."""
+    year, month = rng.randint(2025, 2027), rng.randint(1, 12)
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    open_days = set()
+    for y, m in ((year, month), (next_year, next_month)):
+        for d in range(1, calendar.monthrange(y, m)[1] + 1):
+            if rng.random() < 0.08:
+                open_days.add(date(y, m, d))
+    times = sorted(rng.sample(["08:00", "08:15", "08:30", "09:00", "09:30", "10:15", "11:00"], rng.randint(0, 4)))
+    form = ('<form action="/en-ke/niv/schedule/1/appointment">'
+            '<select id="appointments_consulate_appointment_facility_id"><option value=""></option>'
+            '<option value="101" selected="selected">Nairobi</option><option value="102">Mombasa</option></select>'
+            '<input type="text" id="appointments_consulate_appointment_date" readonly>'
+            '<select id="appointments_consulate_appointment_time"><option value=""></option>'
+            + "".join(f'<option value="{t}">{t}</option>' for t in times) + "</select></form>")
+    picker = ('<div id="ui-datepicker-div" class="ui-datepicker ui-datepicker-multi ui-datepicker-multi-2">'
+              + render_group(year, month, "ui-datepicker-group-first", open_days, True, False, rng.random() < 0.3)
+              + render_group(next_year, next_month, "ui-datepicker-group-last", open_days, False, True)
+              + "</div>")
+    return form + picker, [(year, month), (next_year, next_month)], open_days, times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Selenium-free form/datepicker parser.")
+    parser.add_argument("--fixtures", type=int, default=5000, help="synthetic fixtures to generate")
+    parser.add_argument("--archive", help="parse a recorded fixture archive instead")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.archive:
+        cases = [(entry["html"], None, None, None) for entry in iter_fixtures(args.archive) if entry.get("html")]
+    else:
+        rng = random.Random(args.seed)
+        cases = [synthetic_fixture(rng) for _ in range(args.fixtures)]
+    if not cases:
+        raise SystemExit("No fixtures to parse.")
+
+    timings_us, mismatches, days_read = [], 0, 0
+    for html, months, days, times in cases:
+        t0 = time.perf_counter()
+        state = parse_form(html)
+        timings_us.append((time.perf_counter() - t0) * 1e6)
+        days_read += len(state.calendar.days)
+        if months is not None and (state.calendar.months != months or state.calendar.days != days
+                                   or state.times != times or state.selected_facility != "Nairobi"):
+            mismatches += 1
+
+    report = {
+        "fixtures": len(cases),
+        "source": args.archive or "synthetic",
+        "mean_bytes": round(sum(len(c[0]) for c in cases) / len(cases)),
+        "p50_us": round(percentile(timings_us, 50), 1),
+        "p95_us": round(percentile(timings_us, 95), 1),
+        "parses_per_s": round(len(cases) / (sum(timings_us) / 1e6)),
+        "days_read": days_read,
+        "mismatches": mismatches if not args.archive else None,
+    }
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:<13} {value}")
+    if mismatches:
+        raise SystemExit(f"{mismatches} fixture(s) parsed differently from what was rendered.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Local SMTP stand-in for exercising common/notify.py without Gmail.
+
+Speaks just enough SMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA,
+RSET, NOOP, QUIT. Every accepted message is kept in `server.messages`. Faults can be
+switched on while it runs:
+- drop_every: close the connection after every N-th accepted message (forces reconnect + re-login)
+- fail_next:  answer the next N transactions with 421 (forces retry + backoff)
+- reply_latency: sleep before each reply (slow relay)
+
+Run standalone:
+    python bench/smtp_standin.py --port 2525
+    SMTP_HOST=127.0.0.1 SMTP_PORT=2525 python kenya/main.py
+"""
+import argparse
+import base64
+import socketserver
+import threading
+import time
+from typing import List, Optional
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        if self.server.reply_latency:
+            time.sleep(self.server.reply_latency)
+        self.wfile.write((line + "\r\n").encode("ascii"))
+        self.wfile.flush()
+
+    def _readline(self) -> Optional[str]:
+        raw = self.rfile.readline()
+        if not raw:
+            return None
+        return raw.decode("utf-8", "replace").rstrip("\r\n")
+
+    def _read_data(self) -> str:
+        lines = []
+        while True:
+            line = self._readline()
+            if line is None or line == ".":
+                break
+            lines.append(line[1:] if line.startswith("..") else line)
+        return "\n".join(lines)
+
+    def handle(self) -> None:
+        srv = self.server
+        with srv.lock:
+            srv.connections += 1
+        self._reply("220 smtp-standin ESMTP ready")
+        sender, recipients = None, []
+        while True:
+            line = self._readline()
+            if line is None:
+                return
+            verb, _, arg = line.partition(" ")
+            verb = verb.upper()
+
+            if verb in ("EHLO", "HELO"):
+                if verb == "EHLO":
+                    self._reply("250-smtp-standin")
+                    self._reply("250 AUTH PLAIN LOGIN")
+                else:
+                    self._reply("250 smtp-standin")
+            elif verb == "AUTH":
+                mech, _, initial = arg.partition(" ")
+                if mech.upper() == "LOGIN":
+                    self._reply("334 " + base64.b64encode(b"Username:").decode())
+                    self._readline()
+                    self._reply("334 " + base64.b64encode(b"Password:").decode())
+                    self._readline()
+                elif not initial:
+                    self._reply("334 ")
+                    self._readline()
+                with srv.lock:
+                    srv.logins += 1
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                with srv.lock:
+                    refuse = srv.fail_next > 0
+                    if refuse:
+                        srv.fail_next -= 1
+                if refuse:
+                    self._reply("421 4.3.0 Service temporarily unavailable")
+                    return
+                sender, recipients = arg.split(":", 1)[-1].strip("<> "), []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(arg.split(":", 1)[-1].strip("<> "))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                body = self._read_data()
+                with srv.lock:
+                    srv.messages.append({"from": sender, "to": list(recipients), "data": body,
+                                         "received_at": time.time()})
+                    drop = srv.drop_every and len(srv.messages) % srv.drop_every == 0
+                self._reply("250 OK queued")
+                if drop:
+                    return
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, drop_every: int = 0,
+                 fail_next: int = 0, reply_latency: float = 0.0):
+        super().__init__((host, port), SMTPStandInHandler)
+        self.drop_every = drop_every
+        self.fail_next = fail_next
+        self.reply_latency = reply_latency
+        self.lock = threading.Lock()
+        self.messages: List[dict] = []
+        self.connections = 0
+        self.logins = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "SMTPStandIn":
+        self._thread = threading.Thread(target=self.serve_forever, name="smtp-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local SMTP sink.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--drop-every", type=int, default=0)
+    parser.add_argument("--reply-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = SMTPStandIn(args.host, args.port, drop_every=args.drop_every, reply_latency=args.reply_latency)
+    print(f"SMTP stand-in on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for msg in server.messages:
+            print(f"{msg['from']} -> {', '.join(msg['to'])}")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,566 @@
+"""
+Offline stand-in for the AIS pages the bots touch, served from the stdlib HTTP server.
+
+Reproduces just enough markup and behaviour for kenya/main.py and south_africa/main.py:
+- /<locale>/niv/users/sign_in (user_email, user_password, policy_confirmed, commit)
+- the group dashboard with its "Continue" link and the reschedule accordion
+- the confirmed_limit_message warning gate
+- the appointment form: facility dropdown, AJAX-loaded days, jQuery-UI-shaped
+  two-month datepicker and the time select
+
+Availability, latency and one-shot faults (used by bench/faults.py) live in StandInConfig
+and can be changed while the server runs (in-process, or by POSTing JSON to
+/__standin/config).
+
+Run standalone:
+    python bench/standin.py --port 8000 --facility Nairobi=2026-01-10,2026-02-03
+"""
+import argparse
+import json
+import secrets
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+SESSION_COOKIE = "_yatri_session"
+
+
+@dataclass
+class StandInConfig:
+    account_id: str = "12345"
+    # facility name -> numeric id (matches the AIS dropdown)
+    facilities: Dict[str, int] = field(default_factory=lambda: {
+        "Nairobi": 101, "Cape Town": 102, "Durban": 103, "Johannesburg": 104,
+    })
+    # facility name -> ISO dates that are bookable
+    availability: Dict[str, List[str]] = field(default_factory=dict)
+    # facility name -> epoch seconds before which its availability is hidden
+    release_at: Dict[str, float] = field(default_factory=dict)
+    times: List[str] = field(default_factory=lambda: ["08:00", "08:15", "09:30"])
+    # Seconds added to every HTML page / the days.json call / the times.json call
+    page_latency: float = 0.0
+    ajax_latency: float = 0.3
+    times_latency: float = 0.0
+    # Show the "I understand" gate before the appointment form
+    warning_gate: bool = False
+    # Images/fonts embedded in every page, like the real site's banners and web fonts
+    asset_count: int = 4
+    asset_bytes: int = 150_000
+    asset_latency: float = 0.05
+    # One-shot faults, each a count that is used up as it fires:
+    # the next N days.json calls sign every session out (the XHR lands on the sign-in page) /
+    # take slow_ajax_latency seconds; the next N appointment pages swap in fresh datepicker and
+    # date input nodes on every month step, so WebElements held across a step go stale
+    sign_out_on_ajax: int = 0
+    slow_ajax: int = 0
+    slow_ajax_latency: float = 25.0
+    stale_on_navigation: int = 0
+
+    def visible_days(self, facility: str, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        if self.release_at.get(facility, 0) > now:
+            return []
+        return sorted(self.availability.get(facility, []))
+
+    def facility_by_id(self, facility_id: int) -> Optional[str]:
+        return next((name for name, fid in self.facilities.items() if fid == facility_id), None)
+
+    def update(self, values: dict) -> None:
+        for key, value in values.items():
+            if not hasattr(self, key):
+                raise KeyError(key)
+            setattr(self, key, value)
+
+
+def days_from_today(*offsets: int) -> List[str]:
+    return [(date.today() + timedelta(days=o)).isoformat() for o in offsets]
+
+
+def _render(template: str, **values) -> str:
+    for key, value in values.items():
+        template = template.replace("{{" + key + "}}", str(value))
+    return template
+
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{{title}}</title>
+<style>
+  body { font-family: sans-serif; }
+  .hidden { display: none; }
+  #ui-datepicker-div { position: absolute; background: #fff; border: 1px solid #999; }
+  .ui-datepicker-group { display: inline-block; vertical-align: top; margin: 4px; }
+  td a { padding: 2px 4px; }
+  .reveal { position: fixed; top: 30%; left: 30%; background: #fff; border: 1px solid #333; padding: 1em; }
+</style>
+</head><body>
+<header><a href="{{prefix}}/users/sign_out">Sign Out</a></header>
+{{assets}}
+{{body}}
+</body></html>"""
+
+SIGN_IN = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Sign In</title></head><body>
+<h1>Sign In</h1>
+<p class="error">{{error}}</p>
+<form action="{{prefix}}/users/sign_in" method="post">
+  <input type="email" id="user_email" name="user[email]">
+  <input type="password" id="user_password" name="user[password]">
+  <div class="icheckbox"><input type="checkbox" id="policy_confirmed" name="policy_confirmed" value="1"></div>
+  <input type="submit" name="commit" value="Sign In">
+</form>
+</body></html>"""
+
+GROUP = """
+<h2>Groups</h2>
+<a class="button primary small" href="{{prefix}}/schedule/{{account}}/continue_actions">Continue</a>
+"""
+
+CONTINUE_ACTIONS = """
+<h2>What would you like to do?</h2>
+<ul class="accordion">
+  <li class="accordion-item">
+    <a class="accordion-title" href="#" onclick="document.getElementById('reschedule-content').classList.remove('hidden'); return false;">Reschedule Appointment</a>
+    <div id="reschedule-content" class="accordion-content hidden">
+      <a class="button small primary" href="{{prefix}}/schedule/{{account}}/appointment">Reschedule Appointment</a>
+    </div>
+  </li>
+</ul>
+"""
+
+WARNING = """
+<h2>Limited rescheduling</h2>
+<form action="{{prefix}}/schedule/{{account}}/appointment/confirm_limit" method="post">
+  <div class="icheckbox" onclick="if (event.target === this) { var cb = this.querySelector('input'); cb.checked = !cb.checked; }">
+    <input type="checkbox" id="confirmed_limit_message" name="confirmed_limit_message" value="1">
+  </div>
+  <label for="confirmed_limit_message">I understand</label>
+  <input type="submit" name="commit" value="Continue">
+</form>
+"""
+
+APPOINTMENT = """
+<h2>Reschedule Appointment</h2>
+<form id="appointment-form" action="{{prefix}}/schedule/{{account}}/appointment" method="post">
+  <select id="appointments_consulate_appointment_facility_id" name="appointments[consulate_appointment][facility_id]">
+    <option value=""></option>
+    {{options}}
+  </select>
+  <input type="text" id="appointments_consulate_appointment_date" name="appointments[consulate_appointment][date]" readonly disabled>
+  <select id="appointments_consulate_appointment_time" name="appointments[consulate_appointment][time]">
+    <option value=""></option>
+  </select>
+  <input type="submit" name="commit" value="Reschedule" id="appointments_submit">
+  <div id="confirm-modal" class="reveal hidden">
+    <p>Are you sure?</p>
+    <button type="button" onclick="document.getElementById('appointment-form').submit();">Confirm</button>
+    <a href="#" onclick="document.getElementById('confirm-modal').classList.add('hidden'); return false;">Cancel</a>
+  </div>
+</form>
+<div id="ui-datepicker-div" class="ui-datepicker ui-datepicker-multi ui-datepicker-multi-2 hidden"></div>
+<script>
+(function () {
+  var base = "{{prefix}}/schedule/{{account}}/appointment";
+  var MONTHS = ["January","February","March","April","May","June","July","August",
+                "September","October","November","December"];
+  var staleSteps = {{stale_steps}};
+  var facility = document.getElementById("appointments_consulate_appointment_facility_id");
+  var input = document.getElementById("appointments_consulate_appointment_date");
+  var timeSelect = document.getElementById("appointments_consulate_appointment_time");
+  var picker = document.getElementById("ui-datepicker-div");
+  var today = new Date(); today.setHours(0, 0, 0, 0);
+  var state = { year: today.getFullYear(), month: today.getMonth(), days: {}, times: {} };
+  window.__standin = state;
+
+  function key(y, m, d) {
+    return y + "-" + String(m + 1).padStart(2, "0") + "-" + String(d).padStart(2, "0");
+  }
+
+  function renderGroup(y, m, cls, withPrev, withNext) {
+    var html = '<div class="ui-datepicker-group ' + cls + '"><div class="ui-datepicker-header">';
+    if (withPrev) {
+      var atMin = (y < today.getFullYear()) || (y === today.getFullYear() && m <= today.getMonth());
+      html += '<a class="ui-datepicker-prev ui-corner-all' + (atMin ? ' ui-state-disabled' : '') +
+              '" data-handler="prev" title="Prev"><span>Prev</span></a>';
+    }
+    if (withNext) {
+      html += '<a class="ui-datepicker-next ui-corner-all" data-handler="next" title="Next"><span>Next</span></a>';
+    }
+    html += '<div class="ui-datepicker-title"><span class="ui-datepicker-month">' + MONTHS[m] +
+            '</span>&nbsp;<span class="ui-datepicker-year">' + y + '</span></div></div>';
+    html += '<table class="ui-datepicker-calendar"><tbody><tr>';
+    var first = new Date(y, m, 1).getDay();
+    for (var i = 0; i < first; i++) { html += '<td class="ui-datepicker-other-month">&#xa0;</td>'; }
+    var count = new Date(y, m + 1, 0).getDate();
+    for (var d = 1; d <= count; d++) {
+      if ((first + d - 1) % 7 === 0 && d !== 1) { html += '</tr><tr>'; }
+      if (state.days[key(y, m, d)] && new Date(y, m, d) >= today) {
+        html += '<td data-handler="selectDay" data-event="click" data-month="' + m + '" data-year="' + y +
+                '"><a class="ui-state-default" href="#">' + d + '</a></td>';
+      } else {
+        html += '<td class="ui-datepicker-unselectable ui-state-disabled"><span class="ui-state-default">' + d + '</span></td>';
+      }
+    }
+    return html + '</tr></tbody></table></div>';
+  }
+
+  function render() {
+    var nm = state.month + 1, ny = state.year;
+    if (nm > 11) { nm = 0; ny += 1; }
+    picker.innerHTML = renderGroup(state.year, state.month, "ui-datepicker-group-first", true, false) +
+                       renderGroup(ny, nm, "ui-datepicker-group-last", false, true);
+  }
+
+  function fillTimes(list) {
+    timeSelect.innerHTML = '<option value=""></option>' + list.map(function (t) {
+      return '<option value="' + t + '">' + t + '</option>';
+    }).join("");
+  }
+
+  function loadDays() {
+    input.disabled = true;
+    input.value = "";
+    fillTimes([]);
+    if (!facility.value) { return; }
+    var xhr = new XMLHttpRequest();
+    xhr.open("GET", base + "/days/" + facility.value + ".json?appointments[expedite]=false");
+    xhr.onload = function () {
+      state.days = {}; state.times = {};
+      JSON.parse(xhr.responseText).forEach(function (d) {
+        state.days[d.date] = true;
+        if (d.times) { state.times[d.date] = d.times; }
+      });
+      input.disabled = false;
+    };
+    xhr.send();
+  }
+
+  function selectDay(y, m, d) {
+    var date = key(y, m, d);
+    input.value = date;
+    picker.classList.add("hidden");
+    if (state.times[date]) { fillTimes(state.times[date]); return; }
+    var xhr = new XMLHttpRequest();
+    xhr.open("GET", base + "/times/" + facility.value + ".json?date=" + date);
+    xhr.onload = function () { fillTimes(JSON.parse(xhr.responseText).available_times); };
+    xhr.send();
+  }
+
+  function onInputClick() {
+    if (input.disabled) { return; }
+    var r = input.getBoundingClientRect();
+    picker.style.top = (r.bottom + window.scrollY) + "px";
+    picker.style.left = (r.left + window.scrollX) + "px";
+    render();
+    picker.classList.remove("hidden");
+  }
+
+  // Fault injection: same ids and state, new nodes (what a framework re-render does)
+  function replaceNodes() {
+    var freshInput = input.cloneNode(true);
+    freshInput.value = input.value;
+    freshInput.disabled = input.disabled;
+    input.parentNode.replaceChild(freshInput, input);
+    input = freshInput;
+    input.addEventListener("click", onInputClick);
+    var freshPicker = picker.cloneNode(false);
+    picker.parentNode.replaceChild(freshPicker, picker);
+    picker = freshPicker;
+    picker.addEventListener("click", onPickerClick);
+  }
+
+  function onPickerClick(ev) {
+    var el = ev.target.closest("[data-handler]");
+    if (!el || el.classList.contains("ui-state-disabled")) { return; }
+    ev.preventDefault();
+    var handler = el.getAttribute("data-handler");
+    if (handler === "prev" || handler === "next") {
+      state.month += handler === "prev" ? -1 : 1;
+      if (state.month < 0) { state.month = 11; state.year -= 1; }
+      if (state.month > 11) { state.month = 0; state.year += 1; }
+      if (staleSteps) { replaceNodes(); }
+      render();
+    } else if (handler === "selectDay") {
+      selectDay(parseInt(el.getAttribute("data-year"), 10), parseInt(el.getAttribute("data-month"), 10),
+                parseInt(el.textContent, 10));
+    }
+  }
+
+  facility.addEventListener("change", loadDays);
+  input.addEventListener("click", onInputClick);
+  picker.addEventListener("click", onPickerClick);
+  document.getElementById("appointments_submit").addEventListener("click", function (ev) {
+    ev.preventDefault();
+    document.getElementById("confirm-modal").classList.remove("hidden");
+  });
+
+  facility.selectedIndex = 1;
+  loadDays();
+})();
+</script>
+"""
+
+BOOKED = """
+<h2>You have successfully scheduled your visa appointment</h2>
+<p id="booked">{{facility}} {{date}} {{time}}</p>
+"""
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: "StandInServer"
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    # --- helpers -------------------------------------------------------
+
+    def _session(self) -> Optional[dict]:
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        token = cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+        return self.server.sessions.get(token) if token else None
+
+    def _send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8",
+              headers: Optional[dict] = None) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _redirect(self, location: str, headers: Optional[dict] = None) -> None:
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _page(self, prefix: str, body: str, title: str = "Visa Appointment") -> None:
+        cfg = self.server.config
+        time.sleep(cfg.page_latency)
+        assets = "".join(f'<img src="{prefix}/assets/banner-{i}.png" width="200" height="40">'
+                         for i in range(cfg.asset_count))
+        if cfg.asset_count:
+            assets += (f"<style>@font-face {{ font-family: AisSans; src: url('{prefix}/assets/ais-sans.woff2'); }}"
+                       " body { font-family: AisSans, sans-serif; }</style>")
+        self._send(200, _render(PAGE, title=title, prefix=prefix, body=body, assets=assets))
+
+    def _asset(self, name: str) -> None:
+        cfg = self.server.config
+        time.sleep(cfg.asset_latency)
+        self.server.asset_requests += 1
+        content_type = "font/woff2" if name.endswith(".woff2") else "image/png"
+        data = b"\0" * cfg.asset_bytes
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _form(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8") if length else ""
+        return {k: v[-1] for k, v in parse_qs(raw).items()}
+
+    def _split(self):
+        # "/en-ke/niv/schedule/12345/appointment" -> ("/en-ke/niv", ["schedule", "12345", "appointment"])
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        return "/" + "/".join(parts[:2]), parts[2:], parse_qs(url.query)
+
+    # --- routes --------------------------------------------------------
+
+    def do_GET(self):
+        cfg = self.server.config
+        if self.path.startswith("/__standin/config"):
+            with self.server.lock:
+                return self._send(200, json.dumps(cfg.__dict__), "application/json")
+
+        prefix, parts, query = self._split()
+        if parts[:1] == ["assets"] and len(parts) == 2:
+            return self._asset(parts[1])
+        if parts[:2] == ["users", "sign_in"]:
+            time.sleep(cfg.page_latency)
+            return self._send(200, _render(SIGN_IN, prefix=prefix, error=""))
+        if parts[:2] == ["users", "sign_out"]:
+            return self._redirect(f"{prefix}/users/sign_in",
+                                  {"Set-Cookie": f"{SESSION_COOKIE}=; Path=/; Max-Age=0"})
+
+        session = self._session()
+        if session is None:
+            return self._redirect(f"{prefix}/users/sign_in")
+
+        account = cfg.account_id
+        if parts[:1] == ["groups"]:
+            return self._page(prefix, _render(GROUP, prefix=prefix, account=account))
+        if parts[:1] == ["schedule"] and parts[2:3] == ["continue_actions"]:
+            return self._page(prefix, _render(CONTINUE_ACTIONS, prefix=prefix, account=account))
+        if parts[:1] == ["schedule"] and parts[2:3] == ["appointment"]:
+            if len(parts) == 5 and parts[3] == "days":
+                return self._days(prefix, int(parts[4].split(".")[0]))
+            if len(parts) == 5 and parts[3] == "times":
+                return self._times(query)
+            if cfg.warning_gate and not session.get("confirmed_limit"):
+                return self._page(prefix, _render(WARNING, prefix=prefix, account=account))
+            options = "\n    ".join(
+                f'<option value="{fid}">{name}</option>' for name, fid in cfg.facilities.items()
+            )
+            with self.server.lock:
+                stale = cfg.stale_on_navigation > 0
+                if stale:
+                    cfg.stale_on_navigation -= 1
+            return self._page(prefix, _render(APPOINTMENT, prefix=prefix, account=account, options=options,
+                                              stale_steps="true" if stale else "false"))
+
+        self._send(404, "not found", "text/plain")
+
+    def do_POST(self):
+        cfg = self.server.config
+        if self.path.startswith("/__standin/config"):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                with self.server.lock:
+                    cfg.update(json.loads(self.rfile.read(length) or b"{}"))
+            except (KeyError, ValueError) as e:
+                return self._send(400, json.dumps({"error": str(e)}), "application/json")
+            return self._send(200, "{}", "application/json")
+
+        prefix, parts, _ = self._split()
+        form = self._form()
+        if parts[:2] == ["users", "sign_in"]:
+            if not form.get("user[email]") or not form.get("user[password]") or not form.get("policy_confirmed"):
+                time.sleep(cfg.page_latency)
+                return self._send(200, _render(SIGN_IN, prefix=prefix,
+                                               error="You must accept the policy and enter credentials."))
+            token = secrets.token_hex(16)
+            self.server.sessions[token] = {"confirmed_limit": False}
+            self.server.logins += 1
+            return self._redirect(f"{prefix}/groups/{cfg.account_id}",
+                                  {"Set-Cookie": f"{SESSION_COOKIE}={token}; Path=/; HttpOnly"})
+
+        session = self._session()
+        if session is None:
+            return self._redirect(f"{prefix}/users/sign_in")
+
+        if parts[:1] == ["schedule"] and parts[2:4] == ["appointment", "confirm_limit"]:
+            if form.get("confirmed_limit_message"):
+                session["confirmed_limit"] = True
+            return self._redirect(f"{prefix}/schedule/{cfg.account_id}/appointment")
+        if parts[:1] == ["schedule"] and parts[2:3] == ["appointment"]:
+            facility = cfg.facility_by_id(int(form.get("appointments[consulate_appointment][facility_id]") or 0))
+            booking = {
+                "facility": facility,
+                "date": form.get("appointments[consulate_appointment][date]", ""),
+                "time": form.get("appointments[consulate_appointment][time]", ""),
+            }
+            self.server.bookings.append(booking)
+            return self._page(prefix, _render(BOOKED, **booking))
+
+        self._send(404, "not found", "text/plain")
+
+    def _days(self, prefix: str, facility_id: int) -> None:
+        cfg = self.server.config
+        with self.server.lock:
+            sign_out = cfg.sign_out_on_ajax > 0
+            slow = not sign_out and cfg.slow_ajax > 0
+            if sign_out:
+                cfg.sign_out_on_ajax -= 1
+                self.server.sessions.clear()
+            elif slow:
+                cfg.slow_ajax -= 1
+        if sign_out:
+            return self._redirect(f"{prefix}/users/sign_in")
+        time.sleep(cfg.slow_ajax_latency if slow else cfg.ajax_latency)
+        with self.server.lock:
+            days = cfg.visible_days(cfg.facility_by_id(facility_id) or "")
+            inline_times = list(cfg.times) if cfg.times_latency <= 0 else None
+        payload = [{"date": d, "business_day": True, **({"times": inline_times} if inline_times else {})}
+                   for d in days]
+        self._send(200, json.dumps(payload), "application/json")
+
+    def _times(self, query: dict) -> None:
+        cfg = self.server.config
+        time.sleep(cfg.times_latency)
+        payload = {"available_times": list(cfg.times), "business_times": list(cfg.times)}
+        self._send(200, json.dumps(payload), "application/json")
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: Optional[StandInConfig] = None, host: str = "127.0.0.1", port: int = 0,
+                 verbose: bool = False):
+        super().__init__((host, port), StandInHandler)
+        self.config = config or StandInConfig()
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.sessions: Dict[str, dict] = {}
+        self.bookings: List[dict] = []
+        self.logins = 0
+        self.asset_requests = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def base_url(self, locale: str = "en-ke") -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/{locale}/niv"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="ais-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def sign_out_all(self) -> None:
+        self.sessions.clear()
+
+    def reset_warning_gate(self) -> None:
+        """Turn the "I understand" gate on and make every session see it again."""
+        with self.lock:
+            self.config.warning_gate = True
+            for session in self.sessions.values():
+                session["confirmed_limit"] = False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve an offline AIS stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--facility", action="append", default=[],
+                        help="NAME=YYYY-MM-DD,YYYY-MM-DD (repeatable)")
+    parser.add_argument("--ajax-latency", type=float, default=0.3)
+    parser.add_argument("--page-latency", type=float, default=0.0)
+    parser.add_argument("--warning-gate", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    config = StandInConfig(ajax_latency=args.ajax_latency, page_latency=args.page_latency,
+                           warning_gate=args.warning_gate)
+    for spec in args.facility:
+        name, _, dates = spec.partition("=")
+        config.availability[name] = [d for d in dates.split(",") if d]
+
+    server = StandInServer(config, args.host, args.port, verbose=args.verbose)
+    print(f"AIS stand-in on {server.base_url()} (account {config.account_id})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
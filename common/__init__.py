@@ -0,0 +1 @@
+"""Helpers shared by the Kenya and South Africa workflows."""
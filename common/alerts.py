@@ -0,0 +1,266 @@
+"""
+Alert coalescing, de-duplication and fan-out.
+
+Detections are keyed by (facility, date). A key alerts once and stays quiet while the
+slot keeps showing up cycle after cycle; it can alert again only after it vanished
+(resolve()) or `repeat_after` seconds passed. New keys are held for `window` seconds so
+several slots opening together become one digest.
+
+Each channel (SMTP, desktop, local webhook) has its own sliding one-hour rate limit.
+A channel that is over its limit keeps its digest in a backlog and sends it, merged, as
+soon as the limit allows. close() sends whatever is still held back regardless of the limit,
+so nothing is dropped at shutdown. A channel that raises is logged and skipped; the rest
+still send. Channel I/O runs on the engine's worker thread, never on the caller's.
+"""
+import abc
+import json
+import threading
+import time
+import urllib.request
+from collections import deque
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from common.notify import NotificationDispatcher
+
+
+FOUND = "found"
+CONFIRMED = "confirmed"
+
+Key = Tuple[str, str]
+
+
+@dataclass
+class Alert:
+    facility: str
+    day: str  # ISO date
+    kind: str = FOUND
+    raised_at: float = 0.0
+
+    @property
+    def key(self) -> Key:
+        return (self.facility, self.day)
+
+
+def _iso(day) -> str:
+    """date, datetime or 'YYYY-MM-DD...' string -> 'YYYY-MM-DD'."""
+    return day.strftime("%Y-%m-%d") if isinstance(day, date) else str(day)[:10]
+
+
+def render_digest(alerts: Sequence[Alert]) -> Tuple[str, str]:
+    """(subject, body) for a batch of alerts."""
+    confirmed = [a for a in alerts if a.kind == CONFIRMED]
+    if confirmed:
+        subject = "Visa Appointment Confirmed"
+    elif len(alerts) == 1:
+        subject = "Visa Date Found"
+    else:
+        subject = f"Visa Dates Found ({len(alerts)} slots)"
+    lines = []
+    for a in sorted(alerts, key=lambda a: (a.kind != CONFIRMED, a.day, a.facility)):
+        prefix = "Confirmed" if a.kind == CONFIRMED else "Date"
+        lines.append(f"{prefix}: {a.day} | Facility: {a.facility}")
+    return subject, "\n".join(lines)
+
+
+class Channel(abc.ABC):
+    """Base channel: subclasses implement deliver(); rate limiting and backlog live here."""
+
+    name = "channel"
+
+    def __init__(self, max_per_hour: int = 60):
+        self.max_per_hour = max_per_hour
+        self.sent_at: Deque[float] = deque()
+        self.backlog: Dict[Key, Alert] = {}
+        self.sent = 0
+        self.errors = 0
+        self.limited = 0
+
+    def allowed(self, now: float) -> bool:
+        while self.sent_at and now - self.sent_at[0] >= 3600:
+            self.sent_at.popleft()
+        return self.max_per_hour <= 0 or len(self.sent_at) < self.max_per_hour
+
+    @abc.abstractmethod
+    def deliver(self, subject: str, body: str, alerts: Sequence[Alert]) -> None:
+        """Send one alert or digest; raising marks the delivery as failed."""
+
+
+class SmtpChannel(Channel):
+    """Email + SMS gateways through the background NotificationDispatcher."""
+
+    name = "smtp"
+
+    def __init__(self, dispatcher: NotificationDispatcher, max_per_hour: int = 6):
+        super().__init__(max_per_hour)
+        self.dispatcher = dispatcher
+
+    def deliver(self, subject: str, body: str, alerts: Sequence[Alert]) -> None:
+        self.dispatcher.enqueue(subject, body)
+
+
+class DesktopChannel(Channel):
+    name = "desktop"
+
+    def __init__(self, app_name: str = "Visa Bot", max_per_hour: int = 60):
+        super().__init__(max_per_hour)
+        self.app_name = app_name
+
+    def deliver(self, subject: str, body: str, alerts: Sequence[Alert]) -> None:
+        from plyer import notification  # headless hosts may lack a backend; raise -> logged
+        notification.notify(title=subject, message=body[:256], app_name=self.app_name)
+
+
+class WebhookChannel(Channel):
+    """POST {"subject", "body", "alerts"} as JSON to a local URL (ntfy, Home Assistant, ...)."""
+
+    name = "webhook"
+
+    def __init__(self, url: str, max_per_hour: int = 60, timeout: float = 3.0):
+        super().__init__(max_per_hour)
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, subject: str, body: str, alerts: Sequence[Alert]) -> None:
+        payload = {
+            "subject": subject,
+            "body": body,
+            "alerts": [{"facility": a.facility, "date": a.day, "kind": a.kind} for a in alerts],
+        }
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class AlertEngine:
+    def __init__(self, channels: List[Channel], log: Callable[[str], None], window: float = 20.0,
+                 repeat_after: float = 6 * 3600):
+        self.channels = channels
+        self.log = log
+        self.window = window
+        self.repeat_after = repeat_after
+
+        self.raised = 0
+        self.suppressed = 0
+        self._seen: Dict[Key, float] = {}
+        self._pending: Dict[Key, Alert] = {}
+        self._pending_since: Optional[float] = None
+        self._urgent = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+
+    # --- producer side (poll loop) ------------------------------------
+
+    def alert(self, facility: str, day, kind: str = FOUND, urgent: bool = False) -> bool:
+        """
+        Queue an alert for (facility, day). Returns False if it was de-duplicated.
+
+        `urgent` skips the coalescing window (used for confirmations); rate limits still apply.
+        """
+        iso = _iso(day)
+        now = time.time()
+        key = (facility, iso)
+        with self._cond:
+            last = self._seen.get(key)
+            if kind == FOUND and last is not None and now - last < self.repeat_after:
+                self.suppressed += 1
+                return False
+            self._seen[key] = now
+            pending = self._pending.get(key)
+            if pending is None or kind == CONFIRMED:
+                self._pending[key] = Alert(facility, iso, kind, now)
+            if self._pending_since is None:
+                self._pending_since = now
+            self._urgent = self._urgent or urgent
+            self.raised += 1
+            self._start()
+            self._cond.notify()
+        self.log(f"[ALERT] {kind}: {facility} {iso}{' (urgent)' if urgent else ''}")
+        return True
+
+    def remember(self, facility: str, days: Sequence) -> None:
+        """Treat `days` as already alerted (restored from a checkpoint): no repeat until repeat_after."""
+        now = time.time()
+        with self._cond:
+            for day in days:
+                self._seen[(facility, _iso(day))] = now
+
+    def resolve(self, facility: str, open_days: Sequence) -> None:
+        """Forget keys for `facility` that are no longer open, so a reappearance alerts again."""
+        still_open = {_iso(d) for d in open_days}
+        with self._cond:
+            for key in [k for k in self._seen if k[0] == facility and k[1] not in still_open]:
+                del self._seen[key]
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Send whatever is pending or backlogged, ignoring rate limits, and stop the worker."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # --- worker ---------------------------------------------------------
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="alert-engine", daemon=True)
+            self._thread.start()
+
+    def _next_wake(self, now: float) -> Optional[float]:
+        """Seconds until something can be sent, or None to sleep until notified."""
+        waits = []
+        if self._pending_since is not None:
+            waits.append(0.0 if self._urgent else self._pending_since + self.window - now)
+        for channel in self.channels:
+            if channel.backlog and channel.sent_at and channel.max_per_hour > 0:
+                waits.append(channel.sent_at[0] + 3600 - now)
+        return max(0.0, min(waits)) if waits else None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    wait = self._next_wake(now)
+                    if self._closing or wait == 0.0:
+                        break
+                    self._cond.wait(wait)
+                batch = list(self._pending.values())
+                self._pending.clear()
+                self._pending_since = None
+                self._urgent = False
+                closing = self._closing
+
+            # Last pass at shutdown: held-back digests go out even over the hourly cap
+            self._fan_out(batch, force=closing)
+            if closing:
+                return
+
+    def _fan_out(self, batch: List[Alert], force: bool = False) -> None:
+        now = time.time()
+        for channel in self.channels:
+            for a in batch:
+                channel.backlog[a.key] = a
+            if not channel.backlog:
+                continue
+            if not channel.allowed(now) and not force:
+                channel.limited += 1
+                continue
+            alerts = list(channel.backlog.values())
+            subject, body = render_digest(alerts)
+            try:
+                channel.deliver(subject, body, alerts)
+            except Exception as e:
+                # One broken channel never holds back the others (or retries forever)
+                channel.errors += 1
+                self.log(f"[WARNING] Alert channel '{channel.name}' failed: {e}")
+            else:
+                channel.sent += 1
+                self.log(f"[NOTIFY] {channel.name}: {subject} ({len(alerts)} slot(s))")
+            channel.sent_at.append(now)
+            channel.backlog.clear()
@@ -0,0 +1,141 @@
+"""
+Per-facility availability as a bitmask over day offsets, with change events.
+
+DateBits stores a set of dates as one Python int: bit i set = (base + i days) is open.
+Window intersection is a shift and a mask, "what changed" is two AND-NOTs, and the
+earliest date is the lowest set bit, so a cycle costs the same whether the window is a
+month or a year and however many facilities are tracked.
+
+AvailabilityTracker keeps the previous cycle's bits per facility and turns each new read
+into NEW / VANISHED SlotEvents. Both sides are cut to the current window before diffing,
+so the window start moving forward each day does not count as slots vanishing. restore()
+seeds it from the checkpoint, so dates still open after a restart are not reported as NEW.
+"""
+import struct
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+NEW = "new"
+VANISHED = "vanished"
+
+
+def _ordinal(value) -> int:
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class DateBits:
+    __slots__ = ("base", "bits")
+
+    def __init__(self, base: int, bits: int = 0):
+        self.base = base  # ordinal of bit 0
+        self.bits = bits
+
+    @classmethod
+    def from_dates(cls, days: Iterable, base: Optional[int] = None) -> "DateBits":
+        ordinals = [_ordinal(d) for d in days]
+        if base is None:
+            base = min(ordinals) if ordinals else 0
+        bits = 0
+        for o in ordinals:
+            if o >= base:
+                bits |= 1 << (o - base)
+        return cls(base, bits)
+
+    def rebase(self, base: int) -> "DateBits":
+        """Same dates relative to `base`; dates before it are dropped."""
+        shift = base - self.base
+        return DateBits(base, self.bits >> shift if shift >= 0 else self.bits << -shift)
+
+    def window(self, start, end) -> "DateBits":
+        """Only the dates in [start, end], based at start."""
+        first, last = _ordinal(start), _ordinal(end)
+        if last < first:
+            return DateBits(first)
+        return DateBits(first, self.rebase(first).bits & ((1 << (last - first + 1)) - 1))
+
+    def earliest(self) -> Optional[date]:
+        if not self.bits:
+            return None
+        return date.fromordinal(self.base + (self.bits & -self.bits).bit_length() - 1)
+
+    def dates(self) -> List[date]:
+        out, bits, offset = [], self.bits, 0
+        while bits:
+            low = (bits & -bits).bit_length() - 1
+            offset += low
+            out.append(date.fromordinal(self.base + offset))
+            bits >>= low + 1
+            offset += 1
+        return out
+
+    def encode(self) -> bytes:
+        """4-byte base ordinal + little-endian bitset, based at the earliest date (b"" if empty)."""
+        if not self.bits:
+            return b""
+        normal = self.rebase(self.earliest().toordinal())
+        return struct.pack(">I", normal.base) + normal.bits.to_bytes((normal.bits.bit_length() + 7) // 8, "little")
+
+    @classmethod
+    def decode(cls, encoded: bytes) -> "DateBits":
+        if not encoded:
+            return cls(0)
+        return cls(struct.unpack(">I", encoded[:4])[0], int.from_bytes(encoded[4:], "little"))
+
+    def __len__(self) -> int:
+        return bin(self.bits).count("1")
+
+    def __bool__(self) -> bool:
+        return self.bits != 0
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DateBits):
+            return NotImplemented
+        return self.encode() == other.encode()
+
+    def __repr__(self) -> str:
+        return f"DateBits({[d.isoformat() for d in self.dates()]})"
+
+
+@dataclass(frozen=True)
+class SlotEvent:
+    kind: str  # NEW or VANISHED
+    facility: str
+    day: date
+
+
+class AvailabilityTracker:
+    def __init__(self):
+        self.current: Dict[str, DateBits] = {}
+
+    def update(self, facility: str, days: Iterable, start, end) -> List[SlotEvent]:
+        """Store this cycle's open `days` for `facility` and return what changed in [start, end]."""
+        now = DateBits.from_dates(days).window(start, end)
+        previous = self.current.get(facility)
+        self.current[facility] = now
+        before = previous.window(start, end).bits if previous is not None else 0
+        events = [SlotEvent(NEW, facility, d) for d in DateBits(now.base, now.bits & ~before).dates()]
+        events += [SlotEvent(VANISHED, facility, d) for d in DateBits(now.base, before & ~now.bits).dates()]
+        return events
+
+    def restore(self, saved: Optional[Dict[str, Iterable]]) -> None:
+        """Seed the previous read per facility (checkpointed ISO dates) without raising events."""
+        for facility, days in (saved or {}).items():
+            self.current[facility] = DateBits.from_dates(days)
+
+    def earliest(self, facility: str) -> Optional[date]:
+        bits = self.current.get(facility)
+        return bits.earliest() if bits is not None else None
+
+    def open_dates(self, facility: str) -> List[date]:
+        bits = self.current.get(facility)
+        return bits.dates() if bits is not None else []
+
+
+def describe_events(events: List[SlotEvent]) -> str:
+    """'+2026-01-03 +2026-01-04 -2025-12-20' style summary."""
+    return " ".join(f"{'+' if e.kind == NEW else '-'}{e.day.isoformat()}" for e in events)
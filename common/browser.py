@@ -0,0 +1,248 @@
+"""
+Browser lifecycle helpers.
+
+build_driver() is the one place both country scripts configure Chrome. The lean profile
+runs headless at a fixed small viewport with GPU/extensions off, a small cache, and
+blocks images, fonts, media and third-party hosts at the DevTools (CDP) level.
+Stylesheets are left alone: visibility checks (element_to_be_clickable) depend on them.
+
+WarmStandby keeps one spare, already-launched browser so a dead session can be replaced
+without paying for a cold Chrome + chromedriver start on the critical path. The spare is
+built on a background thread during the idle sleep between poll cycles.
+
+BrowserWatchdog samples the process tree's RSS and open file descriptors after each cycle
+and asks for a recycle once a threshold is crossed; the scripts do it in the sleep window.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from selenium import webdriver
+
+from common.instrumentation import instrumentation
+
+
+WINDOW_SIZE = (1024, 768)
+
+# Network.setBlockedURLs patterns ('*' wildcards)
+BLOCKED_RESOURCE_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.ogg", "*.wav",
+]
+BLOCKED_THIRD_PARTY_HOSTS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googleadservices.com",
+    "fonts.googleapis.com", "fonts.gstatic.com", "facebook.net", "hotjar.com",
+    "newrelic.com", "nr-data.net", "youtube.com", "ytimg.com",
+]
+
+
+def chrome_options(lean: bool = True, headless: bool = True,
+                   window_size: Tuple[int, int] = WINDOW_SIZE) -> webdriver.ChromeOptions:
+    opts = webdriver.ChromeOptions()
+    opts.add_argument("--disable-background-networking")
+    opts.add_argument("--disable-sync")
+    opts.add_argument("--no-first-run")
+    opts.add_argument("--no-default-browser-check")
+    opts.add_experimental_option("excludeSwitches", ["enable-logging"])
+    if headless:
+        opts.add_argument("--headless=new")
+    if not lean:
+        if not headless:
+            opts.add_argument("--start-maximized")
+        return opts
+
+    opts.add_argument(f"--window-size={window_size[0]},{window_size[1]}")
+    opts.add_argument("--disable-gpu")
+    opts.add_argument("--disable-extensions")
+    opts.add_argument("--disable-component-extensions-with-background-pages")
+    opts.add_argument("--disable-default-apps")
+    opts.add_argument("--mute-audio")
+    opts.add_argument("--disk-cache-size=1048576")
+    opts.add_argument("--media-cache-size=1")
+    opts.add_argument("--aggressive-cache-discard")
+    opts.add_argument("--renderer-process-limit=2")
+    opts.add_argument("--blink-settings=imagesEnabled=false")
+    opts.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+    })
+    return opts
+
+
+def block_resources(driver: webdriver.Chrome, patterns: Iterable[str] = BLOCKED_RESOURCE_PATTERNS,
+                    hosts: Iterable[str] = BLOCKED_THIRD_PARTY_HOSTS) -> None:
+    """Tell Chrome's network stack to drop matching requests before they are sent."""
+    urls = list(patterns) + [f"*{host}*" for host in hosts]
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": urls})
+
+
+def build_driver(lean: bool = True, headless: bool = True) -> webdriver.Chrome:
+    driver = webdriver.Chrome(options=chrome_options(lean=lean, headless=headless))
+    if lean:
+        block_resources(driver)
+    return driver
+
+
+def browser_pids(driver: webdriver.Chrome) -> List[int]:
+    """chromedriver's pid plus every descendant (Chrome browser, renderers, GPU, ...)."""
+    try:
+        root = driver.service.process.pid
+    except AttributeError:
+        return []
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as fh:
+                # "pid (comm) state ppid ..." -- comm may contain spaces, so split after ')'
+                ppid = int(fh.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def tree_rss_bytes(driver: webdriver.Chrome) -> int:
+    """Resident memory of the whole chromedriver/Chrome process tree (Linux /proc)."""
+    page = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in browser_pids(driver):
+        try:
+            with open(f"/proc/{pid}/statm", "r") as fh:
+                total += int(fh.read().split()[1]) * page
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def tree_fd_count(driver: webdriver.Chrome) -> int:
+    """Open file descriptors across the chromedriver/Chrome process tree (Linux /proc)."""
+    total = 0
+    for pid in browser_pids(driver):
+        try:
+            total += len(os.listdir(f"/proc/{pid}/fd"))
+        except OSError:
+            continue
+    return total
+
+
+class BrowserWatchdog:
+    def __init__(self, log: Callable[[str], None], max_rss_bytes: Optional[int] = None,
+                 max_fds: Optional[int] = None, max_age_seconds: Optional[float] = None):
+        """Any limit left as None is not checked."""
+        self.log = log
+        self.max_rss_bytes = max_rss_bytes
+        self.max_fds = max_fds
+        self.max_age_seconds = max_age_seconds
+        self.recycles: List[Tuple[float, str]] = []  # (time, reason)
+        self._driver_id: Optional[int] = None
+        self._launched_at = 0.0
+        self._baseline_rss = 0
+
+    def sample(self, driver: webdriver.Chrome) -> Optional[str]:
+        """Log this browser's footprint; return a recycle reason if a limit is exceeded."""
+        now = time.time()
+        rss, fds = tree_rss_bytes(driver), tree_fd_count(driver)
+        if id(driver) != self._driver_id:  # first sample of a new browser (launch, rebuild, recycle)
+            self._driver_id, self._launched_at, self._baseline_rss = id(driver), now, rss
+        age = now - self._launched_at
+        growth = rss - self._baseline_rss
+        rate = f", {growth / 2**20 / (age / 3600):+.1f}MB/h" if age >= 600 else ""
+        self.log(f"[MEMORY] browser rss={rss / 2**20:.0f}MB ({growth / 2**20:+.0f}MB since launch{rate}) "
+                 f"fds={fds} age={age / 3600:.1f}h")
+
+        if self.max_rss_bytes and rss > self.max_rss_bytes:
+            return f"rss {rss / 2**20:.0f}MB > {self.max_rss_bytes / 2**20:.0f}MB"
+        if self.max_fds and fds > self.max_fds:
+            return f"fds {fds} > {self.max_fds}"
+        if self.max_age_seconds and age > self.max_age_seconds:
+            return f"age {age / 3600:.1f}h > {self.max_age_seconds / 3600:.1f}h"
+        return None
+
+    def recycled(self, reason: str) -> None:
+        self.recycles.append((time.time(), reason))
+        self._driver_id = None
+
+
+class WarmStandby:
+    def __init__(self, factory: Callable[[], webdriver.Chrome], log: Callable[[str], None],
+                 enabled: bool = True):
+        self.factory = factory
+        self.log = log
+        self.enabled = enabled
+        self.swap_seconds: Dict[str, List[float]] = {"warm": [], "cold": []}
+        self._spare: Optional[webdriver.Chrome] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _build_spare(self) -> None:
+        started = time.perf_counter()
+        try:
+            spare = self.factory()
+        except Exception as e:
+            self.log(f"[STANDBY] Could not prepare spare browser: {e}")
+            return
+        with self._lock:
+            self._spare = spare
+        self.log(f"[STANDBY] Spare browser ready in {time.perf_counter() - started:.1f}s")
+
+    def prepare_async(self) -> None:
+        """Start building a spare in the background (no-op if disabled, ready or in progress)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._spare is not None or (self._thread and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._build_spare, name="warm-standby", daemon=True)
+            self._thread.start()
+
+    def _pop_spare(self) -> Optional[webdriver.Chrome]:
+        # A half-built spare is still closer to ready than a new cold start
+        if self._thread and self._thread.is_alive():
+            self._thread.join()
+        with self._lock:
+            spare, self._spare = self._spare, None
+        if spare is None:
+            return None
+        try:
+            spare.current_url  # still alive?
+            return spare
+        except Exception:
+            try:
+                spare.quit()
+            except Exception:
+                pass
+            return None
+
+    def take(self) -> webdriver.Chrome:
+        """Return a ready browser: the warm spare if there is one, otherwise a cold start."""
+        started = time.perf_counter()
+        driver = self._pop_spare() if self.enabled else None
+        mode = "warm" if driver is not None else "cold"
+        if driver is None:
+            driver = self.factory()
+        elapsed = time.perf_counter() - started
+        self.swap_seconds[mode].append(elapsed)
+        instrumentation.observe(f"driver_swap_{mode}", elapsed * 1000)
+        self.log(f"[STANDBY] {mode.capitalize()} driver swap in {elapsed:.2f}s")
+        return driver
+
+    def close(self) -> None:
+        if self._thread and self._thread.is_alive():
+            self._thread.join()
+        with self._lock:
+            spare, self._spare = self._spare, None
+        if spare is not None:
+            try:
+                spare.quit()
+            except Exception:
+                pass
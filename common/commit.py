@@ -0,0 +1,226 @@
+"""
+Booking commit path: from a date that was seen open to the Reschedule/Confirm clicks.
+
+The old path waited for the time select, picked option 1 without reading the options,
+looked up the Reschedule button, and looked up Confirm only after the submit. Each step
+was a separate wait with its own round trips. Now:
+
+    1. one script per poll, until the chosen date's time options are loaded: returns the
+       form's HTML and resolves the time select, Reschedule and Confirm controls with the
+       registry's fallback chains (in the learned order), so both buttons are held
+       before anything is clicked
+    2. one script sets the time (value + change event) and reads it back
+    3. click Reschedule, wait for the held Confirm to become visible and click it
+
+Every step is marked on a CommitTimeline, in milliseconds since the availability read that
+found the date. Each step is also a "commit.*" span, so the cycle record and the
+instrumentation summary carry the same numbers. With dry_run the path runs up to the
+Reschedule click and skips the two clicks, so the timeline can be measured without booking.
+
+    timeline = CommitTimeline(detected_at)
+    ... select the date ...
+    timeline.mark("date_selected")
+    result = commit_appointment(driver, LOCATORS, deadline, timeline, "2026-01-10", DRY_RUN, log)
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from selenium import webdriver
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.ui import WebDriverWait
+
+from common.deadline import Deadline
+from common.fixtures import recorder
+from common.formparse import FormState, parse_form
+from common.instrumentation import span
+from common.locators import LocatorRegistry
+from common.waits import POLL_SECONDS
+
+# Resolves each chain's alternatives in order (arguments[0]: {chain: [[label, by, value, need]]},
+# need 1 = visible and enabled, -1 = hidden, 0 = present). Ready once the date input has a
+# value, no AJAX is in flight and the time select has a real option. Confirm is held only
+# while it is hidden (the modal the submit will open): a visible match is some other button.
+_READ_FORM_JS = """
+var chains = arguments[0];
+function find(by, value) {
+  if (by === 'id') { return document.getElementById(value); }
+  if (by === 'name') { return document.getElementsByName(value)[0] || null; }
+  if (by === 'css selector') { return document.querySelector(value); }
+  if (by === 'xpath') {
+    return document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+  }
+  return null;
+}
+function resolve(list) {
+  for (var i = 0; i < list.length; i++) {
+    var el = find(list[i][1], list[i][2]);
+    if (!el) { continue; }
+    var shown = !el.disabled && el.getClientRects().length > 0;
+    if (list[i][3] === 0 || (list[i][3] > 0) === shown) { return [list[i][0], el]; }
+  }
+  return [null, null];
+}
+if (window.jQuery && window.jQuery.active > 0) { return null; }
+var date = document.getElementById('appointments_consulate_appointment_date')
+        || document.querySelector("input[name='appointments[consulate_appointment][date]']");
+if (date && !date.value) { return null; }
+var time = resolve(chains.time_select);
+if (!time[1] || time[1].disabled) { return null; }
+var ready = false;
+for (var i = 0; i < time[1].options.length; i++) { if (time[1].options[i].value) { ready = true; break; } }
+if (!ready) { return null; }
+var form = time[1].form || document.querySelector("form[action*='/appointment']") || document.body;
+var submit = resolve(chains.submit), confirm = resolve(chains.confirm);
+return {html: form.outerHTML, date: date ? date.value : null, time: time[1], submit: submit[1], confirm: confirm[1],
+        labels: {time_select: time[0], submit: submit[0], confirm: confirm[0]}};
+"""
+
+_SET_TIME_JS = """
+var select = arguments[0];
+select.value = arguments[1];
+select.dispatchEvent(new Event('change', {bubbles: true}));
+return select.value;
+"""
+
+_CLICK_JS = "arguments[0].click();"
+
+
+class CommitTimeline:
+    """High-resolution marks (ms) from the read that found the date to the last click."""
+
+    def __init__(self, detected_at: Optional[float] = None):
+        """`detected_at`: time.perf_counter() of that read; defaults to now."""
+        self.origin = time.perf_counter() if detected_at is None else detected_at
+        self.marks: List[Tuple[str, float]] = [("detected", 0.0)]
+
+    def mark(self, name: str) -> float:
+        elapsed_ms = (time.perf_counter() - self.origin) * 1000.0
+        self.marks.append((name, elapsed_ms))
+        return elapsed_ms
+
+    @property
+    def total_ms(self) -> float:
+        return self.marks[-1][1]
+
+    def as_dict(self) -> dict:
+        return {name: round(ms, 1) for name, ms in self.marks}
+
+    def describe(self) -> str:
+        steps = [f"{name} +{ms - previous:.1f}ms"
+                 for (name, ms), (_, previous) in zip(self.marks[1:], self.marks)]
+        return ", ".join(steps) + f" (total {self.total_ms:.1f}ms)"
+
+
+@dataclass
+class CommitResult:
+    time: Optional[str] = None  # the time slot that was selected, None if none loaded
+    form: FormState = field(default_factory=FormState)
+    submitted: bool = False
+    confirmed: bool = False
+    controls: dict = field(default_factory=dict)  # chain -> alternative resolved with the form
+    problem: str = ""
+
+    @property
+    def ready(self) -> bool:
+        return self.time is not None
+
+
+def choose_time(times: List[str]) -> Optional[str]:
+    """First offered slot (AIS lists them earliest first), or None."""
+    return times[0] if times else None
+
+
+def _read_form(driver: webdriver.Chrome, locators: LocatorRegistry, timeout: float):
+    chains = {
+        name: [[a.label, a.by, a.value, need] for a in locators.chains[name].ordered()]
+        for name, need in (("time_select", 0), ("submit", 1), ("confirm", -1))
+    }
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_SECONDS).until(
+            lambda d: d.execute_script(_READ_FORM_JS, chains))
+    except TimeoutException:
+        return None
+
+
+def _visible(element: WebElement):
+    def condition(_driver):
+        return element.is_displayed() and element
+    return condition
+
+
+def commit_appointment(driver: webdriver.Chrome, locators: LocatorRegistry, deadline: Deadline,
+                       timeline: CommitTimeline, target_date: str, dry_run: bool,
+                       log: Callable[[str], None]) -> CommitResult:
+    """Select a time for the already chosen `target_date` (YYYY-MM-DD) and submit, unless dry_run."""
+    result = CommitResult()
+    with span("commit", date=target_date) as current:
+        try:
+            with span("commit.form"):
+                started = time.perf_counter()
+                state = deadline.wait("time_select", lambda t: _read_form(driver, locators, t),
+                                      essential=True)
+                if state is None:
+                    result.problem = "no time slots loaded"
+                    return result
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                result.controls = state["labels"]
+                for name, label in result.controls.items():
+                    if label:
+                        locators.note_match(name, label, elapsed_ms)
+                result.form = parse_form(state["html"])
+                shown = state["date"]  # the value property; outerHTML only has the attribute
+                if shown and shown != target_date:
+                    log(f"[WARNING] Date input shows {shown}, expected {target_date}.")
+                recorder.record("date_selected", state["html"])
+                timeline.mark("form_read")
+
+            with span("commit.time"):
+                wanted = choose_time(result.form.times)
+                if wanted is None or driver.execute_script(_SET_TIME_JS, state["time"], wanted) != wanted:
+                    result.problem = f"could not select a time from {result.form.times}"
+                    return result
+                result.time = wanted
+                timeline.mark("time_selected")
+
+            with span("commit.submit"):
+                submit = state["submit"]
+                if submit is None:
+                    log("[WARNING] Reschedule button not resolved with the form; looking it up.")
+                    submit = deadline.wait("submit", lambda t: locators.find(driver, "submit", t), essential=True)
+                timeline.mark("submit_ready")
+                if dry_run:
+                    timeline.mark("would_submit")
+                    return result
+                # Not governed: at most one per run, and a booking must never wait for budget
+                driver.execute_script(_CLICK_JS, submit)
+                result.submitted = True
+                timeline.mark("submitted")
+
+            with span("commit.confirm"):
+                confirm = state["confirm"]
+                try:
+                    if confirm is not None:
+                        try:
+                            confirm = deadline.wait("confirm", lambda t: WebDriverWait(
+                                driver, t, poll_frequency=POLL_SECONDS).until(_visible(confirm)), essential=True)
+                        except StaleElementReferenceException:
+                            confirm = None
+                    if confirm is None:
+                        confirm = deadline.wait("confirm", lambda t: locators.find(driver, "confirm", t),
+                                                essential=True)
+                except TimeoutException:
+                    result.problem = "no confirmation popup appeared"
+                    return result
+                timeline.mark("confirm_visible")
+                driver.execute_script(_CLICK_JS, confirm)
+                result.confirmed = True
+                timeline.mark("confirmed")
+            return result
+        except WebDriverException as e:
+            result.problem = f"{e.__class__.__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+            return result
+        finally:
+            current.tags["timeline_ms"] = timeline.as_dict()
+            current.tags["time"] = result.time
@@ -0,0 +1,189 @@
+"""
+Search settings in a JSON file that can be edited while the bot runs.
+
+The module constants in each country script are the defaults; the file overrides any
+subset of them. ConfigWatcher.poll() is called between cycles: when the file's mtime or
+size changed it is re-read and validated, and a valid file replaces the settings without
+touching the browser session. An invalid edit is logged and ignored (the previous
+settings stay); an invalid file at startup is an error.
+
+    {
+      "cities": ["Cape Town", "Durban"],
+      "date_range_start": "2026-11-01",      # or "start_offset_days": 4
+      "date_range_end": "2027-02-28",
+      "dry_run": true,
+      "min_wait_seconds": 180,
+      "max_wait_seconds": 300,
+      "sweep_mode": true,
+      "facility_preference_days": {"Durban": 7}
+    }
+"""
+import json
+import os
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class ConfigError(ValueError):
+    pass
+
+
+@dataclass
+class Settings:
+    cities: List[str]
+    start: datetime
+    end: datetime
+    dry_run: bool
+    min_wait: int
+    max_wait: int
+    sweep_mode: bool = True
+    preference_days: Dict[str, float] = field(default_factory=dict)
+
+    def window_problem(self, now: Optional[datetime] = None) -> Optional[str]:
+        """Why no date can ever match right now (expired or empty window), or None."""
+        today = (now or datetime.now()).date()
+        first = max(self.start.date(), today)
+        if self.end.date() < today:
+            return f"date window ended on {self.end.date()} (today is {today})"
+        if first > self.end.date():
+            return f"date window is empty ({first} -> {self.end.date()})"
+        return None
+
+    def changes(self, other: "Settings") -> List[str]:
+        out = []
+        for name in self.__dataclass_fields__:
+            old, new = getattr(self, name), getattr(other, name)
+            if old != new:
+                if isinstance(old, datetime):
+                    old, new = old.date(), new.date()
+                out.append(f"{name}: {old} -> {new}")
+        return out
+
+
+_KEYS = {
+    "cities", "date_range_start", "start_offset_days", "date_range_end", "dry_run",
+    "min_wait_seconds", "max_wait_seconds", "sweep_mode", "facility_preference_days",
+}
+
+
+def _date(raw: dict, key: str) -> datetime:
+    try:
+        return datetime.strptime(str(raw[key]), "%Y-%m-%d")
+    except ValueError:
+        raise ConfigError(f"{key} must be YYYY-MM-DD, got {raw[key]!r}") from None
+
+
+def _int(raw: dict, key: str, minimum: int) -> int:
+    value = raw[key]
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise ConfigError(f"{key} must be an integer >= {minimum}, got {value!r}")
+    return value
+
+
+def _bool(raw: dict, key: str) -> bool:
+    if not isinstance(raw[key], bool):
+        raise ConfigError(f"{key} must be true or false, got {raw[key]!r}")
+    return raw[key]
+
+
+def parse_settings(raw: dict, defaults: Settings, now: Optional[datetime] = None) -> Settings:
+    """Overlay the file's keys on `defaults`; raises ConfigError on anything malformed."""
+    if not isinstance(raw, dict):
+        raise ConfigError("top level must be a JSON object")
+    unknown = sorted(set(raw) - _KEYS)
+    if unknown:
+        raise ConfigError(f"unknown key(s): {', '.join(unknown)}")
+    if "date_range_start" in raw and "start_offset_days" in raw:
+        raise ConfigError("use either date_range_start or start_offset_days, not both")
+
+    settings = replace(defaults)
+    if "cities" in raw:
+        cities = raw["cities"]
+        if (not isinstance(cities, list) or not cities
+                or not all(isinstance(c, str) and c.strip() for c in cities)):
+            raise ConfigError("cities must be a non-empty list of facility names")
+        settings.cities = [c.strip() for c in cities]
+    if "date_range_start" in raw:
+        settings.start = _date(raw, "date_range_start")
+    if "start_offset_days" in raw:
+        settings.start = (now or datetime.today()) + timedelta(days=_int(raw, "start_offset_days", 0))
+    if "date_range_end" in raw:
+        settings.end = _date(raw, "date_range_end")
+    if "dry_run" in raw:
+        settings.dry_run = _bool(raw, "dry_run")
+    if "sweep_mode" in raw:
+        settings.sweep_mode = _bool(raw, "sweep_mode")
+    if "min_wait_seconds" in raw:
+        settings.min_wait = _int(raw, "min_wait_seconds", 30)
+    if "max_wait_seconds" in raw:
+        settings.max_wait = _int(raw, "max_wait_seconds", 30)
+    if "facility_preference_days" in raw:
+        prefs = raw["facility_preference_days"]
+        if not isinstance(prefs, dict) or not all(
+                isinstance(v, (int, float)) and not isinstance(v, bool) for v in prefs.values()):
+            raise ConfigError("facility_preference_days must map facility name -> days")
+        settings.preference_days = dict(prefs)
+
+    if settings.max_wait < settings.min_wait:
+        raise ConfigError(f"max_wait_seconds ({settings.max_wait}) < min_wait_seconds ({settings.min_wait})")
+    if settings.end.date() < settings.start.date():
+        raise ConfigError(f"date_range_end {settings.end.date()} is before the start {settings.start.date()}")
+    return settings
+
+
+class ConfigWatcher:
+    def __init__(self, path: Optional[str], defaults: Settings, log: Callable[[str], None]):
+        self.path = path
+        self.defaults = defaults
+        self.log = log
+        self.settings = defaults
+        self._stamp: Optional[Tuple[float, int]] = None
+
+    def _stat(self) -> Optional[Tuple[float, int]]:
+        try:
+            st = os.stat(self.path)
+        except (OSError, TypeError):
+            return None
+        return st.st_mtime, st.st_size
+
+    def _read(self) -> Settings:
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                raw = json.load(fh)
+        except ValueError as e:
+            raise ConfigError(f"not valid JSON: {e}") from None
+        return parse_settings(raw, self.defaults)
+
+    def load(self) -> Settings:
+        """Initial load: defaults if there is no file, ConfigError if the file is invalid."""
+        self._stamp = self._stat()
+        if self._stamp is None:
+            self.settings = self.defaults
+            return self.settings
+        try:
+            self.settings = self._read()
+        except ConfigError as e:
+            raise ConfigError(f"{self.path}: {e}") from None
+        return self.settings
+
+    def poll(self) -> Optional[Settings]:
+        """New settings if the file changed and is valid, else None (current settings kept)."""
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        if stamp is None:
+            self.log(f"[CONFIG] {self.path} removed; keeping the current settings.")
+            return None
+        try:
+            settings = self._read()
+        except (ConfigError, OSError) as e:
+            self.log(f"[CONFIG] Rejected {self.path}: {e}. Keeping the current settings.")
+            return None
+        changed = self.settings.changes(settings)
+        self.settings = settings
+        if not changed:
+            return None
+        self.log(f"[CONFIG] Reloaded {self.path}: " + "; ".join(changed))
+        return settings
@@ -0,0 +1,165 @@
+from datetime import date, datetime
+from typing import Optional, Set, Tuple
+
+from selenium import webdriver
+
+from common.fixtures import recorder
+from common.formparse import CalendarSnapshot, parse_calendar
+from common.instrumentation import step
+
+
+# Safety cap so a misbehaving calendar can't keep us clicking "next" forever
+MAX_MONTH_VIEWS = 24
+
+# One round trip: optionally act on the datepicker, then return its state. The panes come
+# back as the picker's outerHTML and are parsed by common/formparse.py (no per-cell reads).
+#   arguments[0]: "read" | "open" | "prev" | "next" | "day"
+#   arguments[1]: [year, month, day] when action == "day"
+_CALENDAR_JS = """
+var action = arguments[0], target = arguments[1];
+var input = document.getElementById('appointments_consulate_appointment_date')
+         || document.querySelector("input[name='appointments[consulate_appointment][date]']")
+         || document.querySelector("input[id*='appointment_date']");
+var picker = document.getElementById('ui-datepicker-div');
+var acted = false;
+
+if (action === 'open' && input && !input.disabled) {
+  input.scrollIntoView({block: 'center'});
+  input.focus();
+  input.click();
+  picker = document.getElementById('ui-datepicker-div');
+  acted = true;
+} else if ((action === 'prev' || action === 'next') && picker) {
+  var btn = picker.querySelector('.ui-datepicker-' + action);
+  if (btn && !btn.classList.contains('ui-state-disabled')) { btn.click(); acted = true; }
+} else if (action === 'day' && picker) {
+  var cells = picker.querySelectorAll("td[data-handler='selectDay']");
+  for (var i = 0; i < cells.length; i++) {
+    var td = cells[i];
+    if (parseInt(td.getAttribute('data-year'), 10) === target[0] &&
+        parseInt(td.getAttribute('data-month'), 10) === target[1] - 1 &&
+        parseInt(td.textContent, 10) === target[2]) {
+      (td.querySelector('a') || td).click();
+      acted = true;
+      break;
+    }
+  }
+}
+
+return {
+  acted: acted,
+  input: input ? {enabled: !input.disabled, value: input.value} : null,
+  open: !!picker && window.getComputedStyle(picker).display !== 'none',
+  html: picker ? picker.outerHTML : ''
+};
+"""
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _calendar(driver: webdriver.Chrome, action: str = "read", target=None) -> CalendarSnapshot:
+    raw = driver.execute_script(_CALENDAR_JS, action, target) or {}
+    html = raw.get("html") or ""
+    recorder.record("calendar", html, action=action)
+    # Panes, days and arrows come from the picker's outerHTML, parsed like a recorded fixture
+    snapshot = parse_calendar(html)
+    snapshot.acted = bool(raw.get("acted"))
+    snapshot.input_present = raw.get("input") is not None
+    snapshot.input_enabled = bool((raw.get("input") or {}).get("enabled"))
+    snapshot.input_value = (raw.get("input") or {}).get("value") or ""
+    snapshot.is_open = bool(raw.get("open"))
+    return snapshot
+
+
+def read_calendar(driver: webdriver.Chrome) -> CalendarSnapshot:
+    return _calendar(driver, "read")
+
+
+def open_calendar(driver: webdriver.Chrome) -> CalendarSnapshot:
+    """Scroll to and click the date input, returning the opened picker's state."""
+    return _calendar(driver, "open")
+
+
+def step_calendar(driver: webdriver.Chrome, direction: str) -> Optional[CalendarSnapshot]:
+    """Click 'prev' or 'next' and return the new state, or None if the arrow is disabled/missing."""
+    snapshot = _calendar(driver, direction)
+    return snapshot if snapshot.acted else None
+
+
+def click_day(driver: webdriver.Chrome, day) -> bool:
+    """Click `day` in the currently displayed panes. False if it isn't selectable there."""
+    day = _as_date(day)
+    return _calendar(driver, "day", [day.year, day.month, day.day]).acted
+
+
+def navigate_to_month(driver: webdriver.Chrome, snapshot: CalendarSnapshot,
+                      month: Tuple[int, int]) -> Optional[CalendarSnapshot]:
+    """Step the picker until `month` is shown in either pane. None if it can't get there."""
+    for _ in range(MAX_MONTH_VIEWS):
+        if not snapshot.months:
+            return None
+        if month in snapshot.months:
+            return snapshot
+        direction = "prev" if snapshot.first_month > month else "next"
+        snapshot = step_calendar(driver, direction)
+        if snapshot is None:
+            return None
+    return None
+
+
+def select_day(driver: webdriver.Chrome, target) -> bool:
+    """Open the picker, move to `target`'s month and click it if selectable."""
+    target = _as_date(target)
+    snapshot = open_calendar(driver)
+    snapshot = navigate_to_month(driver, snapshot, (target.year, target.month))
+    if snapshot is None or target not in snapshot.days:
+        return False
+    return click_day(driver, target)
+
+
+@step()
+def scan_available_dates(driver: webdriver.Chrome, start, end,
+                         snapshot: Optional[CalendarSnapshot] = None) -> list:
+    """
+    Walk an already-open datepicker once and return the sorted selectable dates in [start, end].
+
+    Instead of re-opening the calendar for every candidate day, we:
+    - step back to the month containing `start` (if the picker opened later)
+    - read selectable days from BOTH panes per view
+    - step forward past the last month read, until `end`'s month has been seen
+    Each view costs one execute_script round trip (click + read together), so cost grows
+    with the number of months in the window, not the number of days.
+    """
+    start, end = _as_date(start), _as_date(end)
+    if start > end:
+        return []
+
+    first_month = (start.year, start.month)
+    end_month = (end.year, end.month)
+
+    snapshot = snapshot or read_calendar(driver)
+    if not snapshot.months:
+        return []
+
+    while snapshot.first_month > first_month:
+        previous = step_calendar(driver, "prev")
+        if previous is None or not previous.months:
+            break
+        snapshot = previous
+
+    found: Set[date] = set()
+    for _ in range(MAX_MONTH_VIEWS):
+        found |= snapshot.days
+        last_read = snapshot.last_month
+        if last_read >= end_month:
+            break
+
+        # stepMonths may be 1 or 2; advance until the first pane is past what we've read
+        while snapshot.first_month <= last_read:
+            snapshot = step_calendar(driver, "next")
+            if snapshot is None or not snapshot.months:
+                return sorted(d for d in found if start <= d <= end)
+
+    return sorted(d for d in found if start <= d <= end)
@@ -0,0 +1,130 @@
+"""
+Per-cycle deadline shared by every wait in a poll cycle, with per-step caps learned from p95.
+
+A bad cycle used to chain its worst-case WebDriverWait timeouts (45 + 45 + 15 + ... s)
+before main() ever reached its sleep. Now main() creates one Deadline per cycle and passes
+it down to select_city / select_date_from_calendar / check_and_select_appointment. Each
+wait is given
+
+    min(learned cap for that step, time left in the cycle)
+
+The learned cap is the step's p95 over its recent waits, times a margin. It is clamped
+between a floor and the old literal, and the old literal is used until there are enough
+samples. A wait that runs out its whole cap is recorded as a sample at that cap, so slow
+pages push the p95 back up; `widen_after` such misses in a row drop the learned samples
+and the step returns to the old literal. When the cycle's budget is used up, the next wait
+raises CycleOverBudget. The scripts' `except Exception` handlers around these waits re-raise
+it explicitly (`except CycleOverBudget: raise`), so it reaches main(), which counts the
+cycle as "over_budget" and moves on.
+
+Booking waits pass essential=True. They keep their caps but ignore the cycle budget, so a
+slot that is already selected is never abandoned over a slow cycle.
+"""
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+from common.instrumentation import percentile
+
+T = TypeVar("T")
+
+
+class CycleOverBudget(Exception):
+    pass
+
+
+class WaitCaps:
+    def __init__(self, defaults: Dict[str, float], margin: float = 2.0, floor: float = 3.0,
+                 min_samples: int = 20, window: int = 200, widen_after: int = 3):
+        """`defaults`: step -> the fixed timeout it used to have (also the ceiling)."""
+        self.defaults = dict(defaults)
+        self.margin = margin
+        self.floor = floor
+        self.min_samples = min_samples
+        self.widen_after = widen_after
+        self.samples: Dict[str, Deque[float]] = {name: deque(maxlen=window) for name in self.defaults}
+        self.misses: Dict[str, int] = {name: 0 for name in self.defaults}
+
+    def cap(self, name: str) -> float:
+        ceiling = self.defaults[name]
+        samples = self.samples[name]
+        if len(samples) < self.min_samples:
+            return ceiling
+        return min(ceiling, max(self.floor, percentile(list(samples), 95) * self.margin))
+
+    def observe(self, name: str, seconds: float) -> None:
+        self.samples[name].append(seconds)
+        self.misses[name] = 0
+
+    def observe_timeout(self, name: str, cap: float) -> None:
+        """The wait used its whole cap: count it at the cap, and reset after `widen_after` in a row."""
+        self.misses[name] += 1
+        if self.misses[name] >= self.widen_after:
+            self.samples[name].clear()
+            self.misses[name] = 0
+        else:
+            self.samples[name].append(cap)
+
+    def snapshot(self) -> Dict[str, list]:
+        return {name: [round(s, 3) for s in samples] for name, samples in self.samples.items()}
+
+    def restore(self, saved: Optional[dict]) -> None:
+        for name, values in (saved or {}).items():
+            if name in self.samples:
+                self.samples[name].extend(float(v) for v in values)
+
+    def describe(self) -> str:
+        return ", ".join(f"{name} {self.cap(name):.1f}s" for name in self.defaults)
+
+
+class Deadline:
+    def __init__(self, seconds: Optional[float], caps: WaitCaps):
+        """`seconds=None`: no cycle budget, only the per-step caps."""
+        self.budget = seconds
+        self.caps = caps
+        self.started = time.monotonic()
+
+    def remaining(self) -> float:
+        if self.budget is None:
+            return float("inf")
+        return self.budget - (time.monotonic() - self.started)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, name: str, essential: bool = False) -> float:
+        """Seconds the `name` wait may take now; raises CycleOverBudget once the cycle is spent."""
+        cap = self.caps.cap(name)
+        if essential:
+            return cap
+        left = self.remaining()
+        if left <= 0:
+            raise CycleOverBudget(f"{self.budget:.0f}s cycle budget spent before '{name}'")
+        return min(cap, left)
+
+    def wait(self, name: str, fn: Callable[[float], T], essential: bool = False) -> T:
+        """
+        Run fn(timeout); a truthy result's duration feeds the step's p95.
+
+        A falsy result or an exception after the full cap counts as a timeout at the cap. One
+        cut short by the cycle budget says nothing about the step and is not recorded.
+        """
+        cap = self.caps.cap(name)
+        timeout = self.timeout(name, essential)
+        started = time.perf_counter()
+        try:
+            result = fn(timeout)
+        except Exception:
+            self._missed(name, cap, timeout, started)
+            raise
+        if result:
+            self.caps.observe(name, time.perf_counter() - started)
+        else:
+            self._missed(name, cap, timeout, started)
+        return result
+
+    def _missed(self, name: str, cap: float, timeout: float, started: float) -> None:
+        # Fast failures (stale element, no such option) are not timeouts
+        if timeout >= cap and time.perf_counter() - started >= 0.9 * cap:
+            self.caps.observe_timeout(name, cap)
@@ -0,0 +1,137 @@
+"""
+Record the datepicker / form HTML the bot sees, for offline parsing tests and benchmarks.
+
+Off unless a country script calls recorder.configure(path). When on, every datepicker
+read (already fetched as outerHTML, so no extra round trip) and every explicit capture()
+is appended to a gzipped JSON-lines archive:
+
+    {"ts": ..., "kind": "calendar", "step": ..., "facility": ..., "cycle": ..., "sha": ..., "html": ...}
+
+Identical HTML is stored once per run; later records carry only its "sha". Each run
+appends a new gzip member, and an archive cut short by a crash still reads up to the
+last complete record.
+
+    python -m common.fixtures --archive visa_fixtures.jsonl.gz            # summary
+    python -m common.fixtures --archive visa_fixtures.jsonl.gz --show 12  # dump one record
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Callable, Iterator, Optional
+
+from common.formparse import parse_form
+
+# Form plus the picker (which AIS renders outside the form), in one round trip
+_CAPTURE_JS = """
+var form = document.querySelector("form[action*='/appointment']") || document.body;
+var picker = document.getElementById('ui-datepicker-div');
+return form.outerHTML + (picker && !form.contains(picker) ? picker.outerHTML : '');
+"""
+
+
+class FixtureRecorder:
+    def __init__(self):
+        self.path: Optional[str] = None
+        self.context: Callable[[], dict] = dict
+        self.recorded = 0
+        self._fh = None
+        self._seen: set = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def configure(self, path: Optional[str], context: Optional[Callable[[], dict]] = None) -> None:
+        """Start appending to `path` (None turns recording off); `context` adds step/facility/cycle."""
+        self.close()
+        self.path = path
+        self.context = context or dict
+
+    def record(self, kind: str, html: str, **meta) -> None:
+        if self.path is None or not html:
+            return
+        sha = hashlib.sha1(html.encode("utf-8")).hexdigest()[:16]
+        entry = {"ts": round(time.time(), 3), "kind": kind, **self.context(), **meta, "sha": sha}
+        with self._lock:
+            if sha not in self._seen:
+                self._seen.add(sha)
+                entry["html"] = html
+            if self._fh is None:
+                self._fh = gzip.open(self.path, "at", encoding="utf-8")
+            self._fh.write(json.dumps(entry, default=str) + "\n")
+            self._fh.flush()  # sync-flush: readable even if the process dies
+            self.recorded += 1
+
+    def capture(self, driver, kind: str, **meta) -> None:
+        """Fetch the whole form's HTML (one execute_script) and record it. No-op when off."""
+        if self.path is None:
+            return
+        try:
+            html = driver.execute_script(_CAPTURE_JS)
+        except Exception:
+            return  # recording must never break a check
+        self.record(kind, html, **meta)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            self._seen = set()
+
+
+recorder = FixtureRecorder()
+
+
+def iter_fixtures(path: str) -> Iterator[dict]:
+    """Every record in the archive with "html" resolved, oldest first."""
+    bodies = {}
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if "html" in entry:
+                    bodies[entry["sha"]] = entry["html"]
+                else:
+                    entry["html"] = bodies.get(entry.get("sha"), "")
+                yield entry
+    except (EOFError, zlib.error):
+        return  # truncated final member (recording process was killed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarise or dump a recorded fixture archive.")
+    parser.add_argument("--archive", default=os.getenv("RECORD_FIXTURES", "visa_fixtures.jsonl.gz"))
+    parser.add_argument("--show", type=int, help="print record N (0-based) and its parsed form")
+    args = parser.parse_args()
+
+    kinds, distinct, total = Counter(), set(), 0
+    for index, entry in enumerate(iter_fixtures(args.archive)):
+        if args.show == index:
+            state = parse_form(entry["html"])
+            print(json.dumps({k: v for k, v in entry.items() if k != "html"}, default=str))
+            print(entry["html"])
+            print(f"months={state.calendar.months} days={sorted(d.isoformat() for d in state.calendar.days)}")
+            print(f"facility={state.selected_facility!r} times={state.times}")
+            return
+        kinds[entry.get("kind")] += 1
+        distinct.add(entry.get("sha"))
+        total += 1
+    print(f"{total} record(s), {len(distinct)} distinct HTML bodies, "
+          f"{os.path.getsize(args.archive) / 1024:.0f} KiB on disk")
+    for kind, n in kinds.most_common():
+        print(f"  {kind:<20} {n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Resumable navigation state machine for the AIS reschedule flow.
+
+States (detected from the live page in one execute_script round trip):
+    blank              fresh browser, nothing loaded
+    signed_out         sign-in form
+    dashboard          groups page ("Continue") or continue_actions accordion
+    reschedule_warning "I understand" limit gate (confirmed_limit_message)
+    appointment_form   facility dropdown present
+    datepicker_open    appointment form with the datepicker showing
+    unknown            anything else (error page, half-loaded page, ...)
+
+Each country script maps states to an ordered list of transitions (cheapest first).
+recover() detects where the browser is, runs the first transition that moves it
+forward, and repeats until it reaches the form. Every transition is timed.
+"""
+import time
+from typing import Callable, Dict, List, Sequence
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from common.instrumentation import span
+
+
+BLANK = "blank"
+SIGNED_OUT = "signed_out"
+DASHBOARD = "dashboard"
+RESCHEDULE_WARNING = "reschedule_warning"
+APPOINTMENT_FORM = "appointment_form"
+DATEPICKER_OPEN = "datepicker_open"
+UNKNOWN = "unknown"
+
+FORM_STATES = (APPOINTMENT_FORM, DATEPICKER_OPEN)
+
+_DETECT_JS = """
+var url = window.location.href;
+if (!url || url.indexOf('about:') === 0 || url.indexOf('data:') === 0) { return 'blank'; }
+if (document.readyState !== 'complete') { return 'unknown'; }
+if (url.indexOf('sign_in') !== -1 || document.getElementById('user_email')) { return 'signed_out'; }
+if (document.getElementById('appointments_consulate_appointment_facility_id')) {
+  var picker = document.getElementById('ui-datepicker-div');
+  var open = picker && window.getComputedStyle(picker).display !== 'none' && picker.querySelector('.ui-datepicker-title');
+  return open ? 'datepicker_open' : 'appointment_form';
+}
+if (document.getElementById('confirmed_limit_message')) { return 'reschedule_warning'; }
+if (url.indexOf('/groups/') !== -1 || url.indexOf('continue_actions') !== -1) { return 'dashboard'; }
+var links = document.querySelectorAll('a');
+for (var i = 0; i < links.length; i++) {
+  var t = (links[i].textContent || '').trim().toLowerCase();
+  if (t === 'continue' || t.indexOf('reschedule appointment') !== -1) { return 'dashboard'; }
+}
+return 'unknown';
+"""
+
+Transition = Callable[[webdriver.Chrome], object]
+
+
+def detect_state(driver: webdriver.Chrome) -> str:
+    """Classify the current page. Raises WebDriverException if the browser is gone."""
+    return driver.execute_script(_DETECT_JS) or UNKNOWN
+
+
+class NavigationFlow:
+    def __init__(self, transitions: Dict[str, Sequence[Transition]], log: Callable[[str], None],
+                 settle_timeout: float = 10.0, max_steps: int = 10):
+        self.transitions = transitions
+        self.log = log
+        self.settle_timeout = settle_timeout
+        self.max_steps = max_steps
+        # (from_state, to_state, transition name, seconds) for every transition attempted
+        self.history: List[tuple] = []
+
+    def _wait_for_change(self, driver: webdriver.Chrome, from_state: str) -> str:
+        """Poll until the page settles into a state other than `from_state` (or time runs out)."""
+        try:
+            return WebDriverWait(driver, self.settle_timeout, poll_frequency=0.1).until(
+                lambda d: (lambda s: s if s not in (from_state, UNKNOWN) else False)(detect_state(d))
+            )
+        except TimeoutException:
+            return detect_state(driver)
+
+    def recover(self, driver: webdriver.Chrome, targets: Sequence[str] = FORM_STATES) -> bool:
+        """
+        Drive the browser from wherever it is to one of `targets`.
+
+        For each state the transitions are tried cheapest-first; a transition that leaves the
+        page in the same state counts as failed and the next one is tried. Returns False when a
+        state has no transitions left (the caller decides whether to rebuild or give up).
+        """
+        started = time.perf_counter()
+        attempts: Dict[str, int] = {}
+        state = detect_state(driver)
+        entry = state
+
+        for _ in range(self.max_steps):
+            if state in targets:
+                if entry not in targets:
+                    self.log(f"[FLOW] Recovered {entry} -> {state} in {time.perf_counter() - started:.2f}s")
+                return True
+
+            options = self.transitions.get(state) or self.transitions.get(UNKNOWN) or []
+            index = attempts.get(state, 0)
+            if index >= len(options):
+                self.log(f"[FLOW] No transition left out of '{state}' (entered at '{entry}').")
+                return False
+            attempts[state] = index + 1
+
+            transition = options[index]
+            name = getattr(transition, "__name__", "transition")
+            t0 = time.perf_counter()
+            with span(f"transition:{state}", via=name) as current:
+                transition(driver)
+                new_state = self._wait_for_change(driver, state)
+                current.tags["to_state"] = new_state
+            elapsed = time.perf_counter() - t0
+            self.history.append((state, new_state, name, elapsed))
+            self.log(f"[FLOW] {state} --{name}--> {new_state} ({elapsed:.2f}s)")
+            state = new_state
+
+        self.log(f"[FLOW] Gave up after {self.max_steps} transitions (stuck at '{state}').")
+        return False
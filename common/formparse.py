@@ -0,0 +1,263 @@
+"""
+Selenium-free parsing of the appointment form and jQuery UI datepicker HTML.
+
+The live code fetches the datepicker's outerHTML in the same execute_script call that acts
+on it (see common/datepicker.py) and hands it to parse_calendar(); recorded fixtures
+(common/fixtures.py) go through exactly the same functions, so the parsing hot path can be
+exercised and benchmarked without a browser:
+
+    python bench/parse_bench.py --archive visa_fixtures.jsonl.gz
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from html import unescape
+from typing import List, Optional, Set, Tuple
+
+FACILITY_SELECT_ID = "appointments_consulate_appointment_facility_id"
+DATE_INPUT_ID = "appointments_consulate_appointment_date"
+TIME_SELECT_ID = "appointments_consulate_appointment_time"
+
+
+@dataclass
+class CalendarSnapshot:
+    """Everything we need from the datepicker, read in a single execute_script call."""
+    acted: bool = False
+    input_present: bool = False
+    input_enabled: bool = False
+    input_value: str = ""
+    is_open: bool = False
+    # (year, month) shown in each pane, first pane first
+    months: List[Tuple[int, int]] = field(default_factory=list)
+    days: Set[date] = field(default_factory=set)
+    prev_enabled: bool = False
+    next_enabled: bool = False
+
+    @property
+    def first_month(self) -> Optional[Tuple[int, int]]:
+        return self.months[0] if self.months else None
+
+    @property
+    def last_month(self) -> Optional[Tuple[int, int]]:
+        return self.months[-1] if self.months else None
+
+
+@dataclass
+class FormState:
+    """The appointment form as a whole: facility choice, date input, picker and time options."""
+    facilities: List[Tuple[str, str]] = field(default_factory=list)  # (value, text), blanks dropped
+    selected_facility: Optional[str] = None  # option text
+    calendar: CalendarSnapshot = field(default_factory=CalendarSnapshot)
+    times: List[str] = field(default_factory=list)  # non-empty option values, in page order
+    selected_time: Optional[str] = None
+
+
+def pane_month(month_name: str, year: str, days: List[Tuple[int, int, int]]) -> Optional[Tuple[int, int]]:
+    try:
+        shown = datetime.strptime(f"{month_name} {year}", "%B %Y")
+        return shown.year, shown.month
+    except ValueError:
+        # Header not rendered yet; fall back to the month of any selectable day
+        return (days[0][0], days[0][1]) if days else None
+
+
+# Tags, comments and text are all we need; <script>/<style> bodies are skipped whole
+_RAW_TEXT = ("script", "style")
+# Quoted attribute values are matched whole, so a '>' inside one (title="a>b") doesn't end the tag
+_TOKEN_RE = re.compile(r"""<!--.*?-->|<(/?)([a-zA-Z][a-zA-Z0-9]*)([^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*)>""", re.S)
+_ATTR_RE = re.compile(r"""([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+# Only start tags that can matter are split into attributes (most <div>/<td> are skipped cheaply)
+_INTERESTING = {
+    "div": "ui-datepicker-group",
+    "span": "ui-datepicker-",
+    "td": "selectDay",
+    "a": "ui-datepicker-",
+    "input": "appointment_date",
+    "select": "appointments_consulate_appointment_",
+}
+
+
+def _attrs(text: str) -> dict:
+    return {m.group(1).lower(): unescape(m.group(2) or m.group(3) or m.group(4) or "")
+            for m in _ATTR_RE.finditer(text)}
+
+
+class _Pane:
+    __slots__ = ("month", "year", "days")
+
+    def __init__(self):
+        self.month = ""
+        self.year = ""
+        self.days: List[Tuple[int, int, int]] = []
+
+
+class _FormParser:
+    """
+    One regex pass over the markup; only the handful of elements we care about are tracked.
+
+    html.parser.HTMLParser gives the same result at several times the cost; this runs once
+    per datepicker round trip, so it is kept to a tokenizer.
+    """
+
+    def __init__(self):
+        self.panes: List[_Pane] = []
+        self.prev_enabled = False
+        self.next_enabled = False
+        self.input_present = False
+        self.input_enabled = False
+        self.input_value = ""
+        self.facilities: List[Tuple[str, str]] = []
+        self.selected_facility: Optional[str] = None
+        self.times: List[str] = []
+        self.selected_time: Optional[str] = None
+
+        self._select: Optional[str] = None  # id of the <select> we are inside
+        self._option: Optional[Tuple[str, bool]] = None  # (value, selected) of the open <option>
+        self._text: Optional[str] = None  # what the collected text belongs to
+        self._buffer: List[str] = []
+        self._day: Optional[Tuple[int, int]] = None
+
+    def _pane(self) -> _Pane:
+        # A single-month picker has no group wrappers; its days belong to one implicit pane
+        if not self.panes:
+            self.panes.append(_Pane())
+        return self.panes[-1]
+
+    def _collect(self, target: str) -> None:
+        self._text = target
+        self._buffer = []
+
+    def feed(self, html: str) -> None:
+        last = 0
+        search = _TOKEN_RE.search
+        m = search(html)
+        while m is not None:
+            if self._text is not None and m.start() > last:
+                self._buffer.append(html[last:m.start()])
+            last = m.end()
+            tag = m.group(2)
+            if tag is None:  # comment
+                m = search(html, last)
+                continue
+            tag = tag.lower()
+            if m.group(1):
+                self.handle_endtag(tag)
+                m = search(html, last)
+                continue
+            if tag in _RAW_TEXT:
+                end = html.lower().find(f"</{tag}", last)
+                last = len(html) if end < 0 else end
+                m = search(html, last)
+                continue
+            rest = m.group(3)
+            hint = _INTERESTING.get(tag)
+            if tag == "option":
+                if self._select:
+                    self.handle_starttag(tag, _attrs(rest))
+            elif hint is not None and hint in rest:
+                self.handle_starttag(tag, _attrs(rest))
+            m = search(html, last)
+        if self._text is not None:
+            self._buffer.append(html[last:])
+
+    def _collected(self) -> str:
+        return unescape("".join(self._buffer)).strip()
+
+    def handle_starttag(self, tag, a):
+        classes = (a.get("class") or "").split()
+        if tag == "div" and "ui-datepicker-group" in classes:
+            self.panes.append(_Pane())
+        elif tag == "span" and "ui-datepicker-month" in classes:
+            self._collect("month")
+        elif tag == "span" and "ui-datepicker-year" in classes:
+            self._collect("year")
+        elif tag == "td" and a.get("data-handler") == "selectDay":
+            try:
+                self._day = (int(a["data-year"]), int(a["data-month"]) + 1)
+            except (KeyError, ValueError):
+                self._day = None
+            self._collect("day")
+        elif tag == "a" and ("ui-datepicker-prev" in classes or "ui-datepicker-next" in classes):
+            enabled = "ui-state-disabled" not in classes
+            if "ui-datepicker-prev" in classes:
+                self.prev_enabled = enabled
+            else:
+                self.next_enabled = enabled
+        elif tag == "input" and a.get("id") == DATE_INPUT_ID:
+            self.input_present = True
+            self.input_enabled = "disabled" not in a
+            self.input_value = a.get("value") or ""
+        elif tag == "select" and a.get("id") in (FACILITY_SELECT_ID, TIME_SELECT_ID):
+            self._select = a["id"]
+        elif tag == "option" and self._select:
+            if self._option is not None:  # previous <option> left unclosed
+                self._end_option()
+            self._option = (a.get("value") or "", "selected" in a)
+            self._collect("option")
+
+    def handle_endtag(self, tag):
+        if tag == "span" and self._text in ("month", "year"):
+            setattr(self._pane(), self._text, self._collected())
+            self._text = None
+        elif tag == "td" and self._text == "day":
+            text = self._collected()
+            if self._day is not None and text.isdigit():
+                self._pane().days.append((self._day[0], self._day[1], int(text)))
+            self._text = None
+            self._day = None
+        elif tag == "option" and self._option is not None:
+            self._end_option()
+        elif tag == "select":
+            if self._option is not None:
+                self._end_option()
+            self._select = None
+
+    def _end_option(self):
+        value, selected = self._option
+        text = self._collected()
+        if self._select == FACILITY_SELECT_ID:
+            if value or text:
+                self.facilities.append((value, text))
+                if selected:
+                    self.selected_facility = text
+        elif value:
+            self.times.append(value)
+            if selected:
+                self.selected_time = value
+        self._option = None
+        self._text = None
+
+    def calendar(self) -> CalendarSnapshot:
+        snapshot = CalendarSnapshot(
+            input_present=self.input_present,
+            input_enabled=self.input_enabled,
+            input_value=self.input_value,
+            prev_enabled=self.prev_enabled,
+            next_enabled=self.next_enabled,
+        )
+        for pane in self.panes:
+            month = pane_month(pane.month, pane.year, pane.days)
+            if month is not None:
+                snapshot.months.append(month)
+            snapshot.days.update(date(y, m, d) for y, m, d in pane.days)
+        return snapshot
+
+
+def parse_calendar(html: str) -> CalendarSnapshot:
+    """Months shown, selectable days and arrow state from the #ui-datepicker-div markup."""
+    parser = _FormParser()
+    parser.feed(html or "")
+    return parser.calendar()
+
+
+def parse_form(html: str) -> FormState:
+    """The appointment form (plus the picker, if included) as one FormState."""
+    parser = _FormParser()
+    parser.feed(html or "")
+    return FormState(
+        facilities=parser.facilities,
+        selected_facility=parser.selected_facility,
+        calendar=parser.calendar(),
+        times=parser.times,
+        selected_time=parser.selected_time,
+    )
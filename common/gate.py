@@ -0,0 +1,58 @@
+"""
+The "I understand" reschedule-limit gate (confirmed_limit_message), shared by both scripts.
+
+AIS shows it between the dashboard and the appointment form once an account has used some
+of its reschedules. Both NavigationFlow maps register accept_reschedule_warning for the
+reschedule_warning state, so recover() can get past it wherever the session lands on it.
+"""
+from typing import Callable
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from common.governor import PAGE_LOAD, RateGovernor
+from common.locators import LocatorRegistry
+from common.waits import wait_for_checked
+
+CHECKBOX_ID = "confirmed_limit_message"
+
+
+def accept_reschedule_warning(driver: webdriver.Chrome, locators: LocatorRegistry, governor: RateGovernor,
+                              log: Callable[[str], None], checkbox_timeout: float = 2) -> bool:
+    """Tick 'I understand' and click Continue. True if there was no gate or it was passed."""
+    log("[STEP] Handling reschedule warning page (I understand + Continue)...")
+
+    # If checkbox isn't present quickly, assume no warning gate
+    try:
+        cb = WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.ID, CHECKBOX_ID)))
+    except Exception:
+        log("[INFO] Warning checkbox not present; continuing.")
+        return True
+
+    # Wait until checkbox is interactable / rendered
+    try:
+        WebDriverWait(driver, 15).until(lambda d: d.find_element(By.ID, CHECKBOX_ID).is_displayed())
+        WebDriverWait(driver, 15).until(lambda d: d.find_element(By.ID, CHECKBOX_ID).is_enabled())
+    except Exception:
+        pass
+
+    # Click wrapper (icheck) if possible
+    try:
+        wrapper = driver.find_element(By.XPATH, f"//div[contains(@class,'icheckbox')]//input[@id='{CHECKBOX_ID}']/..")
+        driver.execute_script("arguments[0].click();", wrapper)
+    except Exception:
+        driver.execute_script("arguments[0].click();", cb)
+
+    # Verify it checked (returns as soon as the icheck wrapper has toggled the input)
+    if not wait_for_checked(driver, CHECKBOX_ID, checkbox_timeout):
+        log("[ERROR] Checkbox click did not stick.")
+        return False
+    log("[INFO] Checked 'I understand' checkbox.")
+
+    cont = locators.find(driver, "warning_continue", 15)
+    governor.acquire(PAGE_LOAD, reason="warning Continue")
+    driver.execute_script("arguments[0].click();", cont)
+    log("[INFO] Clicked Continue on warning page.")
+    return True
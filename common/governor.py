@@ -0,0 +1,124 @@
+"""
+Request budget shared by every navigation and login, persisted across restarts.
+
+Each kind of request (page loads, logins) has a token bucket: `capacity` tokens, refilled
+continuously at capacity / window seconds. acquire() takes a token, sleeping until one is
+available when the bucket is empty, so the long-run rate can never exceed the configured
+limit however often the browser is rebuilt or the process is restarted. Bucket levels are
+written to a small JSON file (atomically, like the session checkpoint) after every change
+and refilled from wall-clock time on load.
+
+attach(driver) routes WebDriver "get" and "refresh" commands through the page-load
+bucket; click-driven navigations call acquire(PAGE_LOAD) explicitly.
+"""
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+PAGE_LOAD = "page_load"
+LOGIN = "login"
+
+_NAVIGATION_COMMANDS = ("get", "refresh")
+
+
+class RateGovernor:
+    def __init__(self, path: Optional[str], limits: Dict[str, Tuple[float, float]],
+                 log: Callable[[str], None], sleep: Callable[[float], None] = time.sleep):
+        """`limits` maps kind -> (capacity, window seconds), e.g. {LOGIN: (10, 86400)}."""
+        self.path = path
+        self.limits = limits
+        self.log = log
+        self.sleep = sleep
+        self.acquired: Dict[str, int] = {kind: 0 for kind in limits}
+        self.waited: Dict[str, float] = {kind: 0.0 for kind in limits}
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Dict[str, float]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        saved: dict = {}
+        if self.path:
+            try:
+                with open(self.path, "r", encoding="utf-8") as fh:
+                    saved = json.load(fh)
+            except (OSError, ValueError):
+                saved = {}
+        now = time.time()
+        buckets = {}
+        for kind, (capacity, _) in self.limits.items():
+            entry = saved.get(kind) if isinstance(saved, dict) else None
+            if isinstance(entry, dict) and "tokens" in entry and "updated" in entry:
+                buckets[kind] = {"tokens": min(float(entry["tokens"]), capacity), "updated": float(entry["updated"])}
+            else:
+                buckets[kind] = {"tokens": float(capacity), "updated": now}
+        return buckets
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(self._buckets, fh)
+        os.replace(tmp, self.path)
+
+    def _refill(self, kind: str, now: float) -> Dict[str, float]:
+        capacity, window = self.limits[kind]
+        bucket = self._buckets[kind]
+        elapsed = max(0.0, now - bucket["updated"])  # tolerate the clock stepping backwards
+        bucket["tokens"] = min(capacity, bucket["tokens"] + elapsed * capacity / window)
+        bucket["updated"] = now
+        return bucket
+
+    def acquire(self, kind: str, reason: str = "") -> float:
+        """Take one `kind` token, sleeping until one is available. Returns seconds waited."""
+        if kind not in self.limits:
+            return 0.0
+        capacity, window = self.limits[kind]
+        waited = 0.0
+        while True:
+            with self._lock:
+                bucket = self._refill(kind, time.time())
+                if bucket["tokens"] >= 1.0:
+                    bucket["tokens"] -= 1.0
+                    self.acquired[kind] += 1
+                    self.waited[kind] += waited
+                    self._save()
+                    return waited
+                wait = (1.0 - bucket["tokens"]) * window / capacity
+            self.log(f"[GOVERNOR] {kind} budget exhausted ({capacity:g} per {window / 3600:g}h); "
+                     f"waiting {wait:.0f}s{f' before {reason}' if reason else ''}.")
+            self.sleep(wait)
+            waited += wait
+
+    def attach(self, driver):
+        """Route the driver's page navigations (get/refresh) through the page-load bucket."""
+        if getattr(driver, "_governed", False) or PAGE_LOAD not in self.limits:
+            return driver
+        execute = driver.execute
+
+        def governed(driver_command, params=None):
+            if driver_command in _NAVIGATION_COMMANDS:
+                self.acquire(PAGE_LOAD, reason=driver_command)
+            return execute(driver_command, params)
+
+        driver.execute = governed
+        driver._governed = True
+        return driver
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Current budget per kind: tokens left, capacity, window, acquired and seconds waited."""
+        with self._lock:
+            now = time.time()
+            out = {}
+            for kind, (capacity, window) in self.limits.items():
+                tokens = self._refill(kind, now)["tokens"]
+                out[kind] = {
+                    "tokens": round(tokens, 2),
+                    "capacity": capacity,
+                    "window_s": window,
+                    "acquired": self.acquired[kind],
+                    "waited_s": round(self.waited[kind], 1),
+                }
+            return out
@@ -0,0 +1,329 @@
+"""
+Availability history in a local SQLite file (WAL mode).
+
+Three tables:
+    observations  one row per (cycle, facility): when, country, cycle latency/outcome, the
+                  date window that was read and a reference to the date set that was
+                  selectable in it. Cycles that never got as far as reading a calendar are
+                  stored with facility NULL.
+    date_sets     content-addressed, bit-packed date sets. A facility showing the same dates
+                  for a week of polling stores that set once.
+    slots         change log: one row per (facility, day) open interval, with appeared_at and
+                  vanished_at (NULL while still open). Queries about first appearance and slot
+                  lifetime read this table only.
+
+Only days inside the window that was read can change. A day that was not read is left as
+it was, so moving the window (day roll-over, a config edit) does not close anything. A day
+that turns up open the first time it falls inside the window was open before it could be
+seen, so its row has appeared_exact = 0 and is left out of first-seen, lifetimes and the
+scheduler's release times.
+
+Writes are buffered in memory and committed in one transaction every `flush_seconds`,
+every `batch_size` rows, when a cycle finds a date, and on close().
+
+Query CLI:
+    python -m common.history --db visa_history.sqlite3 first-seen --facility Nairobi --before 2026-01-05
+    python -m common.history --db visa_history.sqlite3 lifetime
+    python -m common.history --db visa_history.sqlite3 latest
+    python -m common.history --db visa_history.sqlite3 summary
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from common.availability import DateBits
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS date_sets (
+    id      INTEGER PRIMARY KEY,
+    encoded BLOB NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS observations (
+    observed_at REAL NOT NULL,
+    country     TEXT NOT NULL,
+    facility    TEXT,
+    cycle       TEXT,
+    latency_ms  REAL,
+    outcome     TEXT,
+    set_id      INTEGER REFERENCES date_sets(id),
+    window_start TEXT,
+    window_end   TEXT
+);
+CREATE INDEX IF NOT EXISTS observations_facility_time ON observations (facility, observed_at);
+CREATE TABLE IF NOT EXISTS slots (
+    country     TEXT NOT NULL,
+    facility    TEXT NOT NULL,
+    day         TEXT NOT NULL,
+    appeared_at REAL NOT NULL,
+    vanished_at REAL,
+    appeared_exact INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS slots_day ON slots (day);
+CREATE INDEX IF NOT EXISTS slots_facility_appeared ON slots (facility, appeared_at);
+"""
+# Columns added after the first release: (table, column, declaration) for older files
+MIGRATIONS = (
+    ("observations", "window_start", "TEXT"),
+    ("observations", "window_end", "TEXT"),
+    ("slots", "appeared_exact", "INTEGER NOT NULL DEFAULT 1"),
+)
+
+Window = Tuple[date, date]
+
+
+# --- compact date-set encoding ------------------------------------------------
+
+def encode_dates(days: Iterable[date]) -> bytes:
+    """Dates -> 4-byte base ordinal + little-endian bitset of day offsets (b"" if empty)."""
+    return DateBits.from_dates(days).encode()
+
+
+def decode_dates(encoded: bytes) -> List[date]:
+    return DateBits.decode(encoded).dates()
+
+
+def _as_day(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+# --- store ---------------------------------------------------------------------
+
+class HistoryStore:
+    def __init__(self, path: str, country: str, batch_size: int = 200, flush_seconds: float = 600.0):
+        self.path = path
+        self.country = country
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+
+        self.conn: Optional[sqlite3.Connection] = None
+        self._cycle: Dict[str, Tuple[Set[date], Window]] = {}
+        self._observations: List[tuple] = []
+        self._new_slots: List[list] = []  # [country, facility, day, appeared_at, vanished_at, appeared_exact]
+        self._unwritten: Dict[Tuple[str, str], list] = {}  # still-open rows in _new_slots
+        self._slot_closes: List[tuple] = []
+        self._set_ids: Dict[bytes, int] = {}
+        self._open: Dict[Tuple[str, str], float] = {}
+        self._windows: Dict[str, Window] = {}  # facility -> window of its last read
+        self._last_flush = time.monotonic()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened on first use so importing a country script never touches the disk
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            for table, column, declaration in MIGRATIONS:
+                columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+                    if column == "appeared_exact":
+                        # Older files: slots open on each country's first read predate the bot
+                        self.conn.execute(
+                            "UPDATE slots SET appeared_exact = 0 WHERE appeared_at = "
+                            "(SELECT MIN(appeared_at) FROM slots s WHERE s.country = slots.country)")
+            self.conn.commit()
+            # (facility, day) -> appeared_at for intervals still open from a previous run
+            self._open = {
+                (facility, day): appeared_at
+                for facility, day, appeared_at in self.conn.execute(
+                    "SELECT facility, day, appeared_at FROM slots WHERE country = ? AND vanished_at IS NULL",
+                    (self.country,),
+                )
+            }
+            self._windows = {
+                facility: (date.fromisoformat(start), date.fromisoformat(end))
+                for facility, start, end, _ in self.conn.execute(
+                    "SELECT facility, window_start, window_end, MAX(observed_at) FROM observations "
+                    "WHERE country = ? AND facility IS NOT NULL AND window_start IS NOT NULL GROUP BY facility",
+                    (self.country,),
+                )
+            }
+        return self.conn
+
+    def observe(self, facility: str, days: Iterable, start, end) -> None:
+        """Record the selectable dates read for `facility` in the current cycle, within [start, end]."""
+        self._cycle[facility] = ({_as_day(d) for d in days}, (_as_day(start), _as_day(end)))
+
+    def end_cycle(self, record: Optional[dict]) -> None:
+        """Attach the cycle's latency/outcome (an instrumentation.end_cycle record) and buffer it."""
+        observed, self._cycle = self._cycle, {}
+        if record is None:
+            return
+        self._connect()
+        now = time.time()
+        cycle_id = str(record.get("cycle"))
+        latency_ms = record.get("wall_ms")
+        outcome = record.get("outcome")
+
+        if not observed:
+            self._observations.append((now, self.country, None, cycle_id, latency_ms, outcome, None, None, None))
+        for facility, (days, window) in observed.items():
+            self._observations.append((now, self.country, facility, cycle_id, latency_ms, outcome,
+                                       encode_dates(days), window[0].isoformat(), window[1].isoformat()))
+            self._track_changes(facility, days, window, now)
+
+        if (outcome == "found" or len(self._observations) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            self.flush()
+
+    def _track_changes(self, facility: str, days: Set[date], window: Window, now: float) -> None:
+        start, end = window[0].isoformat(), window[1].isoformat()
+        previous = self._windows.get(facility)
+        self._windows[facility] = window
+        current = {d.isoformat() for d in days if window[0] <= d <= window[1]}
+        # Only days inside this read's window can have vanished; the rest were not looked at
+        for key in [k for k in self._open
+                    if k[0] == facility and start <= k[1] <= end and k[1] not in current]:
+            del self._open[key]
+            row = self._unwritten.pop(key, None)
+            if row is not None:
+                row[4] = now  # opened and closed within this batch
+            else:
+                self._slot_closes.append((now, self.country, facility, key[1]))
+        for day in current:
+            if (facility, day) not in self._open:
+                self._open[(facility, day)] = now
+                # Exact only if the previous read covered this day and it was closed then
+                exact = previous is not None and previous[0].isoformat() <= day <= previous[1].isoformat()
+                row = [self.country, facility, day, now, None, int(exact)]
+                self._new_slots.append(row)
+                self._unwritten[(facility, day)] = row
+
+    def _set_id(self, encoded: Optional[bytes]) -> Optional[int]:
+        if encoded is None:
+            return None
+        set_id = self._set_ids.get(encoded)
+        if set_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO date_sets (encoded) VALUES (?)", (encoded,))
+            set_id = self.conn.execute("SELECT id FROM date_sets WHERE encoded = ?", (encoded,)).fetchone()[0]
+            self._set_ids[encoded] = set_id
+        return set_id
+
+    def flush(self) -> None:
+        if not (self._observations or self._new_slots or self._slot_closes):
+            return
+        with self.conn:
+            rows = [(*row[:6], self._set_id(row[6]), *row[7:]) for row in self._observations]
+            self.conn.executemany(
+                "INSERT INTO observations (observed_at, country, facility, cycle, latency_ms, outcome, set_id, "
+                "window_start, window_end) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany(
+                "UPDATE slots SET vanished_at = ? WHERE country = ? AND facility = ? AND day = ? "
+                "AND vanished_at IS NULL",
+                self._slot_closes,
+            )
+            self.conn.executemany(
+                "INSERT INTO slots (country, facility, day, appeared_at, vanished_at, appeared_exact) "
+                "VALUES (?, ?, ?, ?, ?, ?)", self._new_slots)
+        self._observations, self._new_slots, self._slot_closes = [], [], []
+        self._unwritten = {}
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        if self.conn is None:
+            return
+        self.flush()
+        self.conn.close()
+        self.conn = None
+
+
+# --- queries -------------------------------------------------------------------
+
+def first_seen(conn: sqlite3.Connection, facility: str, before: Optional[str] = None,
+               after: Optional[str] = None) -> List[Tuple[str, float]]:
+    """(day, first appeared_at) for each day seen opening at `facility` within the bounds."""
+    sql = "SELECT day, MIN(appeared_at) FROM slots WHERE facility = ? AND appeared_exact = 1"
+    params: list = [facility]
+    if before:
+        sql += " AND day < ?"
+        params.append(before)
+    if after:
+        sql += " AND day >= ?"
+        params.append(after)
+    return list(conn.execute(sql + " GROUP BY day ORDER BY day", params))
+
+
+def slot_lifetimes(conn: sqlite3.Connection) -> Dict[str, List[float]]:
+    """facility -> lifetimes (seconds) of every slot interval that has closed."""
+    out: Dict[str, List[float]] = {}
+    for facility, seconds in conn.execute(
+        "SELECT facility, vanished_at - appeared_at FROM slots WHERE vanished_at IS NOT NULL AND appeared_exact = 1"
+    ):
+        out.setdefault(facility, []).append(seconds)
+    return out
+
+
+def latest_sets(conn: sqlite3.Connection) -> List[Tuple[str, str, float, List[date]]]:
+    """(country, facility, observed_at, dates) of the newest observation per facility."""
+    rows = conn.execute(
+        "SELECT o.country, o.facility, MAX(o.observed_at), d.encoded FROM observations o "
+        "JOIN date_sets d ON d.id = o.set_id WHERE o.facility IS NOT NULL "
+        "GROUP BY o.country, o.facility ORDER BY o.country, o.facility"
+    )
+    return [(c, f, t, decode_dates(enc)) for c, f, t, enc in rows]
+
+
+def _fmt_time(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _fmt_span(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}h"
+    if seconds >= 60:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds:.0f}s"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query the availability history store.")
+    parser.add_argument("--db", default=os.getenv("HISTORY_DB", "visa_history.sqlite3"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("first-seen", help="when each day first appeared at a facility")
+    p.add_argument("--facility", required=True)
+    p.add_argument("--before", help="only days before YYYY-MM-DD")
+    p.add_argument("--after", help="only days on/after YYYY-MM-DD")
+    sub.add_parser("lifetime", help="median slot lifetime per facility")
+    sub.add_parser("latest", help="newest date set per facility")
+    sub.add_parser("summary", help="row counts, outcomes and file size")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    if args.command == "first-seen":
+        rows = first_seen(conn, args.facility, args.before, args.after)
+        if not rows:
+            print("No matching days recorded.")
+        for day, appeared_at in rows:
+            print(f"{day}  first seen {_fmt_time(appeared_at)}")
+    elif args.command == "lifetime":
+        for facility, values in sorted(slot_lifetimes(conn).items()):
+            print(f"{facility:<16} n={len(values):<5} median={_fmt_span(statistics.median(values)):>7} "
+                  f"max={_fmt_span(max(values)):>7}")
+    elif args.command == "latest":
+        for country, facility, observed_at, days in latest_sets(conn):
+            shown = ", ".join(d.isoformat() for d in days[:8]) + (" ..." if len(days) > 8 else "")
+            print(f"{country:<13} {facility:<16} {_fmt_time(observed_at)}  {len(days)} date(s): {shown}")
+    else:
+        count = lambda sql: conn.execute(sql).fetchone()[0]  # noqa: E731
+        print(f"observations: {count('SELECT COUNT(*) FROM observations')}")
+        print(f"date sets:    {count('SELECT COUNT(*) FROM date_sets')}")
+        print(f"slot rows:    {count('SELECT COUNT(*) FROM slots')} "
+              f"({count('SELECT COUNT(*) FROM slots WHERE vanished_at IS NULL')} open)")
+        for outcome, n in conn.execute("SELECT outcome, COUNT(DISTINCT cycle) FROM observations GROUP BY outcome"):
+            print(f"  {outcome or '-':<10} {n} cycle(s)")
+        print(f"file size:    {os.path.getsize(args.db) / 1024:.0f} KiB")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Per-step timing spans and WebDriver command counters.
+
+Usage from a country script:
+    driver = instrumentation.attach(webdriver.Chrome(...))
+
+    @step("login")
+    def login(driver): ...
+
+    instrumentation.start_cycle(1)
+    ...
+    instrumentation.end_cycle("empty")     # appends one JSON line per cycle
+
+Every WebDriver command (find_element, execute_script, element .text/.click, ...) and
+every WebDriverWait.until() call (plus its timeouts) is counted against each span that is
+open at the time, so a parent span's counts include its children. Spans are per thread:
+commands from the standby warm-up or the watchdog never land in the main loop's spans or
+cycle. Step durations are kept as running aggregates plus a bounded sample, so a bot that
+runs for days holds the same memory as one that ran for an hour.
+"""
+import functools
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.wait import WebDriverWait
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class StepStats:
+    """Count, total and max of one step's durations, plus a fixed-size uniform sample for percentiles."""
+    __slots__ = ("count", "total", "max", "sample", "size")
+
+    def __init__(self, size: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.sample: List[float] = []
+        self.size = size
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if len(self.sample) < self.size:
+            self.sample.append(value)
+        else:
+            # Reservoir sampling: every value seen so far stays equally likely to be kept
+            slot = random.randrange(self.count)
+            if slot < self.size:
+                self.sample[slot] = value
+
+
+class _Span:
+    __slots__ = ("name", "tags", "started", "commands", "waits", "wait_timeouts")
+
+    def __init__(self, name: str, tags: dict):
+        self.name = name
+        self.tags = tags
+        self.started = time.perf_counter()
+        self.commands: Counter = Counter()
+        self.waits = 0
+        self.wait_timeouts = 0
+
+
+class Instrumentation:
+    def __init__(self):
+        self.path: Optional[str] = None
+        self.durations: Dict[str, StepStats] = defaultdict(StepStats)
+        self._local = threading.local()
+        self._cycle: Optional[dict] = None
+        self._cycle_thread: Optional[int] = None
+        self._waits_installed = False
+
+    def configure(self, path: Optional[str]) -> None:
+        """Set the JSONL output file (None disables writing) and hook WebDriverWait."""
+        self.path = path
+        self._install_wait_counters()
+
+    # --- driver / wait hooks --------------------------------------------
+
+    def attach(self, driver):
+        """Count every command the driver (and its elements) send to chromedriver."""
+        self._install_wait_counters()
+        if getattr(driver, "_instrumented", False):
+            return driver
+        execute = driver.execute
+
+        def counted(driver_command, params=None):
+            self._count(driver_command)
+            return execute(driver_command, params)
+
+        driver.execute = counted
+        driver._instrumented = True
+        return driver
+
+    def _install_wait_counters(self) -> None:
+        if self._waits_installed:
+            return
+        self._waits_installed = True
+        recorder = self
+
+        for method_name in ("until", "until_not"):
+            original = getattr(WebDriverWait, method_name)
+
+            def wrapped(wait, method, message="", _original=original):
+                recorder._count_wait(timed_out=False)
+                try:
+                    return _original(wait, method, message)
+                except TimeoutException:
+                    recorder._count_wait(timed_out=True)
+                    raise
+
+            setattr(WebDriverWait, method_name, wrapped)
+
+    @property
+    def _stack(self) -> List[_Span]:
+        """Open spans of the calling thread, outermost first."""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _own_cycle(self) -> Optional[dict]:
+        """The open cycle, if the calling thread is the one that started it."""
+        if self._cycle_thread != threading.get_ident():
+            return None
+        return self._cycle
+
+    def _count(self, command: str) -> None:
+        for span in self._stack:
+            span.commands[command] += 1
+        cycle = self._own_cycle()
+        if cycle is not None:
+            cycle["commands"][command] += 1
+
+    def _count_wait(self, timed_out: bool) -> None:
+        for span in self._stack:
+            if timed_out:
+                span.wait_timeouts += 1
+            else:
+                span.waits += 1
+        cycle = self._own_cycle()
+        if cycle is not None:
+            cycle["wait_timeouts" if timed_out else "waits"] += 1
+
+    def observe(self, name: str, ms: float) -> None:
+        """Add one duration to `name`'s aggregates (for timings that are not spans)."""
+        self.durations[name].add(ms)
+
+    # --- spans -------------------------------------------------------------
+
+    @contextmanager
+    def span(self, name: str, **tags):
+        current = _Span(name, tags)
+        stack = self._stack
+        stack.append(current)
+        ok = True
+        try:
+            yield current
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            stack.remove(current)
+            elapsed_ms = (time.perf_counter() - current.started) * 1000
+            self.observe(name, elapsed_ms)
+            cycle = self._own_cycle()
+            if cycle is not None:
+                cycle["spans"].append({
+                    "name": name,
+                    "ms": round(elapsed_ms, 1),
+                    "commands": sum(current.commands.values()),
+                    "by_command": dict(current.commands),
+                    "waits": current.waits,
+                    "wait_timeouts": current.wait_timeouts,
+                    "ok": ok,
+                    **current.tags,
+                })
+
+    def tag(self, **tags) -> None:
+        """Add tags to the innermost open span (e.g. the facility a step is working on)."""
+        if self._stack:
+            self._stack[-1].tags.update(tags)
+
+    def context(self) -> dict:
+        """Innermost span name, nearest 'facility' tag and current cycle id (for log records)."""
+        stack = list(self._stack)
+        facility = next((s.tags["facility"] for s in reversed(stack) if "facility" in s.tags), None)
+        cycle = self._cycle
+        return {
+            "step": stack[-1].name if stack else None,
+            "facility": facility,
+            "cycle": cycle["cycle"] if cycle is not None else None,
+        }
+
+    def step(self, name: Optional[str] = None):
+        """Decorator: run the whole function inside a span (defaults to the function name)."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # --- cycles ------------------------------------------------------------
+
+    def start_cycle(self, cycle_id) -> None:
+        if self._cycle is not None:
+            self.end_cycle("abandoned")
+        self._cycle_thread = threading.get_ident()
+        self._cycle = {
+            "cycle": cycle_id,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "_t0": time.perf_counter(),
+            "commands": Counter(),
+            "waits": 0,
+            "wait_timeouts": 0,
+            "spans": [],
+        }
+
+    def end_cycle(self, outcome: str, **fields) -> Optional[dict]:
+        cycle, self._cycle = self._cycle, None
+        if cycle is None:
+            return None
+        wall_ms = (time.perf_counter() - cycle.pop("_t0")) * 1000
+        self.observe("cycle", wall_ms)
+        record = {
+            **cycle,
+            "wall_ms": round(wall_ms, 1),
+            "outcome": outcome,
+            "commands": sum(cycle["commands"].values()),
+            "by_command": dict(cycle["commands"]),
+            **fields,
+        }
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(record, default=str) + "\n")
+        return record
+
+    def summary(self) -> List[str]:
+        """p50 / p95 / max per step, one formatted line each."""
+        lines = []
+        for name in sorted(self.durations):
+            stats = self.durations[name]
+            lines.append(
+                f"{name:<32} n={stats.count:<5} p50={percentile(stats.sample, 50):9.1f}ms "
+                f"p95={percentile(stats.sample, 95):9.1f}ms max={stats.max:9.1f}ms"
+            )
+        return lines
+
+    def finish(self) -> List[str]:
+        """Flush any open cycle and return the summary lines."""
+        if self._cycle is not None:
+            self.end_cycle("aborted")
+        return self.summary()
+
+
+instrumentation = Instrumentation()
+span = instrumentation.span
+step = instrumentation.step
@@ -0,0 +1,228 @@
+"""
+Central registry of the AIS elements the scripts locate, each with an ordered fallback chain.
+
+A lookup gives each alternative a short probe, best one first. If none of them matches, it
+polls all of them together until the caller's timeout. So an alternative that stopped matching
+costs about one probe, not a full 30-45s WebDriverWait. Every lookup records which
+alternative matched and how long it took. The chain is then reordered toward what the page
+currently serves, using an exponentially weighted hit score, so recent markup wins over old
+history. The learned order is saved in the session checkpoint and survives restarts.
+
+    LOCATORS.find(driver, "submit", timeout=20)   # WebElement, or TimeoutException
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from common.instrumentation import span
+from common.waits import POLL_SECONDS
+
+PRESENT = "present"
+CLICKABLE = "clickable"
+
+# Weight of the latest lookup in an alternative's hit score
+SCORE_ALPHA = 0.3
+
+
+@dataclass
+class Alternative:
+    label: str
+    by: str
+    value: str
+    score: float = 0.5  # EWMA of "this alternative matched"; higher is tried first
+    hits: int = 0
+    misses: int = 0
+    latency_ms: float = 0.0  # EWMA of time to match, when it does
+
+    def record(self, hit: bool, elapsed_ms: float = 0.0) -> None:
+        self.score = self.score * (1 - SCORE_ALPHA) + (SCORE_ALPHA if hit else 0.0)
+        if hit:
+            self.latency_ms = elapsed_ms if not self.hits else (
+                self.latency_ms * (1 - SCORE_ALPHA) + elapsed_ms * SCORE_ALPHA)
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def condition(self, kind: str):
+        locator = (self.by, self.value)
+        return EC.element_to_be_clickable(locator) if kind == CLICKABLE else EC.presence_of_element_located(locator)
+
+
+@dataclass
+class LocatorChain:
+    name: str
+    alternatives: List[Alternative]
+    kind: str = PRESENT
+    probe_timeout: float = 1.0
+
+    def __post_init__(self):
+        # Declared order breaks ties until there is history
+        for i, alt in enumerate(self.alternatives):
+            alt.score -= i * 1e-3
+
+    def ordered(self) -> List[Alternative]:
+        return sorted(self.alternatives, key=lambda a: -a.score)
+
+
+class LocatorRegistry:
+    def __init__(self, log: Callable[[str], None]):
+        self.log = log
+        self.chains: Dict[str, LocatorChain] = {}
+
+    def register(self, name: str, alternatives: Sequence[Tuple[str, str, str]], kind: str = PRESENT,
+                 probe_timeout: float = 1.0) -> None:
+        """`alternatives`: (label, By.*, value), most likely first."""
+        self.chains[name] = LocatorChain(name, [Alternative(*a) for a in alternatives], kind, probe_timeout)
+
+    def find(self, driver: webdriver.Chrome, name: str, timeout: float) -> WebElement:
+        """First element matched by `name`'s chain within `timeout` seconds, else TimeoutException."""
+        chain = self.chains[name]
+        order = chain.ordered()
+        leader = order[0]
+        started = time.perf_counter()
+        tried: List[Alternative] = []
+
+        def remaining() -> float:
+            return timeout - (time.perf_counter() - started)
+
+        with span("locate", element=name) as current:
+            match: Optional[Tuple[Alternative, WebElement]] = None
+            # Short probe per alternative: the normal case is the leader, still rendering
+            for alt in order:
+                budget = min(chain.probe_timeout, remaining())
+                if budget <= 0:
+                    break
+                try:
+                    match = alt, WebDriverWait(driver, budget, poll_frequency=POLL_SECONDS).until(alt.condition(chain.kind))
+                    break
+                except TimeoutException:
+                    tried.append(alt)
+            # Slow page: poll every alternative together for the rest of the timeout
+            if match is None and remaining() > 0:
+                def any_alternative(d):
+                    for alt in order:
+                        try:
+                            element = alt.condition(chain.kind)(d)
+                        except WebDriverException:
+                            element = False
+                        if element:
+                            return alt, element
+                    return False
+                try:
+                    match = WebDriverWait(driver, remaining(), poll_frequency=POLL_SECONDS).until(any_alternative)
+                except TimeoutException:
+                    pass
+
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            if match is None:
+                for alt in order:
+                    alt.record(False)
+                current.tags["matched"] = None
+                raise TimeoutException(f"{name}: no alternative matched within {timeout:.1f}s "
+                                       f"({', '.join(a.label for a in order)})")
+            alt, element = match
+            for other in tried:
+                if other is not alt:
+                    other.record(False)
+            alt.record(True, elapsed_ms)
+            current.tags["matched"] = alt.label
+
+        if chain.ordered()[0] is not leader:
+            self.log(f"[LOCATOR] {name}: now trying '{chain.ordered()[0].label}' first (was '{leader.label}').")
+        return element
+
+    def note_match(self, name: str, label: str, elapsed_ms: float) -> None:
+        """Credit `label` for a match made outside find() (e.g. resolved in a page script)."""
+        chain = self.chains[name]
+        leader = chain.ordered()[0]
+        for alt in chain.ordered():
+            if alt.label == label:
+                alt.record(True, elapsed_ms)
+                break
+            alt.record(False)
+        if chain.ordered()[0] is not leader:
+            self.log(f"[LOCATOR] {name}: now trying '{chain.ordered()[0].label}' first (was '{leader.label}').")
+
+    def snapshot(self) -> dict:
+        """Learned scores for the checkpoint: {chain: {label: [score, hits, misses, latency_ms]}}."""
+        return {name: {a.label: [round(a.score, 4), a.hits, a.misses, round(a.latency_ms, 1)]
+                       for a in chain.alternatives}
+                for name, chain in self.chains.items()}
+
+    def restore(self, saved: Optional[dict]) -> None:
+        for name, labels in (saved or {}).items():
+            chain = self.chains.get(name)
+            if chain is None:
+                continue
+            for alt in chain.alternatives:
+                if alt.label in labels:
+                    alt.score, alt.hits, alt.misses, alt.latency_ms = labels[alt.label]
+
+    def describe(self) -> List[str]:
+        lines = []
+        for name, chain in self.chains.items():
+            used = [a for a in chain.ordered() if a.hits or a.misses]
+            if used:
+                lines.append(f"{name}: " + ", ".join(
+                    f"{a.label} {a.hits}/{a.hits + a.misses} hit ~{a.latency_ms:.0f}ms" for a in used))
+        return lines
+
+
+def appointment_locators(log: Callable[[str], None]) -> LocatorRegistry:
+    """The chains both country scripts use, most likely alternative first."""
+    registry = LocatorRegistry(log)
+    registry.register("facility_select", [
+        ("id", By.ID, "appointments_consulate_appointment_facility_id"),
+        ("name", By.NAME, "appointments[consulate_appointment][facility_id]"),
+        ("id_contains", By.CSS_SELECTOR, "select[id*='facility_id']"),
+    ], kind=CLICKABLE, probe_timeout=2.0)
+    registry.register("date_input", [
+        ("id", By.ID, "appointments_consulate_appointment_date"),
+        ("name", By.NAME, "appointments[consulate_appointment][date]"),
+        ("id_contains", By.CSS_SELECTOR, "input[id*='appointment_date']"),
+    ], probe_timeout=2.0)
+    registry.register("time_select", [
+        ("id", By.ID, "appointments_consulate_appointment_time"),
+        ("name", By.NAME, "appointments[consulate_appointment][time]"),
+        ("id_contains", By.CSS_SELECTOR, "select[id*='appointment_time']"),
+    ])
+    registry.register("submit", [
+        ("input_value", By.XPATH, "//input[@type='submit' and contains(@value,'Reschedule')]"),
+        ("submit_id", By.ID, "appointments_submit"),
+        ("button_text", By.XPATH, "//button[@type='submit' and contains(., 'Reschedule')]"),
+    ], kind=CLICKABLE)
+    registry.register("confirm", [
+        ("confirm", By.XPATH, "//button[contains(., 'Confirm')] | //a[contains(@class,'button') and contains(., 'Confirm')]"),
+        ("yes", By.XPATH, "//button[contains(., 'Yes')]"),
+        ("continue", By.XPATH, "//button[contains(., 'Continue')]"),
+        ("reschedule", By.XPATH, "//button[contains(., 'Reschedule')]"),
+    ], kind=CLICKABLE, probe_timeout=0.5)
+    registry.register("warning_continue", [
+        ("input_value", By.XPATH, "//input[@type='submit' and @name='commit' and @value='Continue']"),
+        ("any_submit", By.XPATH, "//input[@type='submit' and contains(@value,'Continue')]"),
+        ("button_text", By.XPATH, "//button[contains(., 'Continue')]"),
+    ], kind=CLICKABLE)
+    return registry
+
+
+_OPTION_TEXTS_JS = "return Array.prototype.map.call(arguments[0].options, function (o) { return o.text.trim(); });"
+
+
+def option_texts(driver: webdriver.Chrome, select_element: WebElement) -> List[str]:
+    """Every option's text in one round trip (Select.options costs one call per option)."""
+    return [t for t in driver.execute_script(_OPTION_TEXTS_JS, select_element) or [] if t]
+
+
+def match_option(options: Sequence[str], wanted: str) -> Optional[str]:
+    """Exact text first, then a case-insensitive partial match ("Nairobi" -> "Nairobi, Kenya")."""
+    if wanted in options:
+        return wanted
+    lowered = wanted.lower()
+    return next((o for o in options if lowered in o.lower()), None)
@@ -0,0 +1,259 @@
+"""
+Structured, non-blocking log pipeline.
+
+log() in the country scripts hands each message to LogPipeline.emit(), which stamps it
+with the current step, facility and cycle id (from instrumentation) and puts it on an
+in-memory queue. A QueueListener thread does everything slow: redaction, the console
+line, and the JSON-lines file with size/time rotation and gzip of rotated files. A slow
+disk or terminal therefore never holds up the WebDriver loop.
+
+Record fields: ts, level, tag ("STEP", "FLOW", ...), msg, step, facility, cycle, country.
+The level is taken from the message's leading tag ([ERROR] -> ERROR, [WARNING] -> WARNING).
+
+Query (streams plain and .gz rotations oldest first, line by line):
+    python -m common.logs --file visa_kenya.jsonl --level WARNING --facility Nairobi
+    python -m common.logs --file visa_kenya.jsonl --cycle 42 --grep recover --json
+"""
+import argparse
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+from common.instrumentation import instrumentation
+
+
+_TAG_RE = re.compile(r"^\[([A-Z_ ]+)\]\s*")
+_LEVELS = {
+    "FATAL ERROR": logging.CRITICAL,
+    "ERROR": logging.ERROR,
+    "WARNING": logging.WARNING,
+    "DEBUG": logging.DEBUG,
+}
+
+
+def level_of(tag: Optional[str]) -> int:
+    return _LEVELS.get(tag or "", logging.INFO)
+
+
+class Redactor:
+    """Replace secret values (and their URL-encoded forms) with [REDACTED:NAME]."""
+
+    def __init__(self, secrets: Dict[str, Optional[str]]):
+        pairs = []
+        for name, value in secrets.items():
+            if value and len(value) >= 3:
+                pairs.append((value, f"[REDACTED:{name}]"))
+                encoded = value.replace("@", "%40")
+                if encoded != value:
+                    pairs.append((encoded, f"[REDACTED:{name}]"))
+        # Longest first, so a password containing the account id is replaced whole
+        pairs.sort(key=lambda p: len(p[0]), reverse=True)
+        self._pattern = re.compile("|".join(re.escape(v) for v, _ in pairs)) if pairs else None
+        self._names = dict(pairs)
+
+    def __call__(self, text: str) -> str:
+        if self._pattern is None:
+            return text
+        return self._pattern.sub(lambda m: self._names[m.group(0)], text)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def __init__(self, redact: Redactor):
+        super().__init__()
+        self.redact = redact
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "tag": getattr(record, "tag", None),
+            "msg": self.redact(record.getMessage()),
+            "step": getattr(record, "step", None),
+            "facility": getattr(record, "facility", None),
+            "cycle": getattr(record, "cycle", None),
+            "country": getattr(record, "country", None),
+        }
+        return json.dumps(payload, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """The original "[YYYY-mm-dd HH:MM:SS] [TAG] message" line, redacted."""
+
+    def __init__(self, redact: Redactor):
+        super().__init__()
+        self.redact = redact
+
+    def format(self, record: logging.LogRecord) -> str:
+        stamp = datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S")
+        return f"[{stamp}] {self.redact(record.getMessage())}"
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class RotatingJsonlHandler(logging.handlers.RotatingFileHandler):
+    """Size- and age-based rotation; rotated files become <name>.1.gz, <name>.2.gz, ..."""
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, max_age_seconds: float):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.max_age_seconds = max_age_seconds
+        self.namer = lambda name: name + ".gz"
+        self.rotator = _gzip_rotator
+        # Like TimedRotatingFileHandler: age counts from the existing file's last write
+        started = os.stat(filename).st_mtime if os.path.exists(filename) else time.time()
+        self.rollover_at = started + max_age_seconds
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.max_age_seconds and record.created >= self.rollover_at and os.path.exists(self.baseFilename):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.max_age_seconds
+
+
+class LogPipeline:
+    def __init__(self, name: str, path: Optional[str], secrets: Dict[str, Optional[str]], console: bool = True,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 10, max_age_seconds: float = 86400):
+        self.name = name
+        self.path = path
+        self.secrets = secrets
+        self.console = console
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_age_seconds = max_age_seconds
+        self._logger: Optional[logging.Logger] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+
+    def _start(self) -> logging.Logger:
+        redact = Redactor(self.secrets)
+        handlers = []
+        if self.console:
+            console = logging.StreamHandler(sys.stdout)
+            console.setFormatter(ConsoleFormatter(redact))
+            handlers.append(console)
+        if self.path:
+            jsonl = RotatingJsonlHandler(self.path, self.max_bytes, self.backup_count, self.max_age_seconds)
+            jsonl.setFormatter(JsonLinesFormatter(redact))
+            handlers.append(jsonl)
+
+        records: "queue.Queue[logging.LogRecord]" = queue.Queue()  # unbounded: put() never blocks
+        logger = logging.getLogger(f"visa.{self.name}")
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        logger.handlers[:] = [logging.handlers.QueueHandler(records)]
+        self._listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        self._listener.start()
+        self._logger = logger
+        atexit.register(self.close)  # drain on any exit path, not only main()'s finally
+        return logger
+
+    def emit(self, message: str, **fields) -> None:
+        logger = self._logger or self._start()
+        match = _TAG_RE.match(message)
+        tag = match.group(1) if match else None
+        extra = {**instrumentation.context(), "tag": tag, "country": self.name}
+        extra.update(fields)
+        logger.log(level_of(tag), message, extra=extra)
+
+    def close(self) -> None:
+        """Drain the queue and close the files (call last, after the final log line)."""
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+            self._logger = None
+
+
+# --- query CLI -------------------------------------------------------------
+
+def rotated_files(path: str) -> list:
+    """Oldest first: <path>.N.gz ... <path>.1.gz, then <path> itself."""
+    directory = os.path.dirname(path) or "."
+    base = os.path.basename(path)
+    pattern = re.compile(re.escape(base) + r"\.(\d+)(\.gz)?$")
+    backups = []
+    for entry in os.listdir(directory):
+        m = pattern.match(entry)
+        if m:
+            backups.append((int(m.group(1)), os.path.join(directory, entry)))
+    files = [p for _, p in sorted(backups, reverse=True)]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def iter_records(paths: Iterable[str]) -> Iterator[dict]:
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream and filter structured bot logs (incl. rotated .gz).")
+    parser.add_argument("--file", default=os.getenv("LOG_JSONL", "visa_kenya.jsonl"))
+    parser.add_argument("--level", type=str.upper, choices=("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"),
+                        help="minimum level, e.g. WARNING")
+    parser.add_argument("--tag", help="message tag, e.g. FLOW")
+    parser.add_argument("--facility")
+    parser.add_argument("--cycle")
+    parser.add_argument("--step")
+    parser.add_argument("--since", help="ISO timestamp prefix, e.g. 2026-01-03T08")
+    parser.add_argument("--until")
+    parser.add_argument("--grep", help="substring of the message")
+    parser.add_argument("--json", action="store_true", help="print matching records as JSON lines")
+    args = parser.parse_args()
+
+    min_level = logging.getLevelName(args.level) if args.level else logging.NOTSET
+    shown = 0
+    try:
+        for rec in iter_records(rotated_files(args.file)):
+            if args.level and logging.getLevelName(rec.get("level", "INFO")) < min_level:
+                continue
+            if args.tag and rec.get("tag") != args.tag.upper():
+                continue
+            if args.facility and rec.get("facility") != args.facility:
+                continue
+            if args.cycle and str(rec.get("cycle")) != args.cycle:
+                continue
+            if args.step and rec.get("step") != args.step:
+                continue
+            ts = rec.get("ts", "")
+            if (args.since and ts < args.since) or (args.until and ts >= args.until):
+                continue
+            if args.grep and args.grep not in rec.get("msg", ""):
+                continue
+            shown += 1
+            if args.json:
+                print(json.dumps(rec))
+            else:
+                where = "/".join(str(v) for v in (rec.get("cycle"), rec.get("facility"), rec.get("step")) if v)
+                print(f"{ts} {rec.get('level', ''):<8} {where:<32} {rec.get('msg', '')}")
+    except BrokenPipeError:  # piped into head
+        return
+    if not args.json:
+        print(f"-- {shown} record(s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
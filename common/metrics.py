@@ -0,0 +1,238 @@
+"""
+Prometheus-style metrics and a health check for the long-running loop, on a local port.
+
+BotMetrics is fed from the main thread: observe_cycle() with each instrumentation cycle
+record (cycle count and duration, WebDriver commands, logins, recovery transitions and
+driver rebuilds are all read from its spans), observe_read() whenever a facility's
+availability was read, and observe_recycle() for each watchdog recycle (those happen in the
+sleep between cycles, so no cycle record carries them). MetricsServer serves it from a daemon thread:
+
+    GET /metrics   text exposition format (scrape with Prometheus, or just curl it)
+    GET /healthz   200 "ok", or 503 once no cycle has completed within the deadline
+
+Nothing here touches the WebDriver session; browser RSS is read from /proc and the request
+budget from the RateGovernor at scrape time.
+"""
+import math
+import threading
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; a cycle is a few seconds when healthy and minutes when waits time out
+CYCLE_BUCKETS = (1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _value(v: float) -> str:
+    if isinstance(v, float):
+        if math.isnan(v):
+            return "NaN"
+        return str(int(v)) if v.is_integer() else repr(round(v, 3))
+    return str(v)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name: str, **labels) -> List[str]:
+        out = [f'{name}_bucket{_labels(**labels, le=f"{b:g}")} {c}' for b, c in zip(self.buckets, self.counts)]
+        out.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {self.count}')
+        out.append(f"{name}_sum{_labels(**labels)} {self.total:.3f}")
+        out.append(f"{name}_count{_labels(**labels)} {self.count}")
+        return out
+
+
+class BotMetrics:
+    def __init__(self, country: str, health_deadline: float, rss: Optional[Callable[[], int]] = None,
+                 budget: Optional[Callable[[], Dict[str, dict]]] = None):
+        """
+        `health_deadline`: seconds without a completed cycle before /healthz fails.
+        `budget`: RateGovernor.snapshot, read at scrape time.
+        """
+        self.country = country
+        self.health_deadline = health_deadline
+        self.rss = rss
+        self.budget = budget
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self.cycles: Dict[str, int] = {}
+        self.cycle_seconds = Histogram(CYCLE_BUCKETS)
+        self.commands = 0
+        self.wait_timeouts = 0
+        self.logins = 0
+        self.recoveries: Dict[str, int] = {}  # from_state -> transitions taken
+        self.rebuilds = 0
+        self.recycles: Dict[str, int] = {}  # watchdog limit (rss/fds/age) -> recycles
+        self.last_cycle_at: Optional[float] = None
+        self.last_read_at: Optional[float] = None
+        self.earliest: Dict[str, Optional[date]] = {}
+
+    def observe_cycle(self, record: Optional[dict]) -> None:
+        """Fold one instrumentation.end_cycle() record in."""
+        if record is None:
+            return
+        with self._lock:
+            outcome = record.get("outcome") or "unknown"
+            self.cycles[outcome] = self.cycles.get(outcome, 0) + 1
+            self.cycle_seconds.observe((record.get("wall_ms") or 0.0) / 1000.0)
+            self.commands += record.get("commands") or 0
+            self.wait_timeouts += record.get("wait_timeouts") or 0
+            for s in record.get("spans") or []:
+                name = s.get("name", "")
+                if name == "login":
+                    self.logins += 1
+                elif name == "rebuild_driver":
+                    self.rebuilds += 1
+                elif name.startswith("transition:"):
+                    state = name.split(":", 1)[1]
+                    self.recoveries[state] = self.recoveries.get(state, 0) + 1
+            self.last_cycle_at = time.time()
+
+    def observe_read(self, facility: str, earliest: Optional[date]) -> None:
+        """A facility's availability was read successfully (earliest in-window date or None)."""
+        with self._lock:
+            self.last_read_at = time.time()
+            self.earliest[facility] = earliest
+
+    def observe_recycle(self, reason: str) -> None:
+        """The watchdog replaced the browser; `reason` is BrowserWatchdog.sample()'s ("rss 912MB > 800MB")."""
+        limit = reason.split(" ", 1)[0] or "unknown"
+        with self._lock:
+            self.recycles[limit] = self.recycles.get(limit, 0) + 1
+
+    def health(self, now: Optional[float] = None) -> Tuple[bool, str]:
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self.last_cycle_at
+        since = now - (last if last is not None else self.started_at)
+        if since > self.health_deadline:
+            what = "last completed cycle" if last is not None else "start (no cycle completed yet)"
+            return False, f"{since:.0f}s since {what}; deadline {self.health_deadline:.0f}s"
+        return True, "ok"
+
+    def render(self, now: Optional[float] = None) -> str:
+        now = time.time() if now is None else now
+        c = {"country": self.country}
+        out: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[dict, float]]) -> None:
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                out.append(f"{name}{_labels(**labels)} {_value(value)}")
+
+        with self._lock:
+            metric("visa_cycles_total", "counter", "Poll cycles completed, by outcome.",
+                   [({**c, "outcome": k}, v) for k, v in sorted(self.cycles.items())] or [(c, 0)])
+            out.append("# HELP visa_cycle_duration_seconds Wall time per poll cycle.")
+            out.append("# TYPE visa_cycle_duration_seconds histogram")
+            out.extend(self.cycle_seconds.lines("visa_cycle_duration_seconds", **c))
+            metric("visa_webdriver_commands_total", "counter", "WebDriver commands sent to chromedriver.",
+                   [(c, self.commands)])
+            metric("visa_wait_timeouts_total", "counter", "WebDriverWait calls that timed out.",
+                   [(c, self.wait_timeouts)])
+            metric("visa_logins_total", "counter", "Logins performed.", [(c, self.logins)])
+            metric("visa_recovery_transitions_total", "counter",
+                   "Navigation recovery transitions taken, by the state recovered from.",
+                   [({**c, "from_state": k}, v) for k, v in sorted(self.recoveries.items())] or [(c, 0)])
+            metric("visa_driver_rebuilds_total", "counter", "Browser rebuilds after the driver died.",
+                   [(c, self.rebuilds)])
+            metric("visa_driver_recycles_total", "counter",
+                   "Browsers replaced by the watchdog between cycles, by the limit exceeded.",
+                   [({**c, "limit": k}, v) for k, v in sorted(self.recycles.items())] or [(c, 0)])
+            last_read = self.last_read_at
+            metric("visa_seconds_since_last_read", "gauge",
+                   "Seconds since availability was last read successfully (NaN before the first read).",
+                   [(c, now - last_read if last_read is not None else float("nan"))])
+            metric("visa_earliest_date_timestamp", "gauge",
+                   "Earliest open in-window date per facility at the last read (unix time, NaN if none).",
+                   [({**c, "facility": f}, datetime.combine(d, datetime.min.time()).timestamp()
+                     if d is not None else float("nan")) for f, d in sorted(self.earliest.items())])
+        rss = float("nan")
+        if self.rss is not None:
+            try:
+                rss = float(self.rss())
+            except Exception:
+                pass
+        budget: Dict[str, dict] = {}
+        if self.budget is not None:
+            try:
+                budget = self.budget()
+            except Exception:
+                pass
+        metric("visa_request_budget_tokens", "gauge", "Request tokens left in the governor's bucket, by kind.",
+               [({**c, "kind": k}, float(v["tokens"])) for k, v in sorted(budget.items())])
+        metric("visa_request_budget_capacity", "gauge", "Capacity of the governor's bucket, by kind.",
+               [({**c, "kind": k}, v["capacity"]) for k, v in sorted(budget.items())])
+        metric("visa_request_budget_waited_seconds_total", "counter",
+               "Seconds spent waiting for an empty bucket to refill, by kind.",
+               [({**c, "kind": k}, float(v["waited_s"])) for k, v in sorted(budget.items())])
+        metric("visa_browser_rss_bytes", "gauge", "Resident memory of the chromedriver/Chrome tree.", [(c, rss)])
+        metric("visa_uptime_seconds", "gauge", "Seconds since the bot started.", [(c, now - self.started_at)])
+        return "\n".join(out) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MetricsServer"
+
+    def log_message(self, fmt, *args):
+        pass  # scrapes every 15s would drown the bot's own log
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            status, body, ctype = 200, self.server.metrics.render(), "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/healthz":
+            ok, message = self.server.metrics.health()
+            status, body, ctype = (200 if ok else 503), message + "\n", "text/plain; charset=utf-8"
+        else:
+            status, body, ctype = 404, "not found\n", "text/plain; charset=utf-8"
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, metrics: BotMetrics, port: int, host: str = "127.0.0.1"):
+        super().__init__((host, port), _Handler)
+        self.metrics = metrics
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self.shutdown()
+            self.server_close()
+            self._thread = None
@@ -0,0 +1,167 @@
+"""
+Background notification dispatcher.
+
+The booking path only calls enqueue() and moves on. A worker thread owns one SMTP
+connection that is reused across messages, re-authenticated when the server drops it,
+and retried with bounded exponential backoff. Messages queued close together are
+batched into a single send to every email + SMS-gateway recipient.
+"""
+import queue
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+from typing import Callable, List, Optional, Tuple
+
+
+def split_recipients(*values: Optional[str]) -> List[str]:
+    """Comma-separated env values -> de-duplicated recipient list (order kept)."""
+    seen, out = set(), []
+    for value in values:
+        for item in (value or "").split(","):
+            item = item.strip()
+            if item and item not in seen:
+                seen.add(item)
+                out.append(item)
+    return out
+
+
+class NotificationDispatcher:
+    def __init__(self, sender: Optional[str], password: Optional[str], recipients: List[str],
+                 log: Callable[[str], None], host: str = "smtp.gmail.com", port: int = 465,
+                 use_ssl: bool = True, max_retries: int = 3, backoff_seconds: float = 2.0,
+                 batch_window: float = 1.0, idle_timeout: float = 240.0, timeout: float = 20.0):
+        self.sender = sender
+        self.password = password
+        self.recipients = recipients
+        self.log = log
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.batch_window = batch_window
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self.sent = 0
+        self.failed = 0
+        self.connects = 0
+        self._queue: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue()
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sender and self.password and self.recipients)
+
+    def start(self) -> "NotificationDispatcher":
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notify-dispatcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def enqueue(self, subject: str, body: str) -> None:
+        """Hand a message to the worker; never blocks on the network."""
+        if not self.enabled:
+            return
+        self.start()
+        self._queue.put((subject, body))
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Flush what is queued (bounded by `timeout`) and close the connection."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # --- worker --------------------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    extra = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if extra is None:
+                    stop = True
+                    break
+                batch.append(extra)
+
+            self._deliver(batch)
+            if stop:
+                break
+        self._close()
+
+    def _compose(self, batch: List[Tuple[str, str]]) -> MIMEText:
+        if len(batch) == 1:
+            subject, body = batch[0]
+        else:
+            subject = f"{batch[0][0]} (+{len(batch) - 1} more)"
+            body = "\n\n".join(f"{s}\n{b}" for s, b in batch)
+        msg = MIMEText(body, _charset="utf-8")
+        msg["Subject"] = subject
+        msg["From"] = self.sender
+        msg["To"] = ", ".join(self.recipients)
+        return msg
+
+    def _connection(self) -> smtplib.SMTP:
+        # Servers drop idle sessions; probe with NOOP before reusing an old one
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            try:
+                self._smtp.noop()
+            except smtplib.SMTPException:
+                self._close()
+        if self._smtp is None:
+            if self.use_ssl:
+                smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+            else:
+                smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+                smtp.ehlo()
+                if smtp.has_extn("starttls"):
+                    smtp.starttls()
+                    smtp.ehlo()
+            smtp.login(self.sender, self.password)
+            self._smtp = smtp
+            self.connects += 1
+        return self._smtp
+
+    def _close(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
+
+    def _deliver(self, batch: List[Tuple[str, str]]) -> None:
+        msg = self._compose(batch)
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._connection().sendmail(self.sender, self.recipients, msg.as_string())
+                self._last_used = time.monotonic()
+                self.sent += len(batch)
+                self.log(f"[NOTIFY] Email/SMS sent: {msg['Subject']}")
+                return
+            except (smtplib.SMTPException, OSError) as e:
+                self._close()
+                if attempt == self.max_retries:
+                    self.failed += len(batch)
+                    self.log(f"[ERROR] Email failed after {attempt + 1} attempt(s): {e}")
+                    return
+                delay = self.backoff_seconds * (2 ** attempt)
+                self.log(f"[WARNING] Email attempt {attempt + 1} failed ({e}); retrying in {delay:.0f}s")
+                time.sleep(delay)
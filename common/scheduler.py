@@ -0,0 +1,243 @@
+"""
+History-aware poll scheduling under a fixed daily request budget.
+
+The uniform randint(MIN_WAIT, MAX_WAIT) sleep spends as many checks at 3am on a Sunday as
+in the hour AIS usually releases slots. PollScheduler keeps the same number of checks per
+day but moves them toward the (weekday, hour) buckets in which new slots have appeared
+before, using the history store's slot change log.
+
+Allocation: if slots appear in hour h at rate r_h and that hour gets n_h evenly spaced
+checks, the mean wait until the next check is 3600 / (2 n_h). Minimising the
+appearance-weighted delay under sum(n_h) = budget gives n_h proportional to sqrt(r_h).
+Rates are smoothed (so a quiet hour is never starved) and the gap between checks is
+clamped to [min_gap, max_gap]; min_gap defaults to MIN_WAIT, so no gap is shorter than
+the shortest uniform sleep.
+
+    python -m common.scheduler --db visa_history.sqlite3 --country kenya --plan
+    python -m common.scheduler --db visa_history.sqlite3 --country kenya --simulate
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+
+HOURS_PER_WEEK = 7 * 24
+
+
+def bucket_of(ts: float) -> int:
+    """(weekday, hour) bucket index 0..167 in local time."""
+    moment = datetime.fromtimestamp(ts)
+    return moment.weekday() * 24 + moment.hour
+
+
+def load_appearances(path: str, country: Optional[str] = None) -> List[Tuple[float, Optional[float]]]:
+    """(appeared_at, vanished_at) for every slot seen opening (appeared_exact), oldest first."""
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        sql = "SELECT appeared_at, vanished_at FROM slots WHERE appeared_exact = 1"
+        params: tuple = ()
+        if country:
+            sql += " AND country = ?"
+            params = (country,)
+        rows = list(conn.execute(sql + " ORDER BY appeared_at", params))
+    except sqlite3.OperationalError:  # no slots table yet, or a file no bot has migrated
+        rows = []
+    finally:
+        conn.close()
+    return rows
+
+
+class PollScheduler:
+    def __init__(self, min_wait: float, max_wait: float, min_gap: Optional[float] = None, max_gap: float = 1800.0,
+                 jitter: float = 0.2, smoothing: float = 0.5, refit_seconds: float = 86400.0,
+                 history_loader: Optional[Callable[[], Sequence[Tuple[float, Optional[float]]]]] = None):
+        # Same traffic as the uniform sleep it replaces, and never faster than its shortest sleep
+        self.checks_per_day = 86400.0 / ((min_wait + max_wait) / 2.0)
+        self.min_gap = min_wait if min_gap is None else min_gap
+        self.max_gap = max(max_gap, self.min_gap)
+        self.jitter = jitter
+        self.smoothing = smoothing
+        self.refit_seconds = refit_seconds
+        self.history_loader = history_loader
+
+        self.appearances = [0.0] * HOURS_PER_WEEK
+        self.checks = [self.checks_per_day / 24.0] * HOURS_PER_WEEK
+        self.observed = 0
+        self._fitted_at = 0.0
+
+    # --- fitting -----------------------------------------------------------
+
+    def fit(self, appearance_times: Sequence[float]) -> "PollScheduler":
+        counts = [0.0] * HOURS_PER_WEEK
+        for ts in appearance_times:
+            counts[bucket_of(ts)] += 1
+        self.appearances = counts
+        self.observed = len(appearance_times)
+        self._replan()
+        self._fitted_at = time.time()
+        return self
+
+    def set_wait_bounds(self, min_wait: float, max_wait: float, min_gap: Optional[float] = None) -> None:
+        """New daily budget (the uniform randint(min_wait, max_wait) equivalent); keeps the fit."""
+        self.checks_per_day = 86400.0 / ((min_wait + max_wait) / 2.0)
+        if min_gap is not None:
+            self.min_gap = min_gap
+            self.max_gap = max(self.max_gap, min_gap)
+        self._replan()
+
+    def _replan(self) -> None:
+        checks: List[float] = []
+        for day in range(7):
+            rates = [self.appearances[day * 24 + h] + self.smoothing for h in range(24)]
+            checks.extend(self._allocate([math.sqrt(r) for r in rates]))
+        self.checks = checks
+
+    def _allocate(self, weights: List[float]) -> List[float]:
+        """Split one day's budget over 24 hours in proportion to `weights`, honouring the gap clamps."""
+        low, high = 3600.0 / self.max_gap, 3600.0 / self.min_gap
+        budget = min(max(self.checks_per_day, 24 * low), 24 * high)
+        fixed = [None] * 24
+        # Water-filling: pin hours that hit a clamp, re-spread the rest
+        for _ in range(24):
+            free = [h for h in range(24) if fixed[h] is None]
+            remaining = budget - sum(v for v in fixed if v is not None)
+            total = sum(weights[h] for h in free) or 1.0
+            changed = False
+            for h in free:
+                n = remaining * weights[h] / total
+                if n < low or n > high:
+                    fixed[h] = low if n < low else high
+                    changed = True
+            if not changed:
+                for h in free:
+                    fixed[h] = remaining * weights[h] / total
+                break
+        return [v if v is not None else low for v in fixed]
+
+    def refit_if_stale(self) -> None:
+        if self.history_loader is None or time.time() - self._fitted_at < self.refit_seconds:
+            return
+        self.fit([appeared for appeared, _ in self.history_loader()])
+
+    # --- scheduling --------------------------------------------------------
+
+    def interval_at(self, ts: float) -> float:
+        """Planned gap between checks during the bucket containing `ts` (before jitter)."""
+        return 3600.0 / self.checks[bucket_of(ts)]
+
+    def next_wait(self, now: Optional[float] = None, rng: random.Random = random) -> int:
+        self.refit_if_stale()
+        now = time.time() if now is None else now
+        base = self.interval_at(now)
+        wait = base * rng.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(int(round(min(wait, self.max_gap))), math.ceil(self.min_gap))
+
+    def expected_delay(self, checks: Optional[List[float]] = None) -> float:
+        """Appearance-weighted mean seconds from a slot appearing to the next check."""
+        checks = checks or self.checks
+        weights = [a + self.smoothing for a in self.appearances]
+        return sum(w * 1800.0 / n for w, n in zip(weights, checks)) / sum(weights)
+
+    def uniform_expected_delay(self) -> float:
+        return self.expected_delay([self.checks_per_day / 24.0] * HOURS_PER_WEEK)
+
+    def plan(self, weekday: Optional[int] = None) -> List[Tuple[int, float, float]]:
+        """(hour, checks, planned interval seconds) for one weekday (default: today)."""
+        weekday = datetime.now().weekday() if weekday is None else weekday
+        return [(h, self.checks[weekday * 24 + h], 3600.0 / self.checks[weekday * 24 + h]) for h in range(24)]
+
+    def describe(self) -> List[str]:
+        busiest = sorted(range(HOURS_PER_WEEK), key=lambda b: self.checks[b], reverse=True)[:3]
+        days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+        return [
+            f"{self.checks_per_day:.0f} checks/day, fitted on {self.observed} slot appearance(s)",
+            f"expected detection delay {self.expected_delay() / 60:.1f}m "
+            f"(uniform {self.uniform_expected_delay() / 60:.1f}m)",
+            "densest hours: " + ", ".join(
+                f"{days[b // 24]} {b % 24:02d}:00 every {3600 / self.checks[b] / 60:.1f}m" for b in busiest),
+        ]
+
+
+# --- offline simulation ---------------------------------------------------------
+
+def simulate(next_wait: Callable[[float], float], appearances: Sequence[Tuple[float, Optional[float]]],
+             start: float, end: float) -> dict:
+    """
+    Replay a schedule over [start, end) against recorded slot intervals.
+
+    A slot counts as detected at the first check at or after it appeared, provided it had not
+    vanished by then.
+    """
+    checks = []
+    t = start
+    while t < end:
+        checks.append(t)
+        t += next_wait(t)
+
+    delays, missed = [], 0
+    i = 0
+    for appeared, vanished in appearances:
+        if not start <= appeared < end:
+            continue
+        while i < len(checks) and checks[i] < appeared:
+            i += 1
+        if i == len(checks) or (vanished is not None and checks[i] > vanished):
+            missed += 1
+            continue
+        delays.append(checks[i] - appeared)
+
+    delays.sort()
+    return {
+        "checks": len(checks),
+        "slots": len(delays) + missed,
+        "detected": len(delays),
+        "missed": missed,
+        "mean_delay_s": round(sum(delays) / len(delays), 1) if delays else None,
+        "p50_delay_s": round(delays[len(delays) // 2], 1) if delays else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plan or simulate history-aware poll schedules.")
+    parser.add_argument("--db", default=os.getenv("HISTORY_DB", "visa_history.sqlite3"))
+    parser.add_argument("--country")
+    parser.add_argument("--min-wait", type=float, default=180)
+    parser.add_argument("--max-wait", type=float, default=300)
+    parser.add_argument("--plan", action="store_true", help="print today's hourly plan")
+    parser.add_argument("--simulate", action="store_true",
+                        help="fit on the first half of history, replay both schedules on the second half")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rows = load_appearances(args.db, args.country)
+    scheduler = PollScheduler(args.min_wait, args.max_wait)
+
+    if args.simulate:
+        if len(rows) < 4:
+            raise SystemExit("Not enough recorded slot appearances to simulate.")
+        split = rows[len(rows) // 2][0]
+        scheduler.fit([a for a, _ in rows if a < split])
+        end = max(v or a for a, v in rows)
+        rng = random.Random(args.seed)
+        adaptive = simulate(lambda t: scheduler.next_wait(t, rng), rows, split, end)
+        uniform = simulate(lambda t: rng.randint(int(args.min_wait), int(args.max_wait)), rows, split, end)
+        for name, result in (("uniform", uniform), ("adaptive", adaptive)):
+            print(f"{name:<9} " + " ".join(f"{k}={v}" for k, v in result.items()))
+        return
+
+    scheduler.fit([a for a, _ in rows])
+    for line in scheduler.describe():
+        print(line)
+    if args.plan:
+        for hour, checks, interval in scheduler.plan():
+            print(f"{hour:02d}:00  {checks:5.1f} checks  every {interval / 60:4.1f}m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Session and search-state checkpointing.
+
+The checkpoint is a small JSON file holding the AIS session cookies, the last URL we
+were on, the poll-cycle counter and the last availability we observed per facility.
+A fresh driver can load those cookies and jump straight to the appointment form,
+skipping login -> Continue -> Reschedule, and a restarted process picks up its counters.
+"""
+import json
+import os
+import time
+from typing import Optional
+
+from selenium import webdriver
+
+
+def load_checkpoint(path: str) -> dict:
+    """Return the saved checkpoint, or {} if there is none (or it is unreadable)."""
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_checkpoint(path: str, driver: Optional[webdriver.Chrome] = None, **state) -> dict:
+    """
+    Merge `state` into the checkpoint file and, if a driver is given, capture its cookies and URL.
+
+    Written atomically (temp file + rename) with owner-only permissions, since the cookies
+    are a live login.
+    """
+    checkpoint = load_checkpoint(path)
+    checkpoint.update(state)
+    if driver is not None:
+        checkpoint["cookies"] = driver.get_cookies()
+        checkpoint["url"] = driver.current_url
+    checkpoint["saved_at"] = time.time()
+
+    tmp = f"{path}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        json.dump(checkpoint, fh)
+    os.replace(tmp, path)
+    return checkpoint
+
+
+def _cdp_cookie(cookie: dict, url: str) -> dict:
+    allowed = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+    out = {k: v for k, v in cookie.items() if k in allowed}
+    if "expiry" in cookie:
+        out["expires"] = cookie["expiry"]
+    if "domain" not in out:
+        out["url"] = url
+    return out
+
+
+def restore_session(driver: webdriver.Chrome, checkpoint: dict, appointment_url: str,
+                    sign_in_url: Optional[str] = None) -> bool:
+    """
+    Load the checkpoint's cookies into `driver` and open the appointment page directly.
+
+    Returns False (caller should do a full login) if there are no cookies or AIS bounced us
+    to the sign-in page. With no cookies, `sign_in_url` is opened so the page leaves the
+    blank state straight away instead of NavigationFlow waiting out its settle timeout.
+    """
+    cookies = checkpoint.get("cookies") or []
+    if not cookies:
+        if sign_in_url:
+            driver.get(sign_in_url)
+        return False
+
+    try:
+        # CDP sets cookies without first loading a page on the AIS domain
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": [_cdp_cookie(c, appointment_url) for c in cookies]})
+    except Exception:
+        # Non-Chromium or remote driver: load the domain once, then add cookies the WebDriver way
+        driver.get(appointment_url)
+        for cookie in cookies:
+            try:
+                driver.add_cookie({k: v for k, v in cookie.items() if k != "sameSite"})
+            except Exception:
+                pass
+
+    driver.get(appointment_url)
+    return "sign_in" not in driver.current_url
@@ -0,0 +1,90 @@
+"""
+Multi-facility sweep on one loaded appointment form.
+
+Instead of "check city 1, book if anything is open, else check city 2", the sweep switches
+the facility dropdown in place for every facility, reads each one's full set of open dates
+in the target window (one single-pass datepicker scan each), and returns one snapshot.
+The caller books from snapshot.ranked(), so a later facility with an earlier date wins.
+
+Preference weights are expressed in days: {"Durban": 7} means a Durban date only ranks
+ahead of another facility's if it is more than a week earlier.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from common.datepicker import open_calendar, scan_available_dates
+from common.instrumentation import span
+
+
+@dataclass
+class FacilityDates:
+    facility: str
+    dates: List[date] = field(default_factory=list)
+    ok: bool = True  # False if the facility could not be selected or read this sweep
+
+    @property
+    def earliest(self) -> Optional[date]:
+        return self.dates[0] if self.dates else None
+
+    def score(self, preference_days: Optional[Dict[str, float]] = None) -> float:
+        """Ordinal of the earliest date plus this facility's penalty (lower is better)."""
+        return self.earliest.toordinal() + (preference_days or {}).get(self.facility, 0)
+
+
+@dataclass
+class SweepSnapshot:
+    taken_at: datetime
+    facilities: List[FacilityDates]
+
+    def ranked(self, preference_days: Optional[Dict[str, float]] = None) -> List[FacilityDates]:
+        """Facilities with at least one open date, best first (ties keep sweep order)."""
+        open_now = [f for f in self.facilities if f.dates]
+        return sorted(open_now, key=lambda f: f.score(preference_days))
+
+    def describe(self, preference_days: Optional[Dict[str, float]] = None) -> str:
+        parts = []
+        for f in self.ranked(preference_days):
+            parts.append(f"{f.facility} {f.earliest.isoformat()} ({len(f.dates)} open)")
+        for f in self.facilities:
+            if not f.dates:
+                parts.append(f"{f.facility} {'none' if f.ok else 'unreadable'}")
+        return "; ".join(parts)
+
+
+def sweep_facilities(driver: webdriver.Chrome, facilities: Sequence[str],
+                     select_facility: Callable[[webdriver.Chrome, str], bool],
+                     start: datetime, end: datetime,
+                     on_read: Optional[Callable[[str, List[date]], object]] = None) -> SweepSnapshot:
+    """
+    Read every facility's open dates from the current form without reloading it.
+
+    `select_facility` is the country script's own dropdown handler (it waits for the
+    facility's days to load); a facility it can't select, or whose datepicker raises a
+    WebDriverException, is reported with ok=False. CycleOverBudget is not caught.
+    `on_read(facility, dates)` runs as soon as each facility has been read, so what was read
+    is kept even if a later facility's wait ends the cycle (CycleOverBudget).
+    """
+    results = []
+    for facility in facilities:
+        with span("sweep_facility", facility=facility) as current:
+            if not select_facility(driver, facility):
+                results.append(FacilityDates(facility, ok=False))
+                current.tags["selected"] = False
+                continue
+            try:
+                # The opened view only sets where the scan starts; it walks every month up to `end`
+                dates = scan_available_dates(driver, start, end, open_calendar(driver))
+            except WebDriverException as e:
+                # Crashed browser or signed-out page: unreadable this sweep, recover() runs after it
+                results.append(FacilityDates(facility, ok=False))
+                current.tags["error"] = type(e).__name__
+                continue
+            results.append(FacilityDates(facility, list(dates)))
+            current.tags["open_dates"] = len(dates)
+            if on_read is not None:
+                on_read(facility, list(dates))
+    return SweepSnapshot(datetime.now(), results)
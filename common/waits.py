@@ -0,0 +1,53 @@
+"""
+Readiness conditions for WebDriverWait, used instead of fixed sleeps.
+
+Each condition returns a truthy value as soon as the page is actually ready, so the
+wait finishes on the first poll after the DOM settles rather than after a guessed delay.
+"""
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+# Fast polling: these waits sit between "facility chosen" and "date visible"
+POLL_SECONDS = 0.05
+
+# The date input is enabled again once the facility's days.json AJAX call has returned.
+# jQuery.active covers any other request AIS fires on the same change event.
+_DATE_INPUT_READY_JS = """
+var el = document.getElementById('appointments_consulate_appointment_date')
+      || document.querySelector("input[name='appointments[consulate_appointment][date]']");
+if (!el || el.disabled) { return null; }
+if (window.jQuery && window.jQuery.active > 0) { return null; }
+return el;
+"""
+
+
+def date_input_ready(driver: webdriver.Chrome):
+    """Condition: the appointment date input exists, is enabled and no AJAX is in flight."""
+    return driver.execute_script(_DATE_INPUT_READY_JS)
+
+
+def element_checked(locator):
+    """Condition: the checkbox at `locator` reports selected."""
+    def _checked(driver):
+        return driver.find_element(*locator).is_selected()
+    return _checked
+
+
+def wait_for_facility_ready(driver: webdriver.Chrome, timeout: float) -> bool:
+    """Block until the date input is usable after a facility change. Returns False on timeout."""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_SECONDS).until(date_input_ready)
+        return True
+    except TimeoutException:
+        return False
+
+
+def wait_for_checked(driver: webdriver.Chrome, element_id: str, timeout: float) -> bool:
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_SECONDS).until(element_checked((By.ID, element_id)))
+        return True
+    except TimeoutException:
+        return False
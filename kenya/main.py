@@ -1,19 +1,41 @@
 import os
+import sys
 import time
 import random
 from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
 
 from dotenv import load_dotenv
-from plyer import notification
-
-import smtplib
-from email.mime.text import MIMEText
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select, WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.common.exceptions import WebDriverException
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.alerts import CONFIRMED, AlertEngine, DesktopChannel, SmtpChannel, WebhookChannel  # noqa: E402
+from common.availability import NEW, VANISHED, AvailabilityTracker, describe_events  # noqa: E402
+from common.browser import BrowserWatchdog, WarmStandby, build_driver as build_chrome, tree_rss_bytes  # noqa: E402
+from common.commit import CommitTimeline, commit_appointment  # noqa: E402
+from common.config import ConfigWatcher, Settings  # noqa: E402
+from common.datepicker import open_calendar, scan_available_dates, select_day  # noqa: E402
+from common.deadline import CycleOverBudget, Deadline, WaitCaps  # noqa: E402
+from common.fixtures import recorder  # noqa: E402
+from common.flow import BLANK, DASHBOARD, RESCHEDULE_WARNING, SIGNED_OUT, UNKNOWN, NavigationFlow  # noqa: E402
+from common.gate import accept_reschedule_warning as accept_warning_gate  # noqa: E402
+from common.governor import LOGIN, PAGE_LOAD, RateGovernor  # noqa: E402
+from common.history import HistoryStore  # noqa: E402
+from common.instrumentation import instrumentation, span, step  # noqa: E402
+from common.locators import appointment_locators, match_option, option_texts  # noqa: E402
+from common.logs import LogPipeline  # noqa: E402
+from common.metrics import BotMetrics, MetricsServer  # noqa: E402
+from common.notify import NotificationDispatcher, split_recipients  # noqa: E402
+from common.scheduler import PollScheduler, load_appearances  # noqa: E402
+from common.session import load_checkpoint, restore_session, save_checkpoint  # noqa: E402
+from common.sweep import SweepSnapshot, sweep_facilities  # noqa: E402
+from common.waits import POLL_SECONDS, date_input_ready, wait_for_facility_ready  # noqa: E402
 
 
 # ----------------------------
@@ -28,10 +50,19 @@ BASE_URL = "https://ais.usvisa-info.com/en-ke/niv"
 # Kenya NIV is typically Nairobi; keep a list in case your account shows more facilities
 CITIES = ["Nairobi"]
 
+# Sweep: read every city's dates on one loaded form, then book the best-ranked one.
+# Preference is a per-city penalty in days ({"Mombasa": 7} = only if a week earlier).
+SWEEP_MODE = True
+FACILITY_PREFERENCE_DAYS = {}
+
 # Date window to search (adjust to your needs)
 DATE_RANGE_START_DT = datetime.today() + timedelta(days=3)
 DATE_RANGE_END_DT = datetime(2026, 1, 5)
 
+# True: walk each datepicker month once and pick the earliest open date.
+# False: legacy day-by-day walk (re-opens the calendar for every day in the window).
+SINGLE_PASS_SCAN = True
+
 
 # Refresh cadence (be respectful — don't hammer the site)
 # DRY_RUN=True will NOT submit reschedule/confirm actions (safe for demos)
@@ -39,6 +70,63 @@ DRY_RUN = True
 
 MIN_WAIT_SECONDS = 180
 MAX_WAIT_SECONDS = 300
+# True: spread the same daily number of checks by historical release hours (common/scheduler.py)
+ADAPTIVE_SCHEDULE = True
+
+# Optional JSON file overriding CITIES, the date window, DRY_RUN, SWEEP_MODE, preferences and
+# the wait bounds. Edits are applied between cycles on the live browser (common/config.py).
+CONFIG_FILE = os.getenv("CONFIG_FILE", "visa_config_kenya.json")
+
+# Upper bounds for readiness waits (they return as soon as the DOM is ready)
+FACILITY_READY_TIMEOUT = 20
+CHECKBOX_READY_TIMEOUT = 2
+
+# Wall-time budget per poll cycle, shared by all of its waits; each wait is also capped at
+# its own observed p95 (x2) once there is history (common/deadline.py). 0 = no budget.
+CYCLE_BUDGET_SECONDS = 120
+
+# One JSON line per poll cycle with per-step timings and WebDriver command counts
+METRICS_JSONL = os.getenv("METRICS_JSONL", "visa_cycles.jsonl")
+
+# Session cookies, cycle counter and last availability survive driver rebuilds and restarts
+STATE_FILE = os.getenv("STATE_FILE", "visa_state_kenya.json")
+
+# Hard request budget: token buckets persisted in RATE_STATE_FILE, so crash loops and
+# restarts can't exceed it. Navigations wait for a token when the bucket is empty.
+MAX_PAGE_LOADS_PER_HOUR = 60
+MAX_LOGINS_PER_DAY = 8
+RATE_STATE_FILE = os.getenv("RATE_STATE_FILE", "visa_rate_kenya.json")
+
+# Every cycle's date sets, latency and outcome (query: python -m common.history --help)
+HISTORY_DB = os.getenv("HISTORY_DB", "visa_history.sqlite3")
+
+# Structured JSON-lines log (rotated by size/age, gzipped); query: python -m common.logs --help
+LOG_JSONL = os.getenv("LOG_JSONL", "visa_kenya.jsonl")
+
+# Set to a path (e.g. visa_fixtures.jsonl.gz) to record datepicker/form HTML for offline
+# parser tests: python bench/parse_bench.py --archive <path>
+RECORD_FIXTURES = os.getenv("RECORD_FIXTURES")
+
+# Optional local endpoint: http://127.0.0.1:<METRICS_PORT>/metrics (Prometheus text) and
+# /healthz, which fails once no cycle has completed for HEALTH_DEADLINE_SECONDS. Keep the
+# deadline above the longest sleep (the adaptive schedule may wait up to 30 minutes).
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = off
+HEALTH_DEADLINE_SECONDS = 2400
+
+# Lean profile: headless, small viewport, no GPU/extensions, images/fonts/media and
+# third-party hosts blocked. Set LEAN_BROWSER = False / HEADLESS = False to watch it work.
+LEAN_BROWSER = True
+HEADLESS = True
+
+# Keep a spare browser launched during idle sleeps so rebuilds skip the cold start.
+# Turn off on memory-constrained hosts (one extra Chrome process tree).
+WARM_STANDBY = True
+
+# Recycle the browser in the sleep window (never mid-check) once its process tree exceeds
+# any of these; a [MEMORY] line logs its footprint after every cycle. None = no limit.
+BROWSER_MAX_RSS_MB = 1500
+BROWSER_MAX_FDS = 2000
+BROWSER_MAX_AGE_HOURS = 24
 
 
 # ----------------------------
@@ -50,6 +138,8 @@ EMAIL = os.getenv("EMAIL")
 PASSWORD = os.getenv("PASSWORD")
 ACCOUNT_ID = os.getenv("ACCOUNT_ID")
 
+# Point at the offline stand-in (bench/standin.py) instead of the live site
+BASE_URL = os.getenv("AIS_BASE_URL", BASE_URL)
 APPOINTMENT_URL = f"{BASE_URL}/schedule/{ACCOUNT_ID}/appointment"
 
 NOTIFY_EMAIL_FROM = os.getenv("NOTIFY_EMAIL_FROM")
@@ -58,59 +148,116 @@ NOTIFY_EMAIL_PASSWORD = os.getenv("NOTIFY_EMAIL_PASSWORD")
 
 SMS_NOTIFY_TO = os.getenv("SMS_NOTIFY_TO")      # comma-separated email-to-SMS gateways
 
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
 
-def log(message: str) -> None:
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")  # optional local JSON webhook
+ALERT_COALESCE_SECONDS = 20      # slots found within this window go out as one digest
+ALERT_EMAIL_MAX_PER_HOUR = 6     # email + SMS gateways share this budget
+ALERT_DESKTOP_MAX_PER_HOUR = 60
+ALERT_WEBHOOK_MAX_PER_HOUR = 60
 
+# facility -> ISO dates seen open in the target window on the last check (checkpointed)
+last_availability = {}
+# city -> time.perf_counter() of its latest availability read; commit timelines start there
+last_read_at = {}
 
-def notify(title: str, message: str) -> None:
-    try:
-        notification.notify(title=title, message=message, app_name="Visa Bot")
-    except Exception:
-        pass
-    log(f"[NOTIFY] {title} - {message}")
-
+# Per-facility open dates as bitsets; each read is diffed into new/vanished slot events
+AVAILABILITY = AvailabilityTracker()
 
-def send_email(subject: str, body: str) -> None:
-    # Sends one message to all email + SMS recipients (email-to-SMS gateways).
-    if not all([NOTIFY_EMAIL_FROM, NOTIFY_EMAIL_PASSWORD]):
-        return
 
-    email_recipients = [e.strip() for e in (NOTIFY_EMAIL_TO or "").split(",") if e.strip()]
-    sms_recipients = [s.strip() for s in (SMS_NOTIFY_TO or "").split(",") if s.strip()]
-    recipients = email_recipients + sms_recipients
-    if not recipients:
-        return
+# Console + JSONL writes happen on a listener thread; EMAIL/PASSWORD/ACCOUNT_ID are redacted
+LOGS = LogPipeline("kenya", LOG_JSONL, {"EMAIL": EMAIL, "PASSWORD": PASSWORD, "ACCOUNT_ID": ACCOUNT_ID})
 
-    msg = MIMEText(body, _charset="utf-8")
-    msg["Subject"] = subject
-    msg["From"] = NOTIFY_EMAIL_FROM
-    msg["To"] = ", ".join(recipients)
 
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(NOTIFY_EMAIL_FROM, NOTIFY_EMAIL_PASSWORD)
-            server.sendmail(NOTIFY_EMAIL_FROM, recipients, msg.as_string())
-        log(f"[NOTIFY] Email/SMS sent: {subject}")
-    except Exception as e:
-        log(f"[ERROR] Email failed: {e}")
+def log(message: str) -> None:
+    LOGS.emit(message)
+
+
+GOVERNOR = RateGovernor(RATE_STATE_FILE, {
+    PAGE_LOAD: (MAX_PAGE_LOADS_PER_HOUR, 3600),
+    LOGIN: (MAX_LOGINS_PER_DAY, 86400),
+}, log)
+
+
+# One reused SMTP connection on a worker thread; the booking path never waits on it.
+# SMTP_HOST / SMTP_PORT point it at a local stand-in (port 465 = implicit TLS).
+MAILER = NotificationDispatcher(
+    NOTIFY_EMAIL_FROM,
+    NOTIFY_EMAIL_PASSWORD,
+    split_recipients(NOTIFY_EMAIL_TO, SMS_NOTIFY_TO),
+    log,
+    host=SMTP_HOST,
+    port=SMTP_PORT,
+    use_ssl=SMTP_PORT == 465,
+)
+
+# Alerts are de-duplicated per (facility, date), coalesced into one digest per window and
+# rate-limited per channel; a failing channel (e.g. no desktop backend) never blocks the rest.
+ALERT_CHANNELS = [
+    SmtpChannel(MAILER, max_per_hour=ALERT_EMAIL_MAX_PER_HOUR),
+    DesktopChannel(max_per_hour=ALERT_DESKTOP_MAX_PER_HOUR),
+]
+if ALERT_WEBHOOK_URL:
+    ALERT_CHANNELS.append(WebhookChannel(ALERT_WEBHOOK_URL, max_per_hour=ALERT_WEBHOOK_MAX_PER_HOUR))
+ALERTS = AlertEngine(ALERT_CHANNELS, log, window=ALERT_COALESCE_SECONDS)
+HISTORY = HistoryStore(HISTORY_DB, "kenya")
+METRICS = BotMetrics("kenya", HEALTH_DEADLINE_SECONDS, budget=GOVERNOR.snapshot)
+# Fallback chains for the form controls, reordered toward whatever the page currently matches
+LOCATORS = appointment_locators(log)
+# Per-step wait caps; the literals are the ceilings until p95s are learned
+WAIT_CAPS = WaitCaps({
+    "facility_select": 30,
+    "facility_ready": FACILITY_READY_TIMEOUT,
+    "date_input": 45,
+    "time_select": 20,
+    "submit": 20,
+    "confirm": 10,
+})
+
+# Same checks per day as the uniform MIN/MAX sleep, shifted toward hours that released slots before
+SCHEDULER = PollScheduler(MIN_WAIT_SECONDS, MAX_WAIT_SECONDS, min_gap=MIN_WAIT_SECONDS,
+                          history_loader=lambda: load_appearances(HISTORY_DB, "kenya"))
+
+CONFIG = ConfigWatcher(CONFIG_FILE, Settings(
+    cities=CITIES, start=DATE_RANGE_START_DT, end=DATE_RANGE_END_DT, dry_run=DRY_RUN,
+    min_wait=MIN_WAIT_SECONDS, max_wait=MAX_WAIT_SECONDS, sweep_mode=SWEEP_MODE,
+    preference_days=FACILITY_PREFERENCE_DAYS,
+), log)
+
+
+def apply_settings(settings: Settings) -> None:
+    """Make `settings` the live configuration. Nothing here touches the browser."""
+    global CITIES, DATE_RANGE_START_DT, DATE_RANGE_END_DT, DRY_RUN
+    global MIN_WAIT_SECONDS, MAX_WAIT_SECONDS, SWEEP_MODE, FACILITY_PREFERENCE_DAYS
+    CITIES = settings.cities
+    DATE_RANGE_START_DT = settings.start
+    DATE_RANGE_END_DT = settings.end
+    DRY_RUN = settings.dry_run
+    MIN_WAIT_SECONDS = settings.min_wait
+    MAX_WAIT_SECONDS = settings.max_wait
+    SWEEP_MODE = settings.sweep_mode
+    FACILITY_PREFERENCE_DAYS = settings.preference_days
+    SCHEDULER.set_wait_bounds(MIN_WAIT_SECONDS, MAX_WAIT_SECONDS, min_gap=MIN_WAIT_SECONDS)
+
+
+def reload_config() -> None:
+    """Pick up CONFIG_FILE edits between cycles (an invalid edit is logged and ignored)."""
+    settings = CONFIG.poll()
+    if settings is not None:
+        apply_settings(settings)
+        log(f"[CONFIG] Window: {DATE_RANGE_START_DT.date()} -> {DATE_RANGE_END_DT.date()}, "
+            f"cities {', '.join(CITIES)}, DRY_RUN={DRY_RUN}")
 
 
 def build_driver() -> webdriver.Chrome:
-    opts = webdriver.ChromeOptions()
-    opts.add_argument("--start-maximized")
-    opts.add_argument("--disable-background-networking")
-    opts.add_argument("--disable-sync")
-    opts.add_argument("--no-first-run")
-    opts.add_argument("--no-default-browser-check")
-    opts.add_experimental_option("excludeSwitches", ["enable-logging"])
-    # If you need headless:
-    # opts.add_argument("--headless=new")
-    return webdriver.Chrome(options=opts)
+    return GOVERNOR.attach(instrumentation.attach(build_chrome(lean=LEAN_BROWSER, headless=HEADLESS)))
 
 
+@step()
 def login(driver: webdriver.Chrome) -> None:
     log("[STEP] Logging in...")
+    GOVERNOR.acquire(LOGIN)
     driver.get(f"{BASE_URL}/users/sign_in")
 
     WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.ID, "user_email")))
@@ -128,19 +275,24 @@ def login(driver: webdriver.Chrome) -> None:
     except Exception:
         pass
 
+    GOVERNOR.acquire(PAGE_LOAD, reason="login submit")
     driver.find_element(By.NAME, "commit").click()
     log("[INFO] Login submitted.")
 
 
+@step()
 def continue_existing_appointment(driver: webdriver.Chrome) -> bool:
     log("[STEP] Clicking 'Continue' on existing appointment page (if present)...")
     try:
-        WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.LINK_TEXT, "Continue"))).click()
+        link = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.LINK_TEXT, "Continue")))
+        GOVERNOR.acquire(PAGE_LOAD, reason="Continue")
+        link.click()
         return True
     except Exception:
         return False
 
 
+@step()
 def click_reschedule(driver: webdriver.Chrome) -> bool:
     log("[STEP] Navigating to reschedule page...")
     try:
@@ -158,165 +310,75 @@ def click_reschedule(driver: webdriver.Chrome) -> bool:
                 "//a[contains(@href, '/appointment') and contains(., 'Reschedule Appointment')]"
             ))
         )
+        GOVERNOR.acquire(PAGE_LOAD, reason="Reschedule Appointment")
         link.click()
         return True
     except Exception as e:
         log(f"[ERROR] Reschedule navigation failed: {e}")
         return False
     
+@step()
 def accept_reschedule_warning(driver) -> bool:
-    log("[STEP] Handling reschedule warning page (I understand + Continue)...")
-
-    # If checkbox isn't present quickly, assume no warning gate
-    try:
-        cb = WebDriverWait(driver, 3).until(
-            EC.presence_of_element_located((By.ID, "confirmed_limit_message"))
-        )
-    except Exception:
-        log("[INFO] Warning checkbox not present; continuing.")
-        return True
+    return accept_warning_gate(driver, LOCATORS, GOVERNOR, log, CHECKBOX_READY_TIMEOUT)
 
-    # Wait until checkbox is interactable / rendered
-    try:
-        WebDriverWait(driver, 15).until(lambda d: d.find_element(By.ID, "confirmed_limit_message").is_displayed())
-        WebDriverWait(driver, 15).until(lambda d: d.find_element(By.ID, "confirmed_limit_message").is_enabled())
-    except Exception:
-        pass
 
-    # Click wrapper (icheck) if possible
-    try:
-        wrapper = driver.find_element(
-            By.XPATH,
-            "//div[contains(@class,'icheckbox')]//input[@id='confirmed_limit_message']/.."
-        )
-        driver.execute_script("arguments[0].click();", wrapper)
-    except Exception:
-        driver.execute_script("arguments[0].click();", cb)
 
-    # Verify it checked
-    time.sleep(0.3)
-    cb = driver.find_element(By.ID, "confirmed_limit_message")
-    if not cb.is_selected():
-        log("[ERROR] Checkbox click did not stick.")
-        return False
-    log("[INFO] Checked 'I understand' checkbox.")
 
-    # Click Continue
-    cont = WebDriverWait(driver, 15).until(
-        EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and @name='commit' and @value='Continue']"))
-    )
-    driver.execute_script("arguments[0].click();", cont)
-    log("[INFO] Clicked Continue on warning page.")
-
-    return True
-
-
-
-
-def select_city(driver: webdriver.Chrome, city: str) -> bool:
+@step()
+def select_city(driver: webdriver.Chrome, city: str, deadline: Optional[Deadline] = None,
+                essential: bool = False) -> bool:
+    # essential: re-selecting a facility to book a date the sweep already read
+    instrumentation.tag(facility=city)
     log(f"[STEP] Selecting facility/city: {city}")
+    deadline = deadline or Deadline(None, WAIT_CAPS)
     try:
-        dropdown = WebDriverWait(driver, 30).until(
-            EC.element_to_be_clickable((By.ID, "appointments_consulate_appointment_facility_id"))
-        )
-        sel = Select(dropdown)
-
-        # Try exact match first
-        try:
-            sel.select_by_visible_text(city)
-            log(f"[INFO] Selected facility exactly: {city}")
-        except Exception:
-            # Fallback: partial match (in case option text is "Nairobi, Kenya", etc.)
-            options = [o.text.strip() for o in sel.options if o.text.strip()]
-            match = next((o for o in options if city.lower() in o.lower()), None)
-
-            log(f"[DEBUG] Facility options: {options}")
-
-            if not match:
-                log(f"[ERROR] Could not find facility option containing '{city}'.")
-                return False
-
-            sel.select_by_visible_text(match)
-            log(f"[INFO] Selected facility by partial match: {match}")
+        dropdown = deadline.wait("facility_select", lambda t: LOCATORS.find(driver, "facility_select", t),
+                                 essential=essential)
+
+        # Exact text, else partial ("Nairobi, Kenya"), decided from one read of the options
+        options = option_texts(driver, dropdown)
+        match = match_option(options, city)
+        if not match:
+            log(f"[ERROR] Could not find facility option containing '{city}'. Options: {options}")
+            return False
+        Select(dropdown).select_by_visible_text(match)
+        log(f"[INFO] Selected facility {'exactly' if match == city else 'by partial match'}: {match}")
 
-        # Give AIS time to populate the date field after facility selection
-        time.sleep(1.5)
+        # Wait for AIS to load this facility's days and re-enable the date field
+        if not deadline.wait("facility_ready", lambda t: wait_for_facility_ready(driver, t), essential=essential):
+            log(f"[WARNING] Date field still not ready after selecting {city}.")
+        recorder.capture(driver, "facility_selected")
         return True
 
+    except CycleOverBudget:
+        raise
     except Exception as e:
         log(f"[ERROR] City select failed ({city}): {e}")
         return False
 
 
 
-def select_date_from_calendar(driver: webdriver.Chrome, target_date: datetime) -> bool:
+@step()
+def select_date_from_calendar(driver: webdriver.Chrome, target_date: datetime,
+                              deadline: Optional[Deadline] = None, essential: bool = False) -> bool:
     """
     Select target_date from the AIS jQuery datepicker.
 
     Kenya often loads/enables the date input via AJAX after facility selection.
     So we:
-    - wait for PRESENCE (not clickable)
-    - wait until ENABLED
-    - click via JS (more reliable)
-    - navigate month/year and click the day if selectable
+    - wait until the input exists, is ENABLED and no AJAX is in flight (one script per poll)
+    - open, navigate and click via batched JS snapshots (one round trip per month step)
     - return False (not crash) if not available yet
+    `essential` (booking a date already seen open) waits regardless of the cycle budget.
     """
+    deadline = deadline or Deadline(None, WAIT_CAPS)
     try:
-        # Wait for the date input to EXIST (Kenya can be slow)
-        date_input = WebDriverWait(driver, 45).until(
-            EC.presence_of_element_located((
-                By.XPATH,
-                "//input[@id='appointments_consulate_appointment_date' "
-                "or @name='appointments[consulate_appointment][date]' "
-                "or contains(@id,'appointment_date')]"
-            ))
-        )
-
-        # Wait for it to be enabled (sometimes disabled during AJAX)
-        WebDriverWait(driver, 45).until(lambda d: date_input.is_enabled())
-
-        # Open the datepicker (JS click is more reliable on AIS)
-        driver.execute_script("arguments[0].scrollIntoView({block:'center'});", date_input)
-        driver.execute_script("arguments[0].click();", date_input)
-
-        while True:
-            month_elem = WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".ui-datepicker-group-first .ui-datepicker-month"))
-            )
-            year_elem = WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".ui-datepicker-group-first .ui-datepicker-year"))
-            )
-
-            displayed_month = month_elem.text.strip()
-            displayed_year = year_elem.text.strip()
-            displayed_date = datetime.strptime(f"{displayed_month} {displayed_year}", "%B %Y")
-
-            if (displayed_date.year, displayed_date.month) > (target_date.year, target_date.month):
-                prev_btn = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, ".ui-datepicker-prev"))
-                )
-                driver.execute_script("arguments[0].click();", prev_btn)
-
-            elif (displayed_date.year, displayed_date.month) < (target_date.year, target_date.month):
-                next_btn = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, ".ui-datepicker-next"))
-                )
-                driver.execute_script("arguments[0].click();", next_btn)
-
-            else:
-                # Only clickable days are in td[data-handler='selectDay']
-                all_days = driver.find_elements(
-                    By.CSS_SELECTOR,
-                    ".ui-datepicker-group-first td[data-handler='selectDay'] a"
-                )
-                for day_elem in all_days:
-                    if int(day_elem.text) == target_date.day:
-                        driver.execute_script("arguments[0].click();", day_elem)
-                        return True
-
-                # Day not selectable in this month view
-                return False
+        deadline.wait("date_input", lambda t: WebDriverWait(driver, t, poll_frequency=POLL_SECONDS).until(date_input_ready),
+                      essential=essential)
+        return select_day(driver, target_date)
 
+    except CycleOverBudget:
+        raise
     except Exception as e:
         # Important: don't kill the whole script; just treat as not ready / not available
         log(f"[INFO] Date field not ready or date not selectable for {target_date.strftime('%Y-%m-%d')}: {e}")
@@ -324,171 +386,339 @@ def select_date_from_calendar(driver: webdriver.Chrome, target_date: datetime) -
 
 
 
-def check_and_select_appointment(driver: webdriver.Chrome, city: str) -> bool:
+def record_availability(city: str, available) -> list:
+    """
+    Store what `city` showed this cycle and act on what changed since the previous read.
+
+    New in-window dates alert immediately (before any booking click); vanished ones re-arm
+    the alert de-dup so a reappearance alerts again.
+    """
+    first_date = max(DATE_RANGE_START_DT, datetime.today())
+    events = AVAILABILITY.update(city, available, first_date, DATE_RANGE_END_DT)
+    last_availability[city] = [d.isoformat() for d in AVAILABILITY.open_dates(city)]
+    last_read_at[city] = time.perf_counter()
+    HISTORY.observe(city, available, first_date, DATE_RANGE_END_DT)
+    METRICS.observe_read(city, AVAILABILITY.earliest(city))
+    if events:
+        log(f"[CHANGE] {city}: {describe_events(events)}")
+        for event in events:
+            if event.kind == NEW:
+                ALERTS.alert(city, event.day)
+        if any(event.kind == VANISHED for event in events):
+            ALERTS.resolve(city, AVAILABILITY.open_dates(city))
+    return events
+
+
+@step()
+def sweep_cities(driver: webdriver.Chrome, deadline: Optional[Deadline] = None) -> SweepSnapshot:
+    """Read every facility's open dates on the loaded form, without booking anything."""
+    first_date = max(DATE_RANGE_START_DT, datetime.today())
+    # Each facility is recorded as soon as it is read; a later over-budget wait can't lose it
+    snapshot = sweep_facilities(driver, CITIES, lambda d, city: select_city(d, city, deadline),
+                                first_date, DATE_RANGE_END_DT, on_read=record_availability)
+    log(f"[SWEEP] {snapshot.describe(FACILITY_PREFERENCE_DAYS)}")
+    return snapshot
+
+
+@step()
+def check_and_select_appointment(driver: webdriver.Chrome, city: str, known_dates=None,
+                                 deadline: Optional[Deadline] = None) -> bool:
+    """
+    Select `city` and try to book its earliest open date in the window.
+
+    `known_dates` (from a sweep) skips the calendar scan and books from that list directly.
+    Every wait draws on `deadline`; CycleOverBudget propagates to main().
+    """
+    instrumentation.tag(facility=city)
     log(f"[STEP] Checking appointment availability in {city}...")
-    if not select_city(driver, city):
+    deadline = deadline or Deadline(None, WAIT_CAPS)
+    # Dates the sweep already read are booked regardless of the cycle budget
+    known = known_dates is not None
+    if not select_city(driver, city, deadline, essential=known):
         return False
 
-    # If there are no selectable days at all, we should refresh instead of looping dates
+    first_date = max(DATE_RANGE_START_DT, datetime.today())
+    last_date = DATE_RANGE_END_DT
     try:
-        date_input = WebDriverWait(driver, 45).until(
-            EC.presence_of_element_located((
-                By.XPATH,
-                "//input[@id='appointments_consulate_appointment_date' "
-                "or @name='appointments[consulate_appointment][date]' "
-                "or contains(@id,'appointment_date')]"
-            ))
-        )
-        WebDriverWait(driver, 45).until(lambda d: date_input.is_enabled())
-        driver.execute_script("arguments[0].scrollIntoView({block:'center'});", date_input)
-        driver.execute_script("arguments[0].click();", date_input)
-
-        # Look for ANY selectable day (if none exist, no appointments available right now)
-        selectable_days = driver.find_elements(
-            By.CSS_SELECTOR,
-            ".ui-datepicker-group-first td[data-handler='selectDay'] a, td[data-handler='selectDay'] a"
-        )
+        deadline.wait("date_input", lambda t: WebDriverWait(driver, t, poll_frequency=POLL_SECONDS).until(date_input_ready),
+                      essential=known)
 
-        if not selectable_days:
-            log("[INFO] No selectable dates available right now. Will refresh and try again.")
-            return False
+        if known_dates is None and SINGLE_PASS_SCAN:
+            # The opened view only sets where the scan starts; it walks every month up to last_date
+            record_availability(city, scan_available_dates(driver, first_date, last_date, open_calendar(driver)))
 
+    except CycleOverBudget:
+        raise
     except Exception as e:
         log(f"[INFO] Datepicker not ready / no availability. Will refresh and try again. Details: {e}")
         return False
 
-    # If we got here, at least one selectable day exists → now we do your normal day-by-day search window
-    current_date = max(DATE_RANGE_START_DT, datetime.today())
-    last_date = DATE_RANGE_END_DT
+    if known_dates is not None:
+        return book_first_available(driver, city, [datetime.combine(d, datetime.min.time()) for d in known_dates],
+                                    deadline, essential=True)
 
-    while current_date <= last_date:
-        if select_date_from_calendar(driver, current_date):
-            notify("Visa Appointment Bot", f"Date found ({city}): {current_date.strftime('%Y-%m-%d')}")
-            send_email("Visa Date Found", f"Date: {current_date.strftime('%Y-%m-%d')} | Facility: {city}")
-
-            time_select = WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.ID, "appointments_consulate_appointment_time"))
-            )
-            Select(time_select).select_by_index(1)
-
-            reschedule_btn = WebDriverWait(driver, 20).until(
-                EC.element_to_be_clickable((
-                    By.XPATH,
-                    "//input[@type='submit' and (contains(@value,'Reschedule') or @value='Reschedule')]"
-                ))
-            )
+    if SINGLE_PASS_SCAN:
+        available = AVAILABILITY.open_dates(city)
+        if not available:
+            log(f"[INFO] No open dates in the window at {city} right now. Will refresh and try again.")
+            return False
+        log(f"[INFO] Single-pass scan ({city}): {len(available)} open date(s) in window "
+            f"{[d.strftime('%Y-%m-%d') for d in available[:5]]}")
+        candidates = [datetime.combine(d, datetime.min.time()) for d in available]
+    else:
+        candidates = (first_date + timedelta(days=i) for i in range((last_date - first_date).days + 1))
+
+    # Scanned dates are known to be open: booking them is not cut short by the cycle budget
+    return book_first_available(driver, city, candidates, deadline, essential=SINGLE_PASS_SCAN)
+
+
+def book_first_available(driver: webdriver.Chrome, city: str, candidates, deadline: Deadline,
+                         essential: bool = False) -> bool:
+    # Known-open dates time from the read that found them; the legacy walk from its own click
+    detected_at = last_read_at.get(city) if essential else None
+    for current_date in candidates:
+        timeline = CommitTimeline(detected_at)
+        if select_date_from_calendar(driver, current_date, deadline, essential):
+            timeline.mark("date_selected")
+            ALERTS.alert(city, current_date)  # no-op if the change event already alerted (legacy walk)
+
+            result = commit_appointment(driver, LOCATORS, deadline, timeline, current_date.strftime("%Y-%m-%d"),
+                                        DRY_RUN, log)
+            log(f"[COMMIT] {city} {current_date.strftime('%Y-%m-%d')} {result.time or '-'} "
+                f"(of {len(result.form.times)}): {timeline.describe()}")
+            if not result.ready:
+                log(f"[WARNING] Could not book {current_date.strftime('%Y-%m-%d')}: {result.problem}")
+                continue
             if DRY_RUN:
-                log("[DRY_RUN] Would submit reschedule + confirm here. Skipping irreversible actions.")
+                log("[DRY_RUN] Would submit reschedule + confirm here. Skipping irreversible actions. "
+                    f"Confirm control: {result.controls.get('confirm') or 'not on the page yet'}.")
                 return True
+            if not result.submitted:
+                log(f"[WARNING] Reschedule not submitted: {result.problem}")
+                continue
 
-            driver.execute_script("arguments[0].click();", reschedule_btn)
             log("[STEP] Reschedule submitted.")
-
-            try:
-                confirm_btn = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((
-                        By.XPATH,
-                        "//button[contains(., 'Confirm') or contains(., 'Yes') or contains(., 'Continue')]"
-                    ))
-                )
-                driver.execute_script("arguments[0].click();", confirm_btn)
-                notify("Visa Appointment Bot", f"Appointment confirmed ({city})")
-                send_email("Visa Appointment Confirmed", f"Confirmed: {city} on {current_date.strftime('%Y-%m-%d')}")
-            except TimeoutException:
-                log("[INFO] No confirmation popup appeared (may have confirmed immediately).")
-
+            if result.confirmed:
+                ALERTS.alert(city, current_date, kind=CONFIRMED, urgent=True)
+            else:
+                log(f"[INFO] No confirmation popup appeared (may have confirmed immediately): {result.problem}")
             return True
 
-        current_date += timedelta(days=1)
-
     log("[INFO] Selectable dates exist, but none within your target window. Will refresh and try again.")
     return False
 
 
 
-def is_signed_out(driver: webdriver.Chrome) -> bool:
+def open_appointment_url(driver: webdriver.Chrome) -> None:
+    driver.get(APPOINTMENT_URL)
+
+
+def restore_checkpoint_cookies(driver: webdriver.Chrome) -> bool:
+    return restore_session(driver, load_checkpoint(STATE_FILE), APPOINTMENT_URL, f"{BASE_URL}/users/sign_in")
+
+
+def leave_dashboard(driver: webdriver.Chrome) -> bool:
+    # The groups page needs 'Continue' first; continue_actions already shows the accordion
+    if "continue_actions" not in driver.current_url:
+        continue_existing_appointment(driver)
+    return click_reschedule(driver)
+
+
+STANDBY = WarmStandby(build_driver, log, enabled=WARM_STANDBY)
+WATCHDOG = BrowserWatchdog(
+    log,
+    max_rss_bytes=BROWSER_MAX_RSS_MB * 2**20 if BROWSER_MAX_RSS_MB else None,
+    max_fds=BROWSER_MAX_FDS,
+    max_age_seconds=BROWSER_MAX_AGE_HOURS * 3600 if BROWSER_MAX_AGE_HOURS else None,
+)
+
+
+# Cheapest way out of each state first; recover() falls through to the next on no progress
+NAVIGATION = NavigationFlow({
+    BLANK: [restore_checkpoint_cookies, open_appointment_url],
+    SIGNED_OUT: [login],
+    DASHBOARD: [open_appointment_url, leave_dashboard],
+    RESCHEDULE_WARNING: [accept_reschedule_warning],
+    UNKNOWN: [open_appointment_url],
+}, log)
+
+
+def end_cycle(outcome: str, **fields) -> None:
+    """Close the instrumentation cycle and hand its record to the history store and metrics."""
+    record = instrumentation.end_cycle(outcome, **fields)
+    HISTORY.end_cycle(record)
+    METRICS.observe_cycle(record)
+
+
+def checkpoint(driver: webdriver.Chrome, refresh_counter: int) -> None:
     try:
-        return "sign_in" in driver.current_url or "Sign In" in driver.page_source
-    except Exception:
-        return True
+        save_checkpoint(STATE_FILE, driver, refresh_counter=refresh_counter, availability=last_availability,
+                        locators=LOCATORS.snapshot(), wait_caps=WAIT_CAPS.snapshot())
+    except Exception as e:
+        log(f"[WARNING] Could not save checkpoint: {e}")
+
+
+def recover(driver: webdriver.Chrome) -> webdriver.Chrome:
+    """
+    Bring the session back to the appointment form from whatever state it is in.
+
+    Re-enters at the cheapest reachable state (e.g. only the warning gate, or only a
+    login) and rebuilds the browser once if it has died. Returns the (possibly new) driver;
+    raises RuntimeError if the form can't be reached.
+    """
+    for attempt in range(2):
+        try:
+            if NAVIGATION.recover(driver):
+                return driver
+        except WebDriverException as e:
+            log(f"[WARNING] Browser unusable during recovery ({e.__class__.__name__}); rebuilding driver.")
+            with span("rebuild_driver", reason="webdriver_exception"):
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+                driver = STANDBY.take()
+            continue
+        break
+    raise RuntimeError("Could not reach the appointment form; see [FLOW] lines above.")
+
+
+def recycle_driver(driver: webdriver.Chrome, reason: str) -> webdriver.Chrome:
+    """Swap in a fresh browser between cycles and re-enter the session (checkpoint cookies first)."""
+    log(f"[RECYCLE] Replacing browser in the sleep window: {reason}")
+    with span("recycle_driver", reason=reason):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        driver = STANDBY.take()
+        WATCHDOG.recycled(reason)
+        METRICS.observe_recycle(reason)
+        return recover(driver)
 
 
 def main() -> None:
     if not EMAIL or not PASSWORD:
         raise RuntimeError("Missing EMAIL/PASSWORD in environment. Create a .env file from .env.example")
 
+    # An invalid file refuses to start (ConfigError); later edits are validated in reload_config()
+    apply_settings(CONFIG.load())
+
+    saved = load_checkpoint(STATE_FILE)
+    refresh_counter = saved.get("refresh_counter", 0)
+    last_availability.update(saved.get("availability") or {})
+    # Dates open at the last checkpoint are the baseline: no NEW events or alerts for them again
+    AVAILABILITY.restore(last_availability)
+    for city, days in last_availability.items():
+        ALERTS.remember(city, days)
+    LOCATORS.restore(saved.get("locators"))
+    WAIT_CAPS.restore(saved.get("wait_caps"))
+    over_budget = 0
+
+    instrumentation.configure(METRICS_JSONL)
+    recorder.configure(RECORD_FIXTURES, instrumentation.context)
+    instrumentation.start_cycle("setup")
     driver = build_driver()
+    # Reads whichever driver `driver` names at scrape time (it changes on rebuilds)
+    METRICS.rss = lambda: tree_rss_bytes(driver)
+    metrics_server = None
     try:
         log("[INIT] Kenya visa bot started.")
+        if METRICS_PORT:
+            try:
+                metrics_server = MetricsServer(METRICS, METRICS_PORT).start()
+                log(f"[INIT] Metrics on http://127.0.0.1:{METRICS_PORT}/metrics (health: /healthz)")
+            except OSError as e:
+                log(f"[WARNING] Metrics endpoint not started on port {METRICS_PORT}: {e}")
         log(f"[CONFIG] Window: {DATE_RANGE_START_DT.date()} -> {DATE_RANGE_END_DT.date()}")
-        login(driver)
-
-        if not continue_existing_appointment(driver):
-            log("[ERROR] Could not find an existing appointment to continue. Make sure you're logged into the correct account.")
-            return
-
-        if not click_reschedule(driver):
-            log("[ERROR] Could not reach the reschedule page.")
-            return
-
-        # ✅ ADD THIS BLOCK
-        if not accept_reschedule_warning(driver):
-            log("[ERROR] Failed to pass reschedule warning page.")
-            return
-
-        # ✅ Optional hard gate: ensure we’re past the warning and on the form page
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.ID, "appointments_consulate_appointment_facility_id"))
-        )
-        log("[INFO] Passed warning page. Facility dropdown is present.")
-
-        refresh_counter = 0
+        if CONFIG.path and os.path.exists(CONFIG.path):
+            log(f"[CONFIG] Settings from {CONFIG.path} (edits apply between cycles).")
+        if refresh_counter:
+            log(f"[INIT] Resuming from checkpoint at refresh #{refresh_counter}.")
+        if ADAPTIVE_SCHEDULE:
+            SCHEDULER.refit_if_stale()
+            for line in SCHEDULER.describe():
+                log(f"[SCHEDULE] {line}")
+
+        # Fresh browser: checkpoint cookies if still valid, otherwise login -> Continue -> Reschedule -> warning
+        driver = recover(driver)
+        log("[INFO] Appointment form reached. Facility dropdown is present.")
+        checkpoint(driver, refresh_counter)
+        end_cycle("ready")
+
+        instrumentation.start_cycle(refresh_counter + 1)
+        deadline = Deadline(CYCLE_BUDGET_SECONDS or None, WAIT_CAPS)
         while True:
-            for city in CITIES:
-                if check_and_select_appointment(driver, city):
-                    log("[SUCCESS] Appointment booked. Exiting.")
-                    return
-            ...
-
+            reload_config()
+            # No date can match an expired/empty window: skip the checks but keep the session warm
+            idle = CONFIG.settings.window_problem()
+            outcome = "idle" if idle else "empty"
+            try:
+                if idle:
+                    log(f"[CONFIG] Not checking: {idle}. Update {CONFIG_FILE} to resume (no restart needed).")
+                    attempts = []
+                elif SWEEP_MODE:
+                    ranked = sweep_cities(driver, deadline).ranked(FACILITY_PREFERENCE_DAYS)
+                    attempts = [(entry.facility, AVAILABILITY.open_dates(entry.facility)) for entry in ranked]
+                else:
+                    attempts = [(city, None) for city in CITIES]
+                for city, known_dates in attempts:
+                    if check_and_select_appointment(driver, city, known_dates, deadline):
+                        log("[SUCCESS] Appointment booked. Exiting.")
+                        end_cycle("found", facility=city, budget=GOVERNOR.snapshot())
+                        return
+            except CycleOverBudget as e:
+                over_budget += 1
+                outcome = "over_budget"
+                log(f"[BUDGET] Cycle aborted: {e} ({over_budget} this run). Caps: {WAIT_CAPS.describe()}")
 
             refresh_counter += 1
-            wait_time = random.randint(MIN_WAIT_SECONDS, MAX_WAIT_SECONDS)
+            checkpoint(driver, refresh_counter)
+            end_cycle(outcome, budget=GOVERNOR.snapshot())
+            STANDBY.prepare_async()
+            if ADAPTIVE_SCHEDULE:
+                wait_time = SCHEDULER.next_wait()
+            else:
+                wait_time = random.randint(MIN_WAIT_SECONDS, MAX_WAIT_SECONDS)
             log(f"[WAIT] None found. Refresh #{refresh_counter}. Sleeping {wait_time//60}m {wait_time%60}s")
-            time.sleep(wait_time)
+            slept_from = time.monotonic()
+            reason = WATCHDOG.sample(driver)
+            if reason:
+                driver = recycle_driver(driver, reason)
+                STANDBY.prepare_async()  # the recycle used the spare
+            time.sleep(max(0.0, wait_time - (time.monotonic() - slept_from)))
+            instrumentation.start_cycle(refresh_counter + 1)
+            deadline = Deadline(CYCLE_BUDGET_SECONDS or None, WAIT_CAPS)
 
             try:
-                driver.get(APPOINTMENT_URL)
-                accept_reschedule_warning(driver)  # if the warning page appears again
-                WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.ID, "appointments_consulate_appointment_facility_id"))
-            )
-
+                with span("reload"):
+                    driver.get(APPOINTMENT_URL)
             except WebDriverException:
-                log("[WARNING] Refresh failed; rebuilding driver/session.")
-                driver.quit()
-                driver = build_driver()
-                login(driver)
-
-            if is_signed_out(driver):
-                log("[WARNING] Signed out detected; re-logging in.")
-                driver.quit()
-                driver = build_driver()
-                login(driver)
-
-                if not continue_existing_appointment(driver):
-                    log("[ERROR] No existing appointment after relogin.")
-                    return
+                log("[WARNING] Refresh failed; recovering session.")
 
-                if not click_reschedule(driver):
-                    log("[ERROR] Could not reach reschedule after relogin.")
-                    return
+            # Handles a reappearing warning gate, sign-outs and dead browsers alike
+            driver = recover(driver)
 
+    except RuntimeError as e:
+        log(f"[ERROR] {e}")
     finally:
         try:
             driver.quit()
         except Exception:
             pass
+        STANDBY.close()
+        ALERTS.close()
+        MAILER.stop()
+        HISTORY.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+        recorder.close()
+        for line in instrumentation.finish():
+            log(f"[METRICS] {line}")
+        for line in LOCATORS.describe():
+            log(f"[LOCATOR] {line}")
         log("[EXIT] Browser closed.")
+        LOGS.close()
 
 
 if __name__ == "__main__":
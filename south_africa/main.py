@@ -2,18 +2,39 @@
 # Use responsibly and comply with the website’s terms and all applicable laws.
 
 import os
+import sys
 import time
 import random
 from datetime import datetime, timedelta
+from pathlib import Path
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select, WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import WebDriverException
 from dotenv import load_dotenv
-from plyer import notification
-import smtplib
-from email.mime.text import MIMEText
-from selenium import webdriver
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.alerts import CONFIRMED, AlertEngine, DesktopChannel, SmtpChannel, WebhookChannel  # noqa: E402
+from common.availability import NEW, VANISHED, AvailabilityTracker, describe_events  # noqa: E402
+from common.browser import BrowserWatchdog, WarmStandby, build_driver as build_chrome, tree_rss_bytes  # noqa: E402
+from common.commit import CommitTimeline, commit_appointment  # noqa: E402
+from common.config import ConfigWatcher, Settings  # noqa: E402
+from common.datepicker import open_calendar, scan_available_dates, select_day  # noqa: E402
+from common.deadline import CycleOverBudget, Deadline, WaitCaps  # noqa: E402
+from common.fixtures import recorder  # noqa: E402
+from common.flow import BLANK, DASHBOARD, RESCHEDULE_WARNING, SIGNED_OUT, UNKNOWN, NavigationFlow  # noqa: E402
+from common.gate import accept_reschedule_warning as accept_warning_gate  # noqa: E402
+from common.governor import LOGIN, PAGE_LOAD, RateGovernor  # noqa: E402
+from common.history import HistoryStore  # noqa: E402
+from common.instrumentation import instrumentation, span, step  # noqa: E402
+from common.locators import appointment_locators, match_option, option_texts  # noqa: E402
+from common.logs import LogPipeline  # noqa: E402
+from common.metrics import BotMetrics, MetricsServer  # noqa: E402
+from common.notify import NotificationDispatcher, split_recipients  # noqa: E402
+from common.scheduler import PollScheduler, load_appearances  # noqa: E402
+from common.session import load_checkpoint, restore_session, save_checkpoint  # noqa: E402
+from common.sweep import sweep_facilities  # noqa: E402
+from common.waits import POLL_SECONDS, date_input_ready, wait_for_facility_ready  # noqa: E402
 
 # Load environment variables
 load_dotenv()
@@ -24,56 +45,199 @@ NOTIFY_EMAIL_FROM = os.getenv("NOTIFY_EMAIL_FROM")
 NOTIFY_EMAIL_TO = os.getenv("NOTIFY_EMAIL_TO")
 NOTIFY_EMAIL_PASSWORD = os.getenv("NOTIFY_EMAIL_PASSWORD")
 SMS_NOTIFY_TO = os.getenv("SMS_NOTIFY_TO")  # SMS email addresses
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))  # 465 = implicit TLS; anything else = plain (local stand-in)
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")  # optional local JSON webhook
+
+# Point at the offline stand-in (bench/standin.py) instead of the live site
+BASE_URL = os.getenv("AIS_BASE_URL", "https://ais.usvisa-info.com/en-za/niv")
+APPOINTMENT_URL = f"{BASE_URL}/schedule/{ACCOUNT_ID}/appointment"
 
 DATE_RANGE_START_DT = datetime.today() + timedelta(days=4)
 DATE_RANGE_END_DT = datetime.strptime("2025-08-15", "%Y-%m-%d")
 CITIES = ["Cape Town", "Durban", "Johannesburg"]
 
+# Sweep all CITIES on one loaded form and book the earliest date anywhere, instead of the
+# first city that has any date. Preference = per-city penalty in days, e.g. {"Durban": 7}.
+SWEEP_MODE = True
+FACILITY_PREFERENCE_DAYS = {}
+
+# True: walk each datepicker month once and pick the earliest open date.
+# False: legacy day-by-day walk (re-opens the calendar for every day in the window).
+SINGLE_PASS_SCAN = True
+
+# Average of one check every (MIN+MAX)/2 seconds; with ADAPTIVE_SCHEDULE the same daily number
+# of checks is spread by historical release hours instead of uniformly (common/scheduler.py)
+MIN_WAIT_SECONDS = 180
+MAX_WAIT_SECONDS = 300
+ADAPTIVE_SCHEDULE = True
+
 # DRY_RUN=True will NOT submit reschedule/confirm actions (safe for demos)
 DRY_RUN = True
 
-def log(message):
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
-
-def notify(title, message):
-    notification.notify(
-        title=title,
-        message=message,
-        app_name="Visa Bot"
-    )
-    log(f"[NOTIFY] Desktop: {title} - {message}")
-
-def send_email(subject, body):
-    if not all([NOTIFY_EMAIL_FROM, NOTIFY_EMAIL_PASSWORD]):
-        return
-    email_recipients = [email.strip() for email in NOTIFY_EMAIL_TO.split(",")] if NOTIFY_EMAIL_TO else []
-    sms_recipients = [sms.strip() for sms in SMS_NOTIFY_TO.split(",")] if SMS_NOTIFY_TO else []
-    recipients = email_recipients + sms_recipients
+# Optional JSON file overriding CITIES, the date window, DRY_RUN, SWEEP_MODE, preferences and
+# the wait bounds. Edits are applied between cycles on the live browser (common/config.py).
+CONFIG_FILE = os.getenv("CONFIG_FILE", "visa_config_south_africa.json")
 
-    msg = MIMEText(body, _charset="utf-8")
-    msg["Subject"] = subject
-    msg["From"] = NOTIFY_EMAIL_FROM
-    msg["To"] = ", ".join(recipients)
+# Deliberate human-like pacing during login/navigation only (never on the booking path).
+# (0, 0) disables it.
+POLITE_PAUSE_SECONDS = (1.2, 3.7)
 
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(NOTIFY_EMAIL_FROM, NOTIFY_EMAIL_PASSWORD)
-            server.sendmail(NOTIFY_EMAIL_FROM, recipients, msg.as_string())
-        log(f"[NOTIFY] Email/SMS sent: {subject}")
-    except Exception as e:
-        log(f"[ERROR] Email failed: {e}")
+# Upper bound for the post-facility readiness wait (returns as soon as the DOM is ready)
+FACILITY_READY_TIMEOUT = 20
+# Upper bound for the "I understand" checkbox to register its click
+CHECKBOX_READY_TIMEOUT = 2
+
+# Wall-time budget per poll cycle, shared by all of its waits; each wait is also capped at
+# its own observed p95 (x2) once there is history (common/deadline.py). 0 = no budget.
+CYCLE_BUDGET_SECONDS = 120
+
+# One JSON line per poll cycle with per-step timings and WebDriver command counts
+METRICS_JSONL = os.getenv("METRICS_JSONL", "visa_cycles.jsonl")
+
+# Session cookies, cycle counter and last availability survive driver rebuilds and restarts
+STATE_FILE = os.getenv("STATE_FILE", "visa_state_south_africa.json")
+
+# Hard request budget (token buckets persisted across restarts; navigations wait when empty)
+MAX_PAGE_LOADS_PER_HOUR = 60
+MAX_LOGINS_PER_DAY = 8
+RATE_STATE_FILE = os.getenv("RATE_STATE_FILE", "visa_rate_south_africa.json")
+
+# Every cycle's date sets, latency and outcome (query: python -m common.history --help)
+HISTORY_DB = os.getenv("HISTORY_DB", "visa_history.sqlite3")
+
+# Structured JSON-lines log (rotated by size/age, gzipped); query: python -m common.logs --help
+LOG_JSONL = os.getenv("LOG_JSONL", "visa_south_africa.jsonl")
+
+# Set to a path to record datepicker/form HTML (python bench/parse_bench.py --archive <path>)
+RECORD_FIXTURES = os.getenv("RECORD_FIXTURES")
 
+# Optional local endpoint: http://127.0.0.1:<METRICS_PORT>/metrics (Prometheus text) and
+# /healthz, which fails once no cycle has completed for HEALTH_DEADLINE_SECONDS. Keep the
+# deadline above the longest sleep (the adaptive schedule may wait up to 30 minutes).
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = off
+HEALTH_DEADLINE_SECONDS = 2400
+
+# Lean profile: headless, small viewport, no GPU/extensions, images/fonts/media and
+# third-party hosts blocked. Set LEAN_BROWSER = False / HEADLESS = False to watch it work.
+LEAN_BROWSER = True
+HEADLESS = True
+
+# Keep a spare browser launched during idle sleeps so rebuilds skip the cold start.
+# Turn off on memory-constrained hosts (one extra Chrome process tree).
+WARM_STANDBY = True
+
+# Recycle the browser in the sleep window (never mid-check) once its process tree exceeds
+# any of these; a [MEMORY] line logs its footprint after every cycle. None = no limit.
+BROWSER_MAX_RSS_MB = 1500
+BROWSER_MAX_FDS = 2000
+BROWSER_MAX_AGE_HOURS = 24
+
+# Alert digests: slots found within the window are sent together; per-channel hourly caps
+ALERT_COALESCE_SECONDS = 20
+ALERT_EMAIL_MAX_PER_HOUR = 6  # email + SMS gateways share this budget
+ALERT_DESKTOP_MAX_PER_HOUR = 60
+ALERT_WEBHOOK_MAX_PER_HOUR = 60
+
+# facility -> ISO dates seen open in the target window on the last check (checkpointed)
+last_availability = {}
+# city -> time.perf_counter() of its latest availability read; commit timelines start there
+last_read_at = {}
+
+# Per-facility open dates as bitsets; each read is diffed into new/vanished slot events
+AVAILABILITY = AvailabilityTracker()
+
+# Console + JSONL writes happen on a listener thread; EMAIL/PASSWORD/ACCOUNT_ID are redacted
+LOGS = LogPipeline("south_africa", LOG_JSONL, {"EMAIL": EMAIL, "PASSWORD": PASSWORD, "ACCOUNT_ID": ACCOUNT_ID})
+
+def log(message):
+    LOGS.emit(message)
+
+GOVERNOR = RateGovernor(RATE_STATE_FILE, {
+    PAGE_LOAD: (MAX_PAGE_LOADS_PER_HOUR, 3600),
+    LOGIN: (MAX_LOGINS_PER_DAY, 86400),
+}, log)
+
+# Email/SMS go out on a background thread over one reused SMTP connection
+MAILER = NotificationDispatcher(
+    NOTIFY_EMAIL_FROM,
+    NOTIFY_EMAIL_PASSWORD,
+    split_recipients(NOTIFY_EMAIL_TO, SMS_NOTIFY_TO),
+    log,
+    host=SMTP_HOST,
+    port=SMTP_PORT,
+    use_ssl=SMTP_PORT == 465,
+)
+
+# One digest per coalescing window, de-duplicated per (facility, date), rate-limited per
+# channel. A desktop notification failure (no plyer backend) no longer aborts the booking.
+ALERT_CHANNELS = [
+    SmtpChannel(MAILER, max_per_hour=ALERT_EMAIL_MAX_PER_HOUR),
+    DesktopChannel(max_per_hour=ALERT_DESKTOP_MAX_PER_HOUR),
+]
+if ALERT_WEBHOOK_URL:
+    ALERT_CHANNELS.append(WebhookChannel(ALERT_WEBHOOK_URL, max_per_hour=ALERT_WEBHOOK_MAX_PER_HOUR))
+ALERTS = AlertEngine(ALERT_CHANNELS, log, window=ALERT_COALESCE_SECONDS)
+HISTORY = HistoryStore(HISTORY_DB, "south_africa")
+METRICS = BotMetrics("south_africa", HEALTH_DEADLINE_SECONDS, budget=GOVERNOR.snapshot)
+# Fallback chains for the form controls, reordered toward whatever the page currently matches
+LOCATORS = appointment_locators(log)
+# Per-step wait caps; the literals are the ceilings until p95s are learned
+WAIT_CAPS = WaitCaps({
+    "facility_select": 20,
+    "facility_ready": FACILITY_READY_TIMEOUT,
+    "date_input": 15,
+    "time_select": 10,
+    "submit": 10,
+    "confirm": 10,
+})
+
+# Same checks per day as the uniform MIN/MAX sleep, shifted toward hours that released slots before
+SCHEDULER = PollScheduler(MIN_WAIT_SECONDS, MAX_WAIT_SECONDS, min_gap=MIN_WAIT_SECONDS,
+                          history_loader=lambda: load_appearances(HISTORY_DB, "south_africa"))
+
+CONFIG = ConfigWatcher(CONFIG_FILE, Settings(
+    cities=CITIES, start=DATE_RANGE_START_DT, end=DATE_RANGE_END_DT, dry_run=DRY_RUN,
+    min_wait=MIN_WAIT_SECONDS, max_wait=MAX_WAIT_SECONDS, sweep_mode=SWEEP_MODE,
+    preference_days=FACILITY_PREFERENCE_DAYS,
+), log)
+
+def apply_settings(settings):
+    # Swap the live configuration; the browser session is left alone
+    global CITIES, DATE_RANGE_START_DT, DATE_RANGE_END_DT, DRY_RUN
+    global MIN_WAIT_SECONDS, MAX_WAIT_SECONDS, SWEEP_MODE, FACILITY_PREFERENCE_DAYS
+    CITIES = settings.cities
+    DATE_RANGE_START_DT = settings.start
+    DATE_RANGE_END_DT = settings.end
+    DRY_RUN = settings.dry_run
+    MIN_WAIT_SECONDS = settings.min_wait
+    MAX_WAIT_SECONDS = settings.max_wait
+    SWEEP_MODE = settings.sweep_mode
+    FACILITY_PREFERENCE_DAYS = settings.preference_days
+    SCHEDULER.set_wait_bounds(MIN_WAIT_SECONDS, MAX_WAIT_SECONDS, min_gap=MIN_WAIT_SECONDS)
+
+def reload_config():
+    # Between cycles only; an invalid edit is logged by CONFIG and the current settings stay
+    settings = CONFIG.poll()
+    if settings is not None:
+        apply_settings(settings)
+        log(f"[CONFIG] Looking for appointments between {DATE_RANGE_START_DT.date()} and "
+            f"{DATE_RANGE_END_DT.date()} in {', '.join(CITIES)} (DRY_RUN={DRY_RUN})")
+
+@step()
 def polite_pause():
-    delay = random.uniform(1.2, 3.7)
+    low, high = POLITE_PAUSE_SECONDS
+    if high <= 0:
+        return
+    delay = random.uniform(low, high)
     time.sleep(delay)
     log(f"[PAUSE] Human-like pause for {delay:.2f}s")
 
-
-        log(f"[WARNING] Failed to simulate mouse movement: {e}")
-
+@step()
 def login(driver):
     log("[STEP] Logging in...")
-    driver.get("https://ais.usvisa-info.com/en-za/niv/users/sign_in")
+    GOVERNOR.acquire(LOGIN)
+    driver.get(f"{BASE_URL}/users/sign_in")
     WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.ID, "user_email")))
     driver.find_element(By.ID, "user_email").send_keys(EMAIL)
     polite_pause()
@@ -82,212 +246,389 @@ def login(driver):
         checkbox = driver.find_element(By.ID, "policy_confirmed")
         if not checkbox.is_selected():
             driver.execute_script("arguments[0].click();", checkbox)
-    except:
+    except Exception:
         pass
+    GOVERNOR.acquire(PAGE_LOAD, reason="login submit")
     driver.find_element(By.NAME, "commit").click()
     log("[INFO] Login submitted.")
 
+@step()
 def continue_existing_appointment(driver):
     log("[STEP] Clicking 'Continue' on existing appointment page...")
     try:
-        WebDriverWait(driver, 10).until(
+        link = WebDriverWait(driver, 10).until(
             EC.element_to_be_clickable((By.LINK_TEXT, "Continue"))
-        ).click()
+        )
+        GOVERNOR.acquire(PAGE_LOAD, reason="Continue")
+        link.click()
         return True
-    except:
+    except Exception:
         return False
 
+@step()
+def accept_reschedule_warning(driver):
+    return accept_warning_gate(driver, LOCATORS, GOVERNOR, log, CHECKBOX_READY_TIMEOUT)
+
+@step()
 def click_reschedule(driver):
     log("[STEP] Clicking reschedule appointment link...")
     try:
         accordion = WebDriverWait(driver, 30).until(
             EC.element_to_be_clickable((By.XPATH, "//a[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'reschedule appointment')]"))
-        )        accordion.click()
+        )
+        accordion.click()
         polite_pause()
 
         link = WebDriverWait(driver, 15).until(
             EC.element_to_be_clickable((By.XPATH, "//a[contains(@href, '/appointment') and contains(text(), 'Reschedule Appointment')]"))
-        )        link.click()
+        )
+        GOVERNOR.acquire(PAGE_LOAD, reason="Reschedule Appointment")
+        link.click()
         return True
     except Exception as e:
         log(f"[ERROR] Reschedule click failed: {e}")
         return False
 
-def select_city(driver, city):
+@step()
+def select_city(driver, city, deadline=None, essential=False):
+    # essential: re-selecting a facility to book a date the sweep already read
+    instrumentation.tag(facility=city)
     log(f"[STEP] Selecting city: {city}")
+    deadline = deadline or Deadline(None, WAIT_CAPS)
     try:
-        dropdown = WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.ID, "appointments_consulate_appointment_facility_id"))
-        )
-        Select(dropdown).select_by_visible_text(city)
+        dropdown = deadline.wait("facility_select", lambda t: LOCATORS.find(driver, "facility_select", t),
+                                 essential=essential)
+        # Exact text, else partial ("Cape Town" -> "Cape Town, South Africa")
+        options = option_texts(driver, dropdown)
+        match = match_option(options, city)
+        if not match:
+            log(f"[ERROR] No facility option matches '{city}'. Options: {options}")
+            return False
+        Select(dropdown).select_by_visible_text(match)
+        if not deadline.wait("facility_ready", lambda t: wait_for_facility_ready(driver, t), essential=essential):
+            log(f"[WARNING] Date field still not ready after selecting {city}.")
+        recorder.capture(driver, "facility_selected")
         return True
+    except CycleOverBudget:
+        raise
     except Exception as e:
         log(f"[ERROR] City select failed: {e}")
         return False
 
-def select_date_from_calendar(driver, target_date):
+@step()
+def select_date_from_calendar(driver, target_date, deadline=None, essential=False):
+    # essential: booking a date already seen open, so the cycle budget doesn't cut it short
     log(f"[STEP] Selecting date {target_date.strftime('%Y-%m-%d')} from calendar...")
-    date_input = WebDriverWait(driver, 15).until(
-        EC.element_to_be_clickable((By.ID, "appointments_consulate_appointment_date"))
-    )
-    date_input.click()
-
-    while True:
-        try:
-            month_elem = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".ui-datepicker-group-first .ui-datepicker-month"))
-            )
-            year_elem = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".ui-datepicker-group-first .ui-datepicker-year"))
-            )
-            displayed_month = month_elem.text.strip()
-            displayed_year = year_elem.text.strip()
-
-            if not displayed_month or not displayed_year:
-                log("[WARNING] Calendar header text empty, retrying...")
-                time.sleep(1)
-                continue
-
-            displayed_date = datetime.strptime(f"{displayed_month} {displayed_year}", "%B %Y")
-
-            if displayed_date.year > target_date.year or (displayed_date.year == target_date.year and displayed_date.month > target_date.month):
-                driver.find_element(By.CSS_SELECTOR, ".ui-datepicker-prev").click()
-            elif displayed_date.year < target_date.year or (displayed_date.year == target_date.year and displayed_date.month < target_date.month):
-                driver.find_element(By.CSS_SELECTOR, ".ui-datepicker-next").click()
-            else:
-                all_days = driver.find_elements(By.CSS_SELECTOR, ".ui-datepicker-group-first td[data-handler='selectDay'] a")
-                for day_elem in all_days:
-                    if int(day_elem.text) == target_date.day:
-                        day_elem.click()
-                        return True
-                log("[WARNING] Target day not found or is disabled.")
-                return False
-        except Exception as e:
-            log(f"[ERROR] Calendar navigation failed: {e}")
-            return False
+    deadline = deadline or Deadline(None, WAIT_CAPS)
+    try:
+        deadline.wait("date_input", lambda t: WebDriverWait(driver, t, poll_frequency=POLL_SECONDS).until(date_input_ready),
+                      essential=essential)
+        if select_day(driver, target_date):
+            return True
+        log("[WARNING] Target day not found or is disabled.")
+        return False
+    except CycleOverBudget:
+        raise
+    except Exception as e:
+        log(f"[ERROR] Calendar navigation failed: {e}")
+        return False
 
-def check_and_select_appointment(driver, city):
+def record_availability(city, available):
+    # Diff against the previous read: new dates alert right away, vanished ones re-arm the de-dup
+    first_date = max(DATE_RANGE_START_DT, datetime.today())
+    events = AVAILABILITY.update(city, available, first_date, DATE_RANGE_END_DT)
+    last_availability[city] = [d.isoformat() for d in AVAILABILITY.open_dates(city)]
+    last_read_at[city] = time.perf_counter()
+    HISTORY.observe(city, available, first_date, DATE_RANGE_END_DT)
+    METRICS.observe_read(city, AVAILABILITY.earliest(city))
+    if events:
+        log(f"[CHANGE] {city}: {describe_events(events)}")
+        for event in events:
+            if event.kind == NEW:
+                ALERTS.alert(city, event.day)
+        if any(event.kind == VANISHED for event in events):
+            ALERTS.resolve(city, AVAILABILITY.open_dates(city))
+    return events
+
+@step()
+def sweep_cities(driver, deadline=None):
+    first_date = max(DATE_RANGE_START_DT, datetime.today())
+    # Each facility is recorded as soon as it is read; a later over-budget wait can't lose it
+    snapshot = sweep_facilities(driver, CITIES, lambda d, city: select_city(d, city, deadline),
+                                first_date, DATE_RANGE_END_DT, on_read=record_availability)
+    log(f"[SWEEP] {snapshot.describe(FACILITY_PREFERENCE_DAYS)}")
+    return snapshot
+
+@step()
+def check_and_select_appointment(driver, city, known_dates=None, deadline=None):
+    # known_dates: this city's open dates from sweep_cities (skips the calendar scan)
+    # deadline: the cycle's budget; CycleOverBudget is re-raised to main()
+    instrumentation.tag(facility=city)
     log(f"[STEP] Checking for available appointment in {city}...")
+    deadline = deadline or Deadline(None, WAIT_CAPS)
+    # Dates the sweep already read are booked regardless of the cycle budget
+    known = known_dates is not None
     try:
-        if not select_city(driver, city):
+        if not select_city(driver, city, deadline, essential=known):
             return False
 
-        date_input = WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.ID, "appointments_consulate_appointment_date"))
-        )
+        date_input = deadline.wait("date_input", lambda t: LOCATORS.find(driver, "date_input", t), essential=known)
         tag_name = date_input.tag_name.lower()
 
         if tag_name == "input":
-            current_date = max(DATE_RANGE_START_DT, datetime.today())
+            first_date = max(DATE_RANGE_START_DT, datetime.today())
             last_date = DATE_RANGE_END_DT
 
-            while current_date <= last_date:
-                if select_date_from_calendar(driver, current_date):
-                    notify("Visa Appointment Bot", f"Date found at {city}: {current_date.strftime('%Y-%m-%d')}")
-                    send_email("Visa Date Found", f"Date: {current_date.strftime('%Y-%m-%d')} at {city}")
-
-                    time_select = WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.ID, "appointments_consulate_appointment_time"))
-                    )
-                    options = [opt.text for opt in time_select.find_elements(By.TAG_NAME, "option")]
-                    log(f"[INFO] Available time slots: {options}")
-                    Select(time_select).select_by_index(1)
-                    log("[STEP] Selected first available time slot")
-                    polite_pause()
-
-                    reschedule_btn = WebDriverWait(driver, 10).until(
-                        EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and (@value='Reschedule' or contains(@value,'Reschedule'))]"))
-                    )
+            if known_dates is not None:
+                candidates = [datetime.combine(d, datetime.min.time()) for d in known_dates]
+            elif SINGLE_PASS_SCAN:
+                calendar = open_calendar(driver)
+                record_availability(city, scan_available_dates(driver, first_date, last_date, calendar))
+                available = AVAILABILITY.open_dates(city)
+                log(f"[INFO] Single-pass scan at {city}: {len(available)} open date(s) in window "
+                    f"{[d.strftime('%Y-%m-%d') for d in available[:5]]}")
+                candidates = [datetime.combine(d, datetime.min.time()) for d in available]
+            else:
+                candidates = (first_date + timedelta(days=i) for i in range((last_date - first_date).days + 1))
+
+            # Scanned/swept dates are known to be open; only the legacy walk stays on the budget
+            essential = known or SINGLE_PASS_SCAN
+            # Known-open dates time from the read that found them; the legacy walk from its own click
+            detected_at = last_read_at.get(city) if essential else None
+            for current_date in candidates:
+                timeline = CommitTimeline(detected_at)
+                if select_date_from_calendar(driver, current_date, deadline, essential):
+                    timeline.mark("date_selected")
+                    ALERTS.alert(city, current_date)  # no-op unless this came from the legacy walk
+
+                    day = current_date.strftime("%Y-%m-%d")
+                    result = commit_appointment(driver, LOCATORS, deadline, timeline, day, DRY_RUN, log)
+                    log(f"[INFO] Available time slots: {result.form.times}")
+                    log(f"[COMMIT] {city} {day} {result.time or '-'}: {timeline.describe()}")
+                    if not result.ready:
+                        log(f"[WARNING] Could not book {day}: {result.problem}")
+                        continue
                     if DRY_RUN:
-                        log("[DRY_RUN] Would click Reschedule + Confirm here. Skipping irreversible actions.")
+                        log("[DRY_RUN] Would click Reschedule + Confirm here. Skipping irreversible actions. "
+                            f"Confirm control: {result.controls.get('confirm') or 'not on the page yet'}.")
                         return True
+                    if not result.submitted:
+                        log(f"[WARNING] Reschedule not clicked: {result.problem}")
+                        continue
 
-                    reschedule_btn.click()
                     log("[STEP] Reschedule button clicked")
-                    polite_pause()
-
-                    try:
-                        confirm_btn = WebDriverWait(driver, 10).until(
-                            EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Confirm') or contains(text(), 'Yes') or contains(text(), 'Continue') or contains(text(), 'Reschedule')]"))
-                        )
-                        log("[STEP] Clicking confirmation button...")
-                        confirm_btn.click()
-                        notify("Visa Appointment Bot", f"Appointment confirmed at {city}")
-                        send_email("Visa Appointment Confirmed", f"Successfully confirmed appointment at {city} on {current_date.strftime('%Y-%m-%d')}")
-                    except TimeoutException:
-                        log("[WARNING] No confirmation popup appeared.")
+                    if result.confirmed:
+                        ALERTS.alert(city, current_date, kind=CONFIRMED, urgent=True)
+                    else:
+                        log(f"[WARNING] No confirmation popup appeared: {result.problem}")
                     return True
-                else:
-                    current_date += timedelta(days=1)
             return False
         else:
             log("[WARNING] Date input is not an input tag, calendar handling not implemented for this.")
             return False
+    except CycleOverBudget:
+        raise
     except Exception as e:
         log(f"[ERROR] Date check failed: {e}")
         return False
 
+def build_driver():
+    return GOVERNOR.attach(instrumentation.attach(build_chrome(lean=LEAN_BROWSER, headless=HEADLESS)))
+
+STANDBY = WarmStandby(build_driver, log, enabled=WARM_STANDBY)
+WATCHDOG = BrowserWatchdog(
+    log,
+    max_rss_bytes=BROWSER_MAX_RSS_MB * 2**20 if BROWSER_MAX_RSS_MB else None,
+    max_fds=BROWSER_MAX_FDS,
+    max_age_seconds=BROWSER_MAX_AGE_HOURS * 3600 if BROWSER_MAX_AGE_HOURS else None,
+)
+
+def open_appointment_url(driver):
+    driver.get(APPOINTMENT_URL)
+
+def restore_checkpoint_cookies(driver):
+    return restore_session(driver, load_checkpoint(STATE_FILE), APPOINTMENT_URL, f"{BASE_URL}/users/sign_in")
+
+def leave_dashboard(driver):
+    # The groups page needs 'Continue' first; continue_actions already shows the accordion
+    if "continue_actions" not in driver.current_url:
+        continue_existing_appointment(driver)
+    return click_reschedule(driver)
+
+# Cheapest way out of each state first; recover() falls through to the next on no progress
+NAVIGATION = NavigationFlow({
+    BLANK: [restore_checkpoint_cookies, open_appointment_url],
+    SIGNED_OUT: [login],
+    DASHBOARD: [open_appointment_url, leave_dashboard],
+    RESCHEDULE_WARNING: [accept_reschedule_warning],
+    UNKNOWN: [open_appointment_url],
+}, log)
+
+def end_cycle(outcome, **fields):
+    record = instrumentation.end_cycle(outcome, **fields)
+    HISTORY.end_cycle(record)
+    METRICS.observe_cycle(record)
+
+def checkpoint(driver, refresh_counter):
+    try:
+        save_checkpoint(STATE_FILE, driver, refresh_counter=refresh_counter, availability=last_availability,
+                        locators=LOCATORS.snapshot(), wait_caps=WAIT_CAPS.snapshot())
+    except Exception as e:
+        log(f"[WARNING] Could not save checkpoint: {e}")
+
+def recover(driver):
+    # Re-enter at the cheapest reachable state; rebuild the browser once if it has died
+    for attempt in range(2):
+        try:
+            if NAVIGATION.recover(driver):
+                return driver
+        except WebDriverException as e:
+            log(f"[WARNING] Browser unusable during recovery ({e.__class__.__name__}); rebuilding driver.")
+            with span("rebuild_driver", reason="webdriver_exception"):
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+                driver = STANDBY.take()
+            continue
+        break
+    raise RuntimeError("Could not reach the appointment form; see [FLOW] lines above.")
+
+def recycle_driver(driver, reason):
+    # Fresh browser between cycles; recover() re-enters from the checkpoint cookies first
+    log(f"[RECYCLE] Replacing browser in the sleep window: {reason}")
+    with span("recycle_driver", reason=reason):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        driver = STANDBY.take()
+        WATCHDOG.recycled(reason)
+        METRICS.observe_recycle(reason)
+        return recover(driver)
+
 def main():
-    options = webdriver.ChromeOptions()
-    options.add_argument("--start-maximized")
-    driver = webdriver.Chrome(options=options)
+    # An invalid file refuses to start (ConfigError); later edits are validated in reload_config()
+    apply_settings(CONFIG.load())
+
+    saved = load_checkpoint(STATE_FILE)
+    refresh_counter = saved.get("refresh_counter", 0)
+    last_availability.update(saved.get("availability") or {})
+    # Dates open at the last checkpoint are the baseline: no NEW events or alerts for them again
+    AVAILABILITY.restore(last_availability)
+    for city, days in last_availability.items():
+        ALERTS.remember(city, days)
+    LOCATORS.restore(saved.get("locators"))
+    WAIT_CAPS.restore(saved.get("wait_caps"))
+    over_budget = 0
+
+    instrumentation.configure(METRICS_JSONL)
+    recorder.configure(RECORD_FIXTURES, instrumentation.context)
+    instrumentation.start_cycle("setup")
+    driver = build_driver()
+    # Reads whichever driver `driver` names at scrape time (it changes on rebuilds)
+    METRICS.rss = lambda: tree_rss_bytes(driver)
+    metrics_server = None
 
     try:
         log("[INIT] Script started.")
+        if METRICS_PORT:
+            try:
+                metrics_server = MetricsServer(METRICS, METRICS_PORT).start()
+                log(f"[INIT] Metrics on http://127.0.0.1:{METRICS_PORT}/metrics (health: /healthz)")
+            except OSError as e:
+                log(f"[WARNING] Metrics endpoint not started on port {METRICS_PORT}: {e}")
         log(f"[CONFIG] Looking for appointments between {DATE_RANGE_START_DT.date()} and {DATE_RANGE_END_DT.date()}")
-        login(driver)
-
-        if not continue_existing_appointment(driver):
-            log("[ERROR] No existing appointment to continue.")
-            return
-
-        if not click_reschedule(driver):
-            log("[ERROR] Could not click reschedule.")
-            return
-
-        refresh_counter = 0
+        if CONFIG.path and os.path.exists(CONFIG.path):
+            log(f"[CONFIG] Settings from {CONFIG.path} (edits apply between cycles).")
+        if refresh_counter:
+            log(f"[INIT] Resuming from checkpoint at refresh #{refresh_counter}.")
+        if ADAPTIVE_SCHEDULE:
+            SCHEDULER.refit_if_stale()
+            for line in SCHEDULER.describe():
+                log(f"[SCHEDULE] {line}")
+
+        driver = recover(driver)
+        checkpoint(driver, refresh_counter)
+        end_cycle("ready")
+        instrumentation.start_cycle(refresh_counter + 1)
+        deadline = Deadline(CYCLE_BUDGET_SECONDS or None, WAIT_CAPS)
 
         while True:
             found = False
-            for city in CITIES:
-                if check_and_select_appointment(driver, city):
-                    found = True
-                    break
+            reload_config()
+            # No date can match an expired/empty window: skip the checks but keep the session warm
+            idle = CONFIG.settings.window_problem()
+            outcome = "idle" if idle else "empty"
+            try:
+                if idle:
+                    log(f"[CONFIG] Not checking: {idle}. Update {CONFIG_FILE} to resume (no restart needed).")
+                    attempts = []
+                elif SWEEP_MODE:
+                    ranked = sweep_cities(driver, deadline).ranked(FACILITY_PREFERENCE_DAYS)
+                    attempts = [(entry.facility, AVAILABILITY.open_dates(entry.facility)) for entry in ranked]
+                else:
+                    attempts = [(city, None) for city in CITIES]
+                for city, known_dates in attempts:
+                    if check_and_select_appointment(driver, city, known_dates, deadline):
+                        found = True
+                        break
+            except CycleOverBudget as e:
+                over_budget += 1
+                outcome = "over_budget"
+                log(f"[BUDGET] Cycle aborted: {e} ({over_budget} this run). Caps: {WAIT_CAPS.describe()}")
 
             if found:
                 log("[SUCCESS] Appointment booked and confirmed. Exiting script.")
+                end_cycle("found", facility=city, budget=GOVERNOR.snapshot())
                 return
 
             refresh_counter += 1
-            wait_time = random.randint(180, 300)
+            checkpoint(driver, refresh_counter)
+            end_cycle(outcome, budget=GOVERNOR.snapshot())
+            STANDBY.prepare_async()
+            if ADAPTIVE_SCHEDULE:
+                wait_time = SCHEDULER.next_wait()
+            else:
+                wait_time = random.randint(MIN_WAIT_SECONDS, MAX_WAIT_SECONDS)
             log(f"[WAIT] No appointment found. Refresh #{refresh_counter}. Sleeping {wait_time // 60}m {wait_time % 60}s")
-            time.sleep(wait_time)
-            driver.refresh()
-            log("[STEP] Page refreshed.")
-
-            if "sign_in" in driver.current_url or "Sign In" in driver.page_source:
-                log("[WARNING] Detected sign out. Resetting session...")
-                driver.quit()
-                time.sleep(5)
-
-                new_options = webdriver.ChromeOptions()
-                new_options.add_argument("--start-maximized")
-                driver = webdriver.Chrome(options=new_options)
-
-                login(driver)
-
-                if not continue_existing_appointment(driver):
-                    log("[ERROR] No existing appointment after relogin.")
-                    return
-
-                if not click_reschedule(driver):
-                    log("[ERROR] Could not click reschedule after relogin.")
-                    return
+            slept_from = time.monotonic()
+            reason = WATCHDOG.sample(driver)
+            if reason:
+                driver = recycle_driver(driver, reason)
+                STANDBY.prepare_async()  # the recycle used the spare
+            time.sleep(max(0.0, wait_time - (time.monotonic() - slept_from)))
+            instrumentation.start_cycle(refresh_counter + 1)
+            deadline = Deadline(CYCLE_BUDGET_SECONDS or None, WAIT_CAPS)
+            try:
+                with span("reload"):
+                    driver.refresh()
+                log("[STEP] Page refreshed.")
+            except WebDriverException:
+                log("[WARNING] Refresh failed; recovering session.")
+
+            # Sign-outs, dead browsers and half-loaded pages all go through the same recovery
+            driver = recover(driver)
     except Exception as e:
         log(f"[FATAL ERROR] {e}")
     finally:
-        driver.quit()
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        STANDBY.close()
+        ALERTS.close()
+        MAILER.stop()
+        HISTORY.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+        recorder.close()
+        for line in instrumentation.finish():
+            log(f"[METRICS] {line}")
+        for line in LOCATORS.describe():
+            log(f"[LOCATOR] {line}")
         log("[EXIT] Browser closed.")
+        LOGS.close()
 
 if __name__ == "__main__":
     main()
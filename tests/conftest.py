@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Same import root the country scripts use
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
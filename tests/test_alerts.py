@@ -0,0 +1,34 @@
+import time
+
+from common.alerts import AlertEngine, Channel
+
+
+class RecordingChannel(Channel):
+    name = "recording"
+
+    def __init__(self, max_per_hour):
+        super().__init__(max_per_hour)
+        self.delivered = []
+
+    def deliver(self, subject, body, alerts):
+        self.delivered.append(sorted(a.day for a in alerts))
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_close_flushes_alerts_held_back_by_the_rate_limit():
+    channel = RecordingChannel(max_per_hour=1)
+    engine = AlertEngine([channel], log=lambda line: None, window=0)
+    engine.alert("Nairobi", "2026-01-10")
+    _wait_for(lambda: channel.delivered)
+    engine.alert("Nairobi", "2026-01-12")
+    _wait_for(lambda: channel.limited)
+    assert channel.delivered == [["2026-01-10"]]
+
+    engine.close()
+    assert channel.delivered == [["2026-01-10"], ["2026-01-12"]]
+    assert not channel.backlog
@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+
+from common.availability import NEW, VANISHED, AvailabilityTracker
+
+START = date(2026, 1, 1)
+END = START + timedelta(days=90)
+
+
+def _days(*offsets):
+    return [START + timedelta(days=o) for o in offsets]
+
+
+def test_restore_then_identical_scan_emits_no_events():
+    before = AvailabilityTracker()
+    before.update("Nairobi", _days(5, 20, 40), START, END)
+    saved = {"Nairobi": [d.isoformat() for d in before.open_dates("Nairobi")]}  # as checkpointed
+
+    after = AvailabilityTracker()
+    after.restore(saved)
+    assert after.update("Nairobi", _days(5, 20, 40), START, END) == []
+
+
+def test_restore_then_changed_scan_emits_only_the_difference():
+    after = AvailabilityTracker()
+    after.restore({"Nairobi": [d.isoformat() for d in _days(5, 20)]})
+    events = after.update("Nairobi", _days(20, 30), START, END)
+    assert sorted((e.kind, e.day) for e in events) == [(NEW, START + timedelta(days=30)),
+                                                      (VANISHED, START + timedelta(days=5))]
+
+
+def test_facility_missing_from_checkpoint_still_reports_new():
+    tracker = AvailabilityTracker()
+    tracker.restore({})
+    assert [e.kind for e in tracker.update("Nairobi", _days(5), START, END)] == [NEW]
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from common.deadline import CycleOverBudget, Deadline, WaitCaps
+
+
+def _learned_caps(fast=0.1):
+    caps = WaitCaps({"date_input": 45.0}, floor=0.05, min_samples=5)
+    for _ in range(10):
+        caps.observe("date_input", fast)
+    return caps
+
+
+def _time_out(timeout):
+    time.sleep(timeout)
+    return False
+
+
+def test_timeouts_at_the_cap_widen_it_again():
+    caps = _learned_caps()
+    deadline = Deadline(None, caps)
+    seen = [caps.cap("date_input")]
+    for _ in range(caps.widen_after):
+        assert deadline.wait("date_input", _time_out) is False
+        seen.append(caps.cap("date_input"))
+    # Each timeout at the cap pushes the p95 up; widen_after in a row restore the old timeout
+    assert seen[0] < seen[1] <= seen[-2] < seen[-1] == 45.0
+    assert caps.misses["date_input"] == 0
+
+
+def test_a_success_resets_the_miss_streak():
+    caps = _learned_caps()
+    caps.observe_timeout("date_input", caps.cap("date_input"))
+    caps.observe("date_input", 0.1)
+    caps.observe_timeout("date_input", caps.cap("date_input"))
+    assert caps.misses["date_input"] == 1
+    assert caps.cap("date_input") < 45.0
+
+
+def _select_facility(deadline):
+    """Same handler shape as the scripts' select_city: broad except, budget re-raised."""
+    try:
+        return deadline.wait("date_input", lambda t: True)
+    except CycleOverBudget:
+        raise
+    except Exception:
+        return False
+
+
+def test_over_budget_propagates_through_broad_handlers_in_the_wait_path():
+    caps = _learned_caps()
+    spent = Deadline(0, caps)
+    # The outer wait's own `except Exception` (timeout bookkeeping) must not swallow it either
+    with pytest.raises(CycleOverBudget):
+        Deadline(None, caps).wait("date_input", lambda t: _select_facility(spent))
+    assert len(caps.samples["date_input"]) == 10
+    assert caps.misses["date_input"] == 0
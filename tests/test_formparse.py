@@ -0,0 +1,91 @@
+import random
+from datetime import date
+
+from bench.parse_bench import render_group, synthetic_fixture
+from common.fixtures import FixtureRecorder, iter_fixtures
+from common.formparse import parse_calendar, parse_form
+
+# A single-month jQuery UI picker as AIS renders it: leading other-month cells, disabled days,
+# an unrelated <script>, and arrow titles containing '>' / '<'
+RECORDED_PICKER = (
+    '<div id="ui-datepicker-div" class="ui-datepicker ui-widget ui-widget-content ui-helper-clearfix '
+    'ui-corner-all" style="position: absolute; top: 412px; left: 560px; z-index: 1; display: block;">'
+    '<div class="ui-datepicker-header ui-widget-header ui-helper-clearfix ui-corner-all">'
+    '<a class="ui-datepicker-prev ui-corner-all ui-state-disabled" title="&lt;Prev"><span '
+    'class="ui-icon ui-icon-circle-triangle-w">&lt;Prev</span></a>'
+    '<a class="ui-datepicker-next ui-corner-all" data-handler="next" data-event="click" title="Next>">'
+    '<span class="ui-icon ui-icon-circle-triangle-e">Next&gt;</span></a>'
+    '<div class="ui-datepicker-title"><span class="ui-datepicker-month">March</span>&nbsp;'
+    '<span class="ui-datepicker-year">2026</span></div></div>'
+    '<script>if (a < b && c > d) { render("<td data-handler=\'selectDay\'>9</td>"); }</script>'
+    '<table class="ui-datepicker-calendar"><tbody><tr>'
+    '<td class=" ui-datepicker-week-end ui-datepicker-other-month ui-datepicker-unselectable ui-state-disabled">&#xa0;</td>'
+    '<td class=" ui-datepicker-unselectable ui-state-disabled"><span class="ui-state-default">2</span></td>'
+    '<td class=" " data-handler="selectDay" data-event="click" data-month="2" data-year="2026" '
+    'title="Open: 08:00 > 08:15">'
+    '<a class="ui-state-default" href="#">3</a></td>'
+    '<td class=" ui-datepicker-unselectable ui-state-disabled"><span class="ui-state-default">4</span></td>'
+    '<td class=" " data-handler="selectDay" data-event="click" data-month="2" data-year="2026">'
+    '<a class="ui-state-default ui-state-hover" href="#">17</a></td>'
+    '</tr></tbody></table></div>'
+)
+
+
+def test_recorded_picker_days_month_and_disabled_cells():
+    snapshot = parse_calendar(RECORDED_PICKER)
+    assert snapshot.months == [(2026, 3)]
+    # Disabled and other-month cells are not selectable; the <script> body is skipped
+    assert snapshot.days == {date(2026, 3, 3), date(2026, 3, 17)}
+    assert not snapshot.prev_enabled
+    assert snapshot.next_enabled
+
+
+def test_gt_inside_quoted_attribute_does_not_end_the_tag():
+    html = ('<div class="ui-datepicker-group ui-datepicker-group-first" title="a>b">'
+            '<span class="ui-datepicker-month" data-note=\'x>y\'>May</span>'
+            '<span class="ui-datepicker-year">2026</span>'
+            '<td data-handler="selectDay" title="a>b" data-month="4" data-year="2026"><a>12</a></td></div>')
+    snapshot = parse_calendar(html)
+    assert snapshot.months == [(2026, 5)]
+    assert snapshot.days == {date(2026, 5, 12)}
+
+
+def test_two_month_synthetic_pickers_match_what_was_rendered():
+    rng = random.Random(7)
+    for _ in range(200):
+        html, months, open_days, times = synthetic_fixture(rng)
+        state = parse_form(html)
+        assert state.calendar.months == months
+        assert state.calendar.days == open_days
+        assert state.times == times
+        assert state.selected_facility == "Nairobi"
+
+
+def test_month_boundary_and_disabled_prev_arrow():
+    open_days = {date(2026, 12, 31), date(2027, 1, 1)}
+    html = (render_group(2026, 12, "ui-datepicker-group-first", open_days, True, False, prev_disabled=True)
+            + render_group(2027, 1, "ui-datepicker-group-last", open_days, False, True))
+    snapshot = parse_calendar(html)
+    assert snapshot.months == [(2026, 12), (2027, 1)]
+    assert snapshot.days == open_days
+    assert (snapshot.prev_enabled, snapshot.next_enabled) == (False, True)
+
+
+def test_recorded_archive_parses_like_the_live_markup(tmp_path):
+    archive = str(tmp_path / "fixtures.jsonl.gz")
+    recorder = FixtureRecorder()
+    recorder.configure(archive)
+    for _ in range(2):  # the repeat is stored by sha only
+        recorder.record("calendar", RECORDED_PICKER, action="next")
+    recorder.close()
+
+    entries = list(iter_fixtures(archive))
+    assert len(entries) == 2
+    for entry in entries:
+        assert parse_calendar(entry["html"]).days == {date(2026, 3, 3), date(2026, 3, 17)}
+
+
+def test_empty_or_missing_picker():
+    snapshot = parse_calendar("")
+    assert snapshot.months == [] and snapshot.days == set()
+    assert parse_calendar(None).first_month is None
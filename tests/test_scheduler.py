@@ -0,0 +1,30 @@
+import random
+from datetime import datetime
+
+from common.scheduler import HOURS_PER_WEEK, PollScheduler
+
+
+def _bursty_history(n=400, seed=3):
+    """Appearances packed into Monday 09:00, so that hour gets the densest plan."""
+    rng = random.Random(seed)
+    monday_nine = datetime(2026, 1, 5, 9).timestamp()
+    return [monday_nine + 7 * 86400 * rng.randrange(20) + rng.uniform(0, 3600) for _ in range(n)]
+
+
+def test_next_wait_never_below_min_wait():
+    scheduler = PollScheduler(180, 300, min_gap=180).fit(_bursty_history())
+    rng = random.Random(1)
+    start = datetime(2026, 1, 5).timestamp()
+    waits = [scheduler.next_wait(start + 900 * i, rng) for i in range(4 * HOURS_PER_WEEK)]
+    assert min(waits) >= 180
+    # The busy hour is still polled as fast as allowed, not the uniform mean
+    assert scheduler.interval_at(datetime(2026, 1, 5, 9, 30).timestamp()) < 240
+
+
+def test_min_gap_defaults_to_min_wait_and_follows_new_bounds():
+    scheduler = PollScheduler(180, 300).fit(_bursty_history())
+    assert scheduler.min_gap == 180
+    scheduler.set_wait_bounds(240, 360, min_gap=240)
+    rng = random.Random(2)
+    start = datetime(2026, 1, 5).timestamp()
+    assert min(scheduler.next_wait(start + 900 * i, rng) for i in range(4 * HOURS_PER_WEEK)) >= 240